@@ -139,11 +139,35 @@ router.get('/approved', async (req, res) => {
 });
 
 // Get all approved cases for face recognition system (includes sensitive data for matching)
+// Pass ?since=<ISO date> for a delta sync: every case updated since then, whatever its status,
+// so the face recognition service can also drop cases that are no longer approved
 router.get('/approved/face-recognition', async (req, res) => {
     try {
-        const cases = await Case.find({ status: 'approved' })
-            .select('name contactNumber adhaarNumber image caseId')
-            .sort({ createdAt: -1 });
+        const { since } = req.query;
+
+        let query = { status: 'approved' };
+        if (since) {
+            const sinceDate = new Date(since);
+            if (isNaN(sinceDate.getTime())) {
+                return res.status(400).json({
+                    success: false,
+                    message: 'Invalid since timestamp'
+                });
+            }
+            query = { updatedAt: { $gte: sinceDate } };
+        }
+
+        const cases = await Case.find(query)
+            .select('name contactNumber adhaarNumber image caseId status updatedAt')
+            .sort({ createdAt: -1 })
+            .lean();
+
+        // Images are only needed for cases that are still approved
+        cases.forEach(c => {
+            if (c.status !== 'approved') {
+                delete c.image;
+            }
+        });
 
         res.status(200).json(cases);
     } catch (error) {
@@ -155,6 +179,23 @@ router.get('/approved/face-recognition', async (req, res) => {
     }
 });
 
+// Ids and versions of all approved cases, used by the face recognition service to notice deleted cases
+router.get('/approved/face-recognition/ids', async (req, res) => {
+    try {
+        const cases = await Case.find({ status: 'approved' })
+            .select('caseId updatedAt')
+            .lean();
+
+        res.status(200).json(cases);
+    } catch (error) {
+        console.error('Error fetching approved case ids for face recognition:', error);
+        res.status(500).json({
+            success: false,
+            message: 'Error fetching approved case ids for face recognition'
+        });
+    }
+});
+
 // Get all approved cases (public view)
 router.get('/public/approved', async (req, res) => {
     try {
@@ -0,0 +1,172 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app_logging import get_logger
+
+log = get_logger('alerts')
+
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+FAILED = 'failed'
+
+
+def create_http_session(pool_size=4):
+    """requests.Session with keep-alive connection pooling; retries are the dispatcher's job"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class AlertDispatcher:
+    """Persistent background work queue for detection side effects
+
+    Jobs are rows in a small SQLite file, so alerts that have not been
+    delivered survive a restart and are picked up again by `start()`.
+    Worker threads each own a pooled HTTP session and call the handler
+    registered for the job's kind as `handler(payload, session)`. A handler
+    that returns False or raises is retried with exponential backoff until
+    `max_attempts`, after which the job is kept with status 'failed'.
+    """
+
+    def __init__(self, db_path="./alerts.db", workers=2, max_attempts=6,
+                 base_delay=2.0, max_delay=300.0):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.handlers = {}
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_error TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS alerts_due ON alerts (status, next_attempt_at)")
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    def start(self):
+        if self._threads:
+            return
+        with self._cond:
+            # Jobs that were mid-delivery when the process died are retried
+            self._db.execute("UPDATE alerts SET status = ? WHERE status = ?", (PENDING, IN_PROGRESS))
+            pending = self.pending_count()
+        if pending:
+            log.info("📬 Resuming %d undelivered alerts", pending)
+        self._stop_event.clear()
+        self._threads = [threading.Thread(target=self._run, name=f"alerts-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, kind, payload, delay=0.0):
+        """Persist a job and wake a worker; never blocks on delivery"""
+        now = time.time()
+        with self._cond:
+            self._db.execute(
+                "INSERT INTO alerts (kind, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload), now + delay, now))
+            self._cond.notify()
+
+    def pending_count(self):
+        with self._cond:
+            row = self._db.execute(
+                "SELECT COUNT(*) FROM alerts WHERE status IN (?, ?)", (PENDING, IN_PROGRESS)).fetchone()
+        return row[0]
+
+    def failed_count(self):
+        with self._cond:
+            row = self._db.execute("SELECT COUNT(*) FROM alerts WHERE status = ?", (FAILED,)).fetchone()
+        return row[0]
+
+    def _claim(self):
+        """Next due job marked in progress, or the seconds to wait for one"""
+        now = time.time()
+        row = self._db.execute(
+            "SELECT id, kind, payload, attempts FROM alerts WHERE status = ? AND next_attempt_at <= ? "
+            "ORDER BY next_attempt_at LIMIT 1", (PENDING, now)).fetchone()
+        if row is not None:
+            self._db.execute("UPDATE alerts SET status = ? WHERE id = ?", (IN_PROGRESS, row[0]))
+            return row, 0.0
+        next_due = self._db.execute(
+            "SELECT MIN(next_attempt_at) FROM alerts WHERE status = ?", (PENDING,)).fetchone()[0]
+        wait = 5.0 if next_due is None else min(5.0, max(0.05, next_due - now))
+        return None, wait
+
+    def _run(self):
+        session = create_http_session()
+        try:
+            while not self._stop_event.is_set():
+                with self._cond:
+                    job, wait = self._claim()
+                    if job is None:
+                        self._cond.wait(wait)
+                        continue
+                self._process(job, session)
+        finally:
+            session.close()
+
+    def _process(self, job, session):
+        job_id, kind, payload, attempts = job
+        attempts += 1
+        error = None
+        try:
+            handler = self.handlers[kind]
+            delivered = handler(json.loads(payload), session)
+        except Exception as e:
+            delivered = False
+            error = str(e)
+
+        with self._cond:
+            if delivered:
+                self._db.execute("DELETE FROM alerts WHERE id = ?", (job_id,))
+                return
+            if attempts >= self.max_attempts:
+                self._db.execute("UPDATE alerts SET status = ?, attempts = ?, last_error = ? WHERE id = ?",
+                                 (FAILED, attempts, error, job_id))
+                log.error("❌ Giving up on '%s' alert #%s after %d attempts: %s", kind, job_id, attempts, error)
+                return
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            self._db.execute(
+                "UPDATE alerts SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (PENDING, attempts, time.time() + delay, error, job_id))
+        log.warning("🔁 '%s' alert #%s failed (attempt %d/%d), retrying in %.1fs",
+                    kind, job_id, attempts, self.max_attempts, delay)
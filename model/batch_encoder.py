@@ -0,0 +1,152 @@
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class EncodingBatcher:
+    """Batches face encoding requests from several detect threads into one encoder call
+
+    `encode()` queues a frame's faces and blocks until its encodings are
+    ready. A single encoder thread waits for the first request, keeps
+    collecting until `max_batch` faces are queued, every active producer (a
+    thread that called `encode()` within `producer_idle` seconds) has a frame
+    in the batch, or `max_wait` seconds have passed, then encodes the whole
+    batch at once and routes each result back to the frame it came from.
+    Producers block on one request at a time, so a lone source never waits.
+    `stats()` reports batch sizes, queue wait and throughput so the window
+    can be tuned per deployment.
+    """
+
+    def __init__(self, max_batch=16, max_wait=0.02, encode_batch=None, window=200, producer_idle=1.0):
+        if encode_batch is None:
+            from face_detection import encode_faces_batch  # Loads dlib; deferred so the batching logic imports without it
+            encode_batch = encode_faces_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.producer_idle = producer_idle
+        self.encode_batch = encode_batch
+        self._requests = queue.Queue()
+        self._producers = {}  # thread ident -> when it last asked for encodings
+        self._producers_lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._recent = collections.deque(maxlen=window)  # (finished_at, faces, frames, wait, encode_time)
+        self.batches = 0
+        self.faces_encoded = 0
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def encode(self, rgb_small_frame, face_locations):
+        """Encodings for the given boxes, computed in the next batch"""
+        if not face_locations:
+            return []
+        future = Future()
+        now = time.perf_counter()
+        with self._producers_lock:
+            self._producers[threading.get_ident()] = now
+        self._requests.put((rgb_small_frame, face_locations, future, now))
+        return future.result()
+
+    def active_producers(self):
+        """Threads that asked for encodings within the last `producer_idle` seconds"""
+        now = time.perf_counter()
+        with self._producers_lock:
+            for ident, seen in list(self._producers.items()):
+                if now - seen > self.producer_idle:
+                    del self._producers[ident]
+            return len(self._producers)
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the window closes"""
+        try:
+            first = self._requests.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        faces = len(first[1])
+        producers = self.active_producers()
+        deadline = time.perf_counter() + self.max_wait
+        # Once every producer is waiting on this batch, nothing more can arrive
+        while faces < self.max_batch and len(batch) < producers:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            faces += len(request[1])
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect()
+            if batch:
+                self._encode(batch)
+        # Don't leave detect threads blocked on a stopped batcher
+        while True:
+            try:
+                self._requests.get_nowait()[2].set_result([])
+            except queue.Empty:
+                break
+
+    def _encode(self, batch):
+        started = time.perf_counter()
+        try:
+            results = self.encode_batch([request[0] for request in batch], [request[1] for request in batch])
+        except Exception as e:
+            for request in batch:
+                request[2].set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        faces = 0
+        wait = 0.0
+        for (_, locations, future, submitted_at), encodings in zip(batch, results):
+            future.set_result(encodings)
+            faces += len(locations)
+            wait += started - submitted_at
+        with self._stats_lock:
+            self.batches += 1
+            self.faces_encoded += faces
+            self._recent.append((finished, faces, len(batch), wait / len(batch), finished - started))
+
+    def stats(self):
+        """Recent batch size, latency and throughput figures"""
+        with self._stats_lock:
+            recent = list(self._recent)
+        summary = {
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'faces_encoded': self.faces_encoded,
+            'queued': self._requests.qsize(),
+            'producers': self.active_producers(),
+        }
+        if recent:
+            faces = sum(entry[1] for entry in recent)
+            encode_time = sum(entry[4] for entry in recent)
+            span = recent[-1][0] - (recent[0][0] - recent[0][4])
+            summary.update({
+                'avg_batch_faces': faces / len(recent),
+                'avg_batch_frames': sum(entry[2] for entry in recent) / len(recent),
+                'avg_wait_ms': 1000 * sum(entry[3] for entry in recent) / len(recent),
+                'avg_encode_ms_per_face': 1000 * encode_time / max(faces, 1),
+                'faces_per_second': faces / span if span > 0 else 0.0,
+            })
+        return summary
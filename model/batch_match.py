@@ -0,0 +1,240 @@
+"""Match recorded video and image archives against the approved-case gallery
+
+Usage (from the model directory, with the backend running):
+    python batch_match.py footage/cam1.mp4 footage/photos/ --sample-fps 2 --output matches.json
+
+Videos are split into chunks of --chunk-seconds that are decoded and
+scanned in parallel worker processes, one per core by default; each worker
+streams its chunk frame by frame, so memory does not grow with video length.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from app_logging import configure_logging, get_logger
+from face_matcher import DEFAULT_TOLERANCE, BruteForceMatcher
+
+log = get_logger('batch')
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.m4v', '.mpg', '.mpeg', '.ts', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Per-worker gallery and detector, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(gallery, detector_kind, detector_options, scale, tolerance):
+    # Detection loads dlib, which only the workers need
+    from detectors import create_detector
+    from face_detection import locate_and_encode
+
+    _worker.update(matcher=BruteForceMatcher().build(gallery),
+                   detector=create_detector(detector_kind, **detector_options),
+                   locate_and_encode=locate_and_encode, scale=scale, tolerance=tolerance)
+
+
+def _match_frame(frame):
+    """(gallery row, distance) of every recognized face in a BGR frame"""
+    _, face_encodings = _worker['locate_and_encode'](frame, _worker['scale'], _worker['detector'])
+    if not face_encodings:
+        return []
+    best_indices, best_distances = _worker['matcher'].match(face_encodings, tolerance=_worker['tolerance'])
+    return [(int(index), float(distance)) for index, distance in zip(best_indices, best_distances) if index >= 0]
+
+
+def _scan_video_chunk(path, start_frame, end_frame, step, fps):
+    """Scan frames [start_frame, end_frame) of a video, decoding every `step`-th one"""
+    capture = cv2.VideoCapture(path)
+    hits = []
+    scanned = 0
+    try:
+        if start_frame:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        index = start_frame
+        while end_frame is None or index < end_frame:
+            if index % step == 0:
+                success, frame = capture.read()
+                if not success:
+                    break
+                scanned += 1
+                timestamp = index / fps
+                hits.extend((path, timestamp, row, distance) for row, distance in _match_frame(frame))
+            elif not capture.grab():  # Skipped frames are not converted to images
+                break
+            index += 1
+    finally:
+        capture.release()
+    return scanned, hits
+
+
+def _scan_images(paths):
+    hits = []
+    scanned = 0
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            log.warning("⚠️ Could not read image %s", path)
+            continue
+        scanned += 1
+        hits.extend((path, None, row, distance) for row, distance in _match_frame(frame))
+    return scanned, hits
+
+
+def collect_inputs(paths):
+    """Split paths (files or directories, searched recursively) into videos and images"""
+    videos, images = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for file_path in files:
+            extension = os.path.splitext(file_path)[1].lower()
+            if extension in VIDEO_EXTENSIONS:
+                videos.append(file_path)
+            elif extension in IMAGE_EXTENSIONS:
+                images.append(file_path)
+    return videos, images
+
+
+def summarize(hits, names, adhaar_numbers=None, gap=2.0):
+    """Group raw hits per case, merging video hits less than `gap` seconds apart into sightings"""
+    cases = {}
+    for path, timestamp, row, distance in sorted(hits, key=lambda hit: (hit[2], hit[0], hit[1] or 0.0)):
+        case = cases.setdefault(names[row], {'sightings': [], 'images': []})
+        if adhaar_numbers:
+            case['adhaar'] = adhaar_numbers[row]
+        if timestamp is None:
+            case['images'].append({'file': path, 'distance': round(distance, 3)})
+            continue
+        sightings = case['sightings']
+        last = sightings[-1] if sightings else None
+        if last and last['file'] == path and timestamp - last['end'] <= gap:
+            last['end'] = round(timestamp, 2)
+            last['hits'] += 1
+            last['best_distance'] = min(last['best_distance'], round(distance, 3))
+        else:
+            sightings.append({'file': path, 'start': round(timestamp, 2), 'end': round(timestamp, 2),
+                              'hits': 1, 'best_distance': round(distance, 3)})
+    return cases
+
+
+class BatchMatcher:
+    """Scans video files and image sets for gallery faces in a pool of processes
+
+    The gallery is copied to each worker once, when the pool starts.
+    """
+
+    def __init__(self, encodings, names, adhaar_numbers=None, workers=None, sample_fps=1.0,
+                 chunk_seconds=60, scale=0.25, detector='hog', detector_options=None,
+                 tolerance=DEFAULT_TOLERANCE, images_per_task=32):
+        self.gallery = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+        self.names = list(names)
+        self.adhaar_numbers = list(adhaar_numbers) if adhaar_numbers else None
+        self.workers = workers or os.cpu_count() or 1
+        self.sample_fps = sample_fps
+        self.chunk_seconds = chunk_seconds
+        self.scale = scale
+        self.detector = detector
+        self.detector_options = detector_options or {}
+        self.tolerance = tolerance
+        self.images_per_task = images_per_task
+
+    def video_tasks(self, path):
+        """(path, start_frame, end_frame, step, fps) chunks covering one video"""
+        capture = cv2.VideoCapture(path)
+        try:
+            if not capture.isOpened():
+                log.warning("⚠️ Could not open video %s", path)
+                return []
+            fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        finally:
+            capture.release()
+
+        step = max(1, round(fps / self.sample_fps))
+        if frame_count <= 0:
+            return [(path, 0, None, step, fps)]  # Length unknown: scan it as one chunk
+        # Chunk boundaries on multiples of `step` keep the sampling grid continuous
+        chunk_frames = max(step, int(self.chunk_seconds * fps) // step * step)
+        return [(path, start, min(start + chunk_frames, frame_count), step, fps)
+                for start in range(0, frame_count, chunk_frames)]
+
+    def run(self, paths, progress=None):
+        """Scan all inputs; `progress(done, total)` is called as chunks finish"""
+        started = time.time()
+        videos, images = collect_inputs(paths)
+        tasks = [(_scan_video_chunk, task) for video in videos for task in self.video_tasks(video)]
+        tasks += [(_scan_images, (images[i:i + self.images_per_task],))
+                  for i in range(0, len(images), self.images_per_task)]
+
+        hits = []
+        frames_scanned = 0
+        if tasks and len(self.gallery):
+            executor = ProcessPoolExecutor(
+                max_workers=min(self.workers, len(tasks)), mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.gallery, self.detector, self.detector_options, self.scale, self.tolerance))
+            with executor:
+                futures = [executor.submit(function, *arguments) for function, arguments in tasks]
+                for done, future in enumerate(as_completed(futures), 1):
+                    scanned, chunk_hits = future.result()
+                    frames_scanned += scanned
+                    hits.extend(chunk_hits)
+                    if progress:
+                        progress(done, len(tasks))
+
+        return {
+            'videos': len(videos),
+            'images': len(images),
+            'chunks': len(tasks),
+            'frames_scanned': frames_scanned,
+            'sample_fps': self.sample_fps,
+            'elapsed_seconds': round(time.time() - started, 2),
+            'cases': summarize(hits, self.names, self.adhaar_numbers, gap=2.0 / self.sample_fps),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='video files, images or directories of them')
+    parser.add_argument('--sample-fps', type=float, default=1.0, help='frames scanned per second of video')
+    parser.add_argument('--chunk-seconds', type=float, default=60, help='video length handled per task')
+    parser.add_argument('--workers', type=int, default=0, help='worker processes, 0 = one per core')
+    parser.add_argument('--scale', type=float, default=0.25, help='downscale applied before detection')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    # The gallery is loaded exactly as the live service loads it
+    from flask_app import FACE_DETECTOR, LOG_FORMAT, LOG_LEVEL, LOG_RATE_LIMIT, build_recognizer, detector_options
+
+    configure_logging(LOG_LEVEL, LOG_FORMAT, burst=LOG_RATE_LIMIT)
+
+    recognizer = build_recognizer()
+    if recognizer is None:
+        sys.exit("No face encodings loaded; is the backend running with approved cases?")
+
+    gallery = recognizer.gallery.compacted()
+    matcher = BatchMatcher(gallery.encodings, gallery.names, gallery.adhaar_numbers, workers=args.workers or None,
+                           sample_fps=args.sample_fps, chunk_seconds=args.chunk_seconds, scale=args.scale,
+                           detector=FACE_DETECTOR, detector_options=detector_options(FACE_DETECTOR))
+    report = matcher.run(args.paths, progress=lambda done, total: print(f"⏳ {done}/{total} chunks", file=sys.stderr))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"✅ {len(report['cases'])} cases matched, report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
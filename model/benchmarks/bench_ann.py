@@ -0,0 +1,86 @@
+"""Recall and latency of the approximate IVF matcher against exact brute-force search
+
+Usage (from the model directory):
+    python benchmarks/bench_ann.py
+    python benchmarks/bench_ann.py --size 200000 --nprobe 4 8 16 32 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_matcher import DEFAULT_TOLERANCE, BruteForceMatcher, IVFMatcher  # noqa: E402
+
+
+def synthetic_gallery(size, rng, groups=512, spread=0.35):
+    """Clustered 128-d encodings; real face encodings are far from uniformly spread"""
+    centers = rng.normal(0.0, 1.0, size=(groups, 128))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    gallery = centers[rng.integers(0, groups, size=size)]
+    gallery = gallery + rng.normal(0.0, spread / np.sqrt(128), size=(size, 128))
+    return gallery.astype(np.float32)
+
+
+def synthetic_queries(gallery, count, rng, noise=0.4):
+    """Half genuine probes (noisy copies of gallery rows), half impostors"""
+    genuine = count // 2
+    rows = rng.choice(len(gallery), size=genuine, replace=False)
+    probes = gallery[rows] + rng.normal(0.0, noise / np.sqrt(128), size=(genuine, 128))
+    impostors = rng.normal(0.0, 1.0, size=(count - genuine, 128))
+    impostors /= np.linalg.norm(impostors, axis=1, keepdims=True)
+    return np.vstack([probes, impostors]).astype(np.float32)
+
+
+def per_frame_latency(matcher, queries, faces_per_frame):
+    samples = []
+    for start in range(0, len(queries), faces_per_frame):
+        frame = queries[start:start + faces_per_frame]
+        began = time.perf_counter()
+        matcher.match(frame, DEFAULT_TOLERANCE)
+        samples.append((time.perf_counter() - began) * 1000)
+    return float(np.median(samples)), float(np.percentile(samples, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=400)
+    parser.add_argument('--faces-per-frame', type=int, default=4)
+    parser.add_argument('--nlist', type=int, default=0, help='0 = 4 * sqrt(size)')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32])
+    parser.add_argument('--noise', type=float, default=0.4, help='genuine probe distance from its gallery row')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    gallery = synthetic_gallery(args.size, rng)
+    queries = synthetic_queries(gallery, args.queries, rng, args.noise)
+
+    exact = BruteForceMatcher().build(gallery)
+    exact_indices, _ = exact.match(queries, DEFAULT_TOLERANCE)
+    exact_p50, exact_p95 = per_frame_latency(exact, queries, args.faces_per_frame)
+    matched = exact_indices >= 0
+    print(f"gallery={args.size} queries={args.queries} exact matches={int(matched.sum())} "
+          f"faces/frame={args.faces_per_frame}")
+    print(f"exact   p50={exact_p50:.3f}ms p95={exact_p95:.3f}ms")
+
+    began = time.perf_counter()
+    ivf = IVFMatcher(nlist=args.nlist, min_gallery=0).build(gallery)
+    print(f"ivf     nlist={len(ivf.centroids)} build={time.perf_counter() - began:.2f}s")
+
+    print(f"{'nprobe':>6} {'recall':>7} {'agree':>7} {'p50':>10} {'p95':>10} {'speedup':>8}")
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        ivf_indices, _ = ivf.match(queries, DEFAULT_TOLERANCE)
+        # recall: exact matches the index also found; agree: same answer incl. "Unknown"
+        recall = float(np.mean(ivf_indices[matched] == exact_indices[matched])) if matched.any() else 1.0
+        agree = float(np.mean(ivf_indices == exact_indices))
+        p50, p95 = per_frame_latency(ivf, queries, args.faces_per_frame)
+        print(f"{nprobe:>6} {recall:>7.3f} {agree:>7.3f} {p50:>8.3f}ms {p95:>8.3f}ms {exact_p50 / p50:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
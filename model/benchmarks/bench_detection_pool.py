@@ -0,0 +1,64 @@
+"""Detection throughput of the in-process detector vs the multi-process DetectionPool
+
+Usage (from the model directory):
+    python benchmarks/bench_detection_pool.py --image path/to/frame.jpg --workers 1 2 4 8
+Without --image a synthetic 640x480 frame is used (no faces, but the same HOG cost).
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection_pool import DetectionPool  # noqa: E402
+from face_detection import locate_and_encode  # noqa: E402
+from face_matcher import BruteForceMatcher  # noqa: E402
+
+
+def run_threads(count, frames_per_thread, work):
+    threads = [threading.Thread(target=lambda: [work() for _ in range(frames_per_thread)])
+               for _ in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return count * frames_per_thread / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', help='frame to detect on (default: synthetic noise)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--frames', type=int, default=20, help='frames per detect thread')
+    parser.add_argument('--gallery', type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.image:
+        frame = cv2.imread(args.image)
+    else:
+        frame = np.random.default_rng(0).integers(0, 255, size=(480, 640, 3), dtype=np.uint8)
+
+    rng = np.random.default_rng(1)
+    matcher = BruteForceMatcher().build(rng.normal(0.0, 0.09, size=(args.gallery, 128)))
+
+    baseline = run_threads(1, args.frames, lambda: matcher.match(locate_and_encode(frame)[1]))
+    print(f"in-process        {baseline:7.2f} frames/s")
+
+    for workers in args.workers:
+        pool = DetectionPool(workers)
+        try:
+            pool.detect(frame, matcher)  # Start the workers and publish the gallery
+            fps = run_threads(workers, args.frames, lambda: pool.detect(frame, matcher))
+        finally:
+            pool.shutdown()
+        print(f"pool workers={workers:<3} {fps:7.2f} frames/s ({fps / baseline:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Latency and recall of each face detector backend on a fixed set of images
+
+Usage (from the model directory):
+    python benchmarks/bench_detectors.py --images test_frames/ --labels test_frames/labels.json
+    python benchmarks/bench_detectors.py --images test_frames/ --detectors hog haar yunet --reference cnn
+
+labels.json maps image file names to lists of [top, right, bottom, left]
+face boxes in full-resolution pixels. Without --labels, the --reference
+detector's boxes (at full resolution) are used as ground truth.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detectors import DETECTORS, create_detector  # noqa: E402
+from face_detection import prepare_frame, scale_locations  # noqa: E402
+from tracker import iou_matrix  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def matched_faces(truth, found, threshold=0.5):
+    """Number of ground-truth boxes matched one-to-one by a found box with IoU >= threshold"""
+    if not truth or not found:
+        return 0
+    overlaps = iou_matrix(truth, found)
+    matched = 0
+    while overlaps.size and overlaps.max() >= threshold:
+        t, f = divmod(int(overlaps.argmax()), overlaps.shape[1])
+        overlaps[t, :] = 0
+        overlaps[:, f] = 0
+        matched += 1
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', required=True, help='directory of test images')
+    parser.add_argument('--labels', help='JSON file of ground-truth boxes per image')
+    parser.add_argument('--detectors', nargs='+', default=sorted(DETECTORS))
+    parser.add_argument('--reference', default='cnn', help='detector used as ground truth without --labels')
+    parser.add_argument('--scale', type=float, default=0.25, help='downscale applied before detection')
+    parser.add_argument('--model', default='./models/face_detection_yunet_2023mar.onnx', help='YuNet model file')
+    args = parser.parse_args()
+
+    names = sorted(name for name in os.listdir(args.images) if name.lower().endswith(IMAGE_EXTENSIONS))
+    images = {name: cv2.imread(os.path.join(args.images, name)) for name in names}
+    images = {name: image for name, image in images.items() if image is not None}
+    if not images:
+        sys.exit(f"No readable images in {args.images}")
+
+    def build(kind):
+        return create_detector(kind, **({'model_path': args.model} if kind == 'yunet' else {}))
+
+    if args.labels:
+        with open(args.labels, 'r', encoding='utf-8') as f:
+            truth = {name: [tuple(box) for box in boxes] for name, boxes in json.load(f).items()}
+    else:
+        reference = build(args.reference)
+        truth = {name: reference.locate(prepare_frame(image, 1.0)) for name, image in images.items()}
+        print(f"Ground truth: '{args.reference}' at full resolution")
+    total = sum(len(truth.get(name, [])) for name in images)
+    print(f"{len(images)} images, {total} labelled faces, detection at scale {args.scale}\n")
+
+    print(f"{'detector':<8} {'mean ms':>8} {'p95 ms':>8} {'recall':>7} {'found':>6} {'false+':>7}")
+    for kind in args.detectors:
+        try:
+            detector = build(kind)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"{kind:<8} skipped: {e}")
+            continue
+
+        frames = {name: prepare_frame(image, args.scale) for name, image in images.items()}
+        detector.locate(next(iter(frames.values())))  # Warm up (model load, first-call allocations)
+        latencies, found, matched = [], 0, 0
+        for name, rgb_small_frame in frames.items():
+            start = time.perf_counter()
+            small_locations = detector.locate(rgb_small_frame)
+            latencies.append(time.perf_counter() - start)
+            locations = scale_locations(small_locations, args.scale)
+            found += len(locations)
+            matched += matched_faces(truth.get(name, []), locations)
+
+        latencies.sort()
+        mean_ms = 1000 * sum(latencies) / len(latencies)
+        p95_ms = 1000 * latencies[int(len(latencies) * 0.95)]
+        recall = matched / total if total else float('nan')
+        print(f"{kind:<8} {mean_ms:8.1f} {p95_ms:8.1f} {recall:7.2f} {found:6d} {found - matched:7d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Face encoding throughput and latency for different EncodingBatcher windows
+
+Usage (from the model directory):
+    python benchmarks/bench_encode_batching.py --image path/to/frame.jpg --sources 4 --batch 1 4 8 16
+The image must contain at least one face; each simulated source encodes its
+faces once per frame, as a detect thread would.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_encoder import EncodingBatcher  # noqa: E402
+from face_detection import encode_faces, locate_faces, prepare_frame  # noqa: E402
+
+
+def run_sources(count, frames, encode):
+    latencies = []
+    lock = threading.Lock()
+
+    def source():
+        for _ in range(frames):
+            start = time.perf_counter()
+            encode()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=source) for _ in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return count * frames / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', required=True, help='frame containing at least one face')
+    parser.add_argument('--sources', type=int, default=4, help='concurrent detect threads')
+    parser.add_argument('--frames', type=int, default=25, help='frames per source')
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 4, 8, 16], help='max faces per batch')
+    parser.add_argument('--wait-ms', type=float, nargs='+', default=[5, 20])
+    args = parser.parse_args()
+
+    rgb_small_frame = prepare_frame(cv2.imread(args.image))
+    face_locations = locate_faces(rgb_small_frame)
+    if not face_locations:
+        sys.exit("No faces found in the image")
+    print(f"{len(face_locations)} face(s) per frame, {args.sources} sources")
+
+    fps, p50, p95 = run_sources(args.sources, args.frames, lambda: encode_faces(rgb_small_frame, face_locations))
+    print(f"unbatched               {fps:7.1f} frames/s  p50 {p50 * 1000:6.1f} ms  p95 {p95 * 1000:6.1f} ms")
+
+    for max_batch in args.batch:
+        for wait_ms in args.wait_ms:
+            batcher = EncodingBatcher(max_batch, wait_ms / 1000.0).start()
+            try:
+                fps, p50, p95 = run_sources(args.sources, args.frames,
+                                            lambda: batcher.encode(rgb_small_frame, face_locations))
+                stats = batcher.stats()
+            finally:
+                batcher.stop()
+            print(f"batch={max_batch:<3} wait={wait_ms:4.0f}ms  {fps:7.1f} frames/s  "
+                  f"p50 {p50 * 1000:6.1f} ms  p95 {p95 * 1000:6.1f} ms  "
+                  f"avg batch {stats.get('avg_batch_faces', 0):.1f} faces")
+
+
+if __name__ == '__main__':
+    main()
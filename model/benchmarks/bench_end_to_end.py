@@ -0,0 +1,373 @@
+"""End-to-end load and regression benchmark of the Flask service
+
+Usage (from the model directory):
+    python benchmarks/bench_end_to_end.py --faces faces/ --gallery 500 --seconds 20 --viewers 2
+    python benchmarks/bench_end_to_end.py --faces faces/ --save-baseline    # record this machine's baseline
+    python benchmarks/bench_end_to_end.py --faces faces/                    # compare against it
+
+--faces is a directory of photos with one face each. The gallery is
+generated from them (lightly perturbed copies, so every case is a distinct
+image) and served by a local stub of the backend; the camera is a synthetic
+video source that moves the first --probe-faces photos over a background;
+WhatsApp is a local stub too. Nothing leaves the machine. The run measures
+cold and warm startup (/api/start_detection with an empty and a filled
+encoding store), stream FPS as seen by MJPEG viewers, recognition latency
+percentiles per frame, time to the first delivered alert, and process
+memory. Results are compared against the stored baseline and the exit
+status is 1 if any metric regressed by more than --tolerance.
+
+Copies of one photo are the same person to the encoder, so cases are only
+told apart by identity group (the photo they were made from): any
+recognized name whose group the camera never showed is a misidentification
+and also fails the run.
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MODEL_DIR)
+
+DEFAULT_BASELINE = os.path.join(MODEL_DIR, 'benchmarks', 'baselines', 'end_to_end.json')
+SOURCE_ID = 'bench'
+
+# metric -> True if higher is better
+METRICS = {
+    'startup_cold_seconds': False,
+    'startup_warm_seconds': False,
+    'stream_fps': True,
+    'recognition_p50_ms': False,
+    'recognition_p95_ms': False,
+    'recognition_p99_ms': False,
+    'first_alert_seconds': False,
+    'rss_mb': False,
+}
+
+
+def load_faces(directory, size=160):
+    """Face photos from a directory, resized to `size` pixels wide"""
+    faces = []
+    for name in sorted(os.listdir(directory)):
+        image = cv2.imread(os.path.join(directory, name))
+        if image is not None:
+            faces.append(cv2.resize(image, (size, round(image.shape[0] * size / image.shape[1]))))
+    if not faces:
+        sys.exit(f"No images found in {directory}")
+    return faces
+
+
+def generate_cases(faces, count, seed=0):
+    """`count` approved cases in the backend's JSON shape, one perturbed face photo each
+
+    Case i is made from photo i % len(faces); see `identity_group`.
+    """
+    rng = np.random.default_rng(seed)
+    cases = []
+    for i in range(count):
+        noise = rng.integers(-3, 4, faces[i % len(faces)].shape)
+        image = np.clip(faces[i % len(faces)].astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        ok, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        cases.append({
+            'caseId': f'case-{i}',
+            'name': f'Person{i:05d}',
+            'adhaarNumber': f'{100000000000 + i}',
+            'contactNumber': f'{9000000000 + i}',
+            'status': 'approved',
+            'updatedAt': '2024-01-01T00:00:00.000Z',
+            'image': 'data:image/jpeg;base64,' + base64.b64encode(jpeg.tobytes()).decode(),
+        })
+    return cases
+
+
+def identity_group(name, photos):
+    """Index of the photo a generated case's name was made from"""
+    return int(name[len('Person'):]) % photos
+
+
+class StubServer:
+    """Local stand-in for the backend and the WhatsApp API, recording what it receives"""
+
+    def __init__(self, cases):
+        self.body = json.dumps(cases).encode()
+        self.case_ids = json.dumps([{'caseId': case['caseId']} for case in cases]).encode()
+        self.received = {'location_history': [], 'whatsapp': []}  # path kind -> arrival times
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, body, content_type='application/json'):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path.endswith('/cases/approved/face-recognition/ids'):
+                    self._reply(stub.case_ids)
+                elif url.path.endswith('/cases/approved/face-recognition'):
+                    self._reply(b'[]' if 'since=' in url.query else stub.body)
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path.endswith('/foundlocation/addlocationhistory'):
+                    stub.received['location_history'].append(time.time())
+                elif self.path.endswith('/messages/chat'):
+                    stub.received['whatsapp'].append(time.time())
+                else:
+                    self.send_error(404)
+                    return
+                self._reply(b'{"success": true}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='stub-backend', daemon=True).start()
+        return self
+
+
+class SyntheticCapture:
+    """cv2.VideoCapture replacement that renders faces moving over a noisy background at a fixed rate"""
+
+    def __init__(self, faces, width=1280, height=720, fps=25.0, seed=0):
+        self.faces = faces
+        self.width = width
+        self.height = height
+        self.fps = fps
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(40, 90, (height, width, 3), dtype=np.uint8)
+        self.index = 0
+        self.next_frame_at = None
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        now = time.perf_counter()
+        if self.next_frame_at is not None and now < self.next_frame_at:
+            time.sleep(self.next_frame_at - now)
+        self.next_frame_at = max(now, self.next_frame_at or now) + 1.0 / self.fps
+
+        frame = self.background.copy()
+        # A different face walks across the frame every 5 seconds
+        face = self.faces[(self.index // int(self.fps * 5)) % len(self.faces)]
+        height, width = face.shape[:2]
+        x = int((self.index * 4) % max(1, self.width - width))
+        y = (self.height - height) // 2
+        frame[y:y + height, x:x + width] = face
+        self.index += 1
+        return True, frame
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_FRAME_WIDTH: self.width,
+                cv2.CAP_PROP_FRAME_HEIGHT: self.height}.get(prop, 0.0)
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        pass
+
+
+def rss_mb():
+    """Current resident set size (Linux), else peak RSS"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def watch_stream(url, seconds, counts, index):
+    """Count MJPEG frames received from `url` for `seconds`"""
+    import requests
+
+    deadline = time.time() + seconds
+    tail = b''
+    with requests.get(url, stream=True, timeout=10) as response:
+        for chunk in response.iter_content(65536):
+            data = tail + chunk
+            counts[index] += data.count(b'--frame\r\n')
+            tail = data[-9:]
+            if time.time() >= deadline:
+                break
+
+
+def run(args):
+    faces = load_faces(args.faces)
+    cases = generate_cases(faces, args.gallery)
+    stub = StubServer(cases).start()
+    work_dir = tempfile.mkdtemp(prefix='milap-bench-')
+
+    os.environ.update({
+        'API_BASE_URL': f'{stub.url}/api',
+        'WHATSAPP_API_URL': f'{stub.url}/whatsapp',
+        'WHATSAPP_INSTANCE_ID': 'bench',
+        'WHATSAPP_API_TOKEN': 'bench',
+        'ENCODING_STORE_DIR': os.path.join(work_dir, 'encodings'),
+        'ALERT_QUEUE_PATH': os.path.join(work_dir, 'alerts.db'),
+        'CAMERA_SOURCES': f'{SOURCE_ID}=0',
+        'CAMERA_LOCATIONS': json.dumps({SOURCE_ID: {'latitude': 28.61, 'longitude': 77.21, 'city': 'Bench',
+                                                     'region': 'Bench', 'country': 'India'}}),
+        'GALLERY_SYNC_INTERVAL': '0',
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'WARNING'),
+    })
+    cv2.VideoCapture = lambda target: SyntheticCapture(faces[:args.probe_faces], args.width, args.height, args.fps)
+
+    rss_before = rss_mb()
+    import flask_app
+    from werkzeug.serving import make_server
+
+    flask_app.init_app()
+
+    latencies = []
+    recognized = set()
+    detect_frame = flask_app.detect_frame
+
+    def timed_detect_frame(*detect_args, **detect_kwargs):
+        started = time.perf_counter()
+        result = detect_frame(*detect_args, **detect_kwargs)
+        latencies.append(time.perf_counter() - started)
+        recognized.update(name for name in result[1] if name != 'Unknown')
+        return result
+
+    flask_app.detect_frame = timed_detect_frame
+
+    server = make_server('127.0.0.1', 0, flask_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='flask', daemon=True).start()
+    app_url = f'http://127.0.0.1:{server.server_port}'
+    client = flask_app.app.test_client()
+
+    def start_detection():
+        started = time.perf_counter()
+        response = client.post('/api/start_detection').get_json()
+        if response.get('status') != 'started':
+            sys.exit(f"start_detection failed: {response}")
+        return time.perf_counter() - started, response['loaded_faces']
+
+    startup_cold, loaded = start_detection()
+    client.post('/api/stop_detection')
+    startup_warm, _ = start_detection()
+    started_at = time.time()
+    print(f"Gallery: {loaded}/{args.gallery} faces loaded, cold start {startup_cold:.2f}s, warm {startup_warm:.2f}s")
+
+    counts = [0] * args.viewers
+    viewers = [threading.Thread(target=watch_stream, args=(f'{app_url}/video_feed', args.seconds, counts, i))
+               for i in range(args.viewers)]
+    for viewer in viewers:
+        viewer.start()
+    for viewer in viewers:
+        viewer.join()
+    rss_after = rss_mb()
+    client.post('/api/stop_detection')
+    server.shutdown()
+
+    alerts = stub.received['location_history']
+    shown = min(args.probe_faces, len(faces))
+    groups = {identity_group(name, len(faces)) for name in recognized}
+    return {
+        'startup_cold_seconds': round(startup_cold, 3),
+        'startup_warm_seconds': round(startup_warm, 3),
+        'stream_fps': round(sum(counts) / len(counts) / args.seconds, 2),
+        'recognition_p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'recognition_p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'recognition_p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'first_alert_seconds': round(alerts[0] - started_at, 3) if alerts else None,
+        'rss_mb': round(rss_after, 1),
+        'rss_growth_mb': round(rss_after - rss_before, 1),
+        'frames_recognized': len(latencies),
+        'alerts_delivered': len(alerts),
+        'whatsapp_delivered': len(stub.received['whatsapp']),
+        'identity_groups_recognized': len(groups & set(range(shown))),
+        'misidentified': sorted(name for name in recognized if identity_group(name, len(faces)) >= shown),
+        'config': {'gallery': args.gallery, 'seconds': args.seconds, 'viewers': args.viewers,
+                   'resolution': f'{args.width}x{args.height}', 'camera_fps': args.fps},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each metric against the baseline; returns the names of regressed metrics"""
+    if baseline.get('config') != results['config']:
+        print("⚠️ Baseline was recorded with a different configuration:", baseline.get('config'))
+    regressions = []
+    print(f"{'metric':<24}{'baseline':>12}{'now':>12}{'change':>10}")
+    for name, higher_is_better in METRICS.items():
+        before, now = baseline.get(name), results.get(name)
+        if not before or now is None:
+            print(f"{name:<24}{str(before):>12}{str(now):>12}")
+            continue
+        change = (now - before) / before
+        worse = -change if higher_is_better else change
+        flag = '  ❌' if worse > tolerance else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<24}{before:>12}{now:>12}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--faces', required=True, help='directory of photos with one face each')
+    parser.add_argument('--gallery', type=int, default=200, help='approved cases served by the stub backend')
+    parser.add_argument('--probe-faces', type=int, default=5, help='gallery faces shown to the synthetic camera')
+    parser.add_argument('--seconds', type=float, default=15, help='streaming time measured')
+    parser.add_argument('--viewers', type=int, default=1, help='concurrent /video_feed clients')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=float, default=25.0, help='synthetic camera frame rate')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='stored baseline results (JSON)')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed relative regression per metric')
+    parser.add_argument('--output', help='also write this run\'s results here')
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if results['misidentified']:
+        print(f"❌ Recognized as people the camera never showed: {', '.join(results['misidentified'])}")
+        sys.exit(1)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Gallery memory per case and match agreement for each storage precision
+
+Memory is the Python heap retained by the legacy layout (per-person float64
+arrays, parallel lists and a details dict, plus the float32 matcher copy)
+and by a columnar Gallery at float32 / float16 / int8, measured with
+tracemalloc once the ingested person dicts are gone.
+
+Agreement compares matches at the tolerance against exact float64 search.
+A precision may only change a decision when the exact best distance is
+within the reported max quantization error of the tolerance, or the two
+best candidates are within twice that error; any other change is counted as
+unexplained and fails the run. The gallery then goes through `--syncs`
+delta syncs (replacing and dropping 1% of the cases each), after which the
+reported bound must still cover every live row's distance from its
+original encoding.
+
+Usage (from the model directory):
+    python benchmarks/bench_gallery_memory.py
+    python benchmarks/bench_gallery_memory.py --size 100000 --probes 5000 --precisions float32 int8
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_matcher import DEFAULT_TOLERANCE, PRECISIONS, BruteForceMatcher  # noqa: E402
+from gallery import Gallery  # noqa: E402
+
+# Slack for float32 arithmetic in the distance GEMM, on top of the quantization bound
+ARITHMETIC_SLACK = 1e-5
+
+
+def synthetic_persons(size, seed=0):
+    """Person dicts shaped like ingest_cases output, with unit-norm float64 encodings"""
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0.0, 1.0, size=(size, 128))
+    encodings /= np.linalg.norm(encodings, axis=1, keepdims=True)
+    return [{
+        'name': f"Missing Person {i:07d}",
+        'phone': f"9{rng.integers(10 ** 8, 10 ** 9):09d}",
+        'adhaar': f"{rng.integers(10 ** 11, 10 ** 12):012d}",
+        'case_id': f"{rng.integers(2 ** 63):024x}",
+        'updated_at': f"2026-0{1 + i % 9}-1{i % 10}T10:{i % 60:02d}:00.000Z",
+        'encoding': encodings[i].copy(),
+    } for i in range(size)], encodings
+
+
+def legacy_layout(persons):
+    """What WebFaceRecognizer used to keep per gallery person"""
+    matcher = BruteForceMatcher().build([person['encoding'] for person in persons])
+    return {
+        'known_face_encodings': [person['encoding'] for person in persons],
+        'known_face_names': [person['name'] for person in persons],
+        'known_phone_numbers': [person['phone'] for person in persons],
+        'known_adhaar_numbers': [person['adhaar'] for person in persons],
+        'person_details_cache': {person['name'].lower(): {
+            'phone': person['phone'],
+            'adhaar': person['adhaar'],
+            'original_name': person['name'],
+            'case_id': person['case_id'],
+            'updated_at': person['updated_at'],
+        } for person in persons},
+        'matcher': matcher,
+    }
+
+
+def retained_bytes(size, build):
+    """Heap bytes still held by build(persons) once the person dicts are dropped"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        persons = synthetic_persons(size)[0]
+        structure = build(persons)
+        del persons
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del structure
+    return retained
+
+
+def exact_top2(probes, encodings, chunk=100):
+    """Best index, best distance and second-best distance per probe in float64"""
+    best = np.empty(len(probes), dtype=np.int64)
+    first = np.empty(len(probes))
+    second = np.empty(len(probes))
+    norms = np.einsum('ij,ij->i', encodings, encodings)
+    for start in range(0, len(probes), chunk):
+        block = probes[start:start + chunk]
+        sq = norms[np.newaxis, :] - 2.0 * block @ encodings.T + np.einsum('ij,ij->i', block, block)[:, np.newaxis]
+        top = np.argpartition(sq, 1, axis=1)[:, :2]
+        pair = np.take_along_axis(sq, top, axis=1)
+        order = np.argsort(pair, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        pair = np.sqrt(np.maximum(np.take_along_axis(pair, order, axis=1), 0.0))
+        best[start:start + chunk] = top[:, 0]
+        first[start:start + chunk] = pair[:, 0]
+        second[start:start + chunk] = pair[:, 1]
+    return best, first, second
+
+
+def synthetic_probes(encodings, count, seed=1):
+    """Noisy copies of gallery rows spread around the tolerance, plus a quarter of strangers"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(encodings), size=count, replace=count > len(encodings))
+    sigma = rng.uniform(0.03, 0.07, size=(count, 1))
+    probes = encodings[rows] + rng.normal(0.0, 1.0, size=(count, 128)) * sigma
+    strangers = rng.random(count) < 0.25
+    probes[strangers] = rng.normal(0.0, 1.0, size=(strangers.sum(), 128))
+    probes[strangers] /= np.linalg.norm(probes[strangers], axis=1, keepdims=True)
+    return probes
+
+
+def synced_error(gallery, syncs, seed=2):
+    """(reported, actual) max quantization error after `syncs` delta syncs
+
+    Each sync re-uploads 1% of the cases with new encodings and drops
+    another 1%; `actual` is measured against the original encodings.
+    """
+    rng = np.random.default_rng(seed)
+    originals = {person['name']: person['encoding'] for person in synthetic_persons(len(gallery))[0]}
+    for _ in range(syncs):
+        names = list(originals)
+        picked = rng.choice(len(names), size=max(2, len(names) // 50), replace=False)
+        half = len(picked) // 2
+        upserts = []
+        for i in picked[:half]:
+            encoding = rng.normal(0.0, 1.0, 128)
+            encoding /= np.linalg.norm(encoding)
+            upserts.append(dict(gallery.details(names[i]), encoding=encoding))
+            originals[names[i]] = encoding
+        removed = [names[i] for i in picked[half:]]
+        for name in removed:
+            del originals[name]
+        gallery = gallery.with_changes(upserts, removed)
+
+    stored = gallery.encodings
+    rows = np.array([gallery.row(name) for name in originals])
+    diff = stored[rows].astype(np.float64) - np.stack(list(originals.values()))
+    return gallery.matcher.max_error, float(np.sqrt(np.einsum('ij,ij->i', diff, diff).max()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=50000, help='gallery size')
+    parser.add_argument('--probes', type=int, default=2000)
+    parser.add_argument('--precisions', nargs='+', choices=PRECISIONS, default=list(PRECISIONS))
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--syncs', type=int, default=20, help='delta syncs applied before rechecking the bound')
+    args = parser.parse_args()
+
+    legacy = retained_bytes(args.size, legacy_layout) / args.size
+    print(f"{args.size} cases, legacy layout: {legacy:.0f} bytes/case")
+
+    _, encodings = synthetic_persons(args.size)
+    probes = synthetic_probes(encodings, args.probes)
+    exact_best, exact_first, exact_second = exact_top2(probes, encodings)
+    exact_indices = np.where(exact_first <= args.tolerance, exact_best, -1)
+    near = np.abs(exact_first - args.tolerance) <= 0.05
+    print(f"{args.probes} probes, {(exact_indices >= 0).sum()} exact matches, "
+          f"{near.sum()} within 0.05 of the tolerance")
+
+    print(f"{'precision':>9} {'bytes/case':>10} {'vs legacy':>9} {'max error':>10} {'max |dd|':>10} "
+          f"{'changed':>7} {'unexplained':>11} {'synced error':>12} {'covered':>7}")
+    failed = False
+    for precision in args.precisions:
+        per_case = retained_bytes(args.size, lambda persons: Gallery(persons, BruteForceMatcher(precision)))
+        per_case /= args.size
+
+        gallery = Gallery(synthetic_persons(args.size)[0], BruteForceMatcher(precision))
+        indices, distances = gallery.matcher.match(probes, tolerance=args.tolerance)
+        bound = gallery.matcher.max_error + ARITHMETIC_SLACK
+        changed = indices != exact_indices
+        explained = (np.abs(exact_first - args.tolerance) <= bound) | (exact_second - exact_first <= 2 * bound)
+        unexplained = int((changed & ~explained).sum())
+        failed |= unexplained > 0
+        # The best distance itself can only move by the bound
+        drift = float(np.abs(distances - exact_first).max())
+        reported, actual = synced_error(gallery, args.syncs)
+        covered = actual <= reported + ARITHMETIC_SLACK
+        failed |= not covered
+        print(f"{precision:>9} {per_case:>10.0f} {legacy / per_case:>8.1f}x {gallery.matcher.max_error:>10.5f} "
+              f"{drift:>10.5f} {int(changed.sum()):>7} {unexplained:>11} {reported:>12.5f} {'yes' if covered else 'NO':>7}")
+
+    if failed:
+        print("Match decisions changed outside the quantization error bound, or syncs broke the bound")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Per-frame match latency: legacy per-face compare_faces/face_distance vs batched matrix matching
+
+Usage (from the model directory):
+    python benchmarks/bench_matching.py
+    python benchmarks/bench_matching.py --sizes 1000 10000 100000 --faces 1 4 --repeats 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_matcher import DEFAULT_TOLERANCE, build_gallery_matrix, match_encodings  # noqa: E402
+
+
+def synthetic_encodings(count, rng):
+    """Random 128-d vectors with the same scale as dlib face encodings (norm ~ 1)"""
+    encodings = rng.normal(0.0, 1.0, size=(count, 128))
+    encodings /= np.linalg.norm(encodings, axis=1, keepdims=True)
+    return encodings
+
+
+def legacy_match(known_face_encodings, face_encodings, tolerance):
+    """What detect_faces used to do: compare_faces, then face_distance again, per face"""
+    indices = []
+    for face_encoding in face_encodings:
+        # face_recognition.compare_faces -> face_distance(list, enc) <= tolerance
+        matches = list(np.linalg.norm(np.array(known_face_encodings) - face_encoding, axis=1) <= tolerance)
+        best = -1
+        if True in matches:
+            face_distances = np.linalg.norm(np.array(known_face_encodings) - face_encoding, axis=1)
+            best_match_index = int(np.argmin(face_distances))
+            if matches[best_match_index]:
+                best = best_match_index
+        indices.append(best)
+    return np.array(indices)
+
+
+def time_call(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples)), float(np.percentile(samples, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--faces', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--skip-legacy', action='store_true', help='only time the batched matcher')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'gallery':>8} {'faces':>5} {'legacy p50':>11} {'legacy p95':>11} "
+          f"{'batched p50':>12} {'batched p95':>12} {'speedup':>8} {'agree':>6}")
+
+    for size in args.sizes:
+        gallery = synthetic_encodings(size, rng)
+        known_face_encodings = list(gallery)
+        matrix, norms = build_gallery_matrix(known_face_encodings)
+
+        for face_count in args.faces:
+            # Half the probes are noisy copies of gallery rows so both branches are exercised
+            probes = synthetic_encodings(face_count, rng)
+            hits = rng.choice(size, size=(face_count + 1) // 2, replace=False)
+            probes[:len(hits)] = gallery[hits] + rng.normal(0.0, 0.02, size=(len(hits), 128))
+            probes = list(probes)
+
+            batched_p50, batched_p95 = time_call(
+                lambda: match_encodings(matrix, norms, probes, DEFAULT_TOLERANCE), args.repeats)
+            batched, _ = match_encodings(matrix, norms, probes, DEFAULT_TOLERANCE)
+
+            if args.skip_legacy:
+                print(f"{size:>8} {face_count:>5} {'-':>11} {'-':>11} "
+                      f"{batched_p50:>10.3f}ms {batched_p95:>10.3f}ms {'-':>8} {'-':>6}")
+                continue
+
+            legacy_p50, legacy_p95 = time_call(
+                lambda: legacy_match(known_face_encodings, probes, DEFAULT_TOLERANCE), args.repeats)
+            legacy = legacy_match(known_face_encodings, probes, DEFAULT_TOLERANCE)
+            agree = 'yes' if np.array_equal(legacy, batched) else 'NO'
+
+            print(f"{size:>8} {face_count:>5} {legacy_p50:>9.3f}ms {legacy_p95:>9.3f}ms "
+                  f"{batched_p50:>10.3f}ms {batched_p95:>10.3f}ms {legacy_p50 / batched_p50:>7.1f}x {agree:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Append-only arrays shared between gallery snapshots
+
+Gallery syncs add a handful of rows to galleries of hundreds of thousands.
+An `AppendArray` lets each new snapshot write its rows past the end of the
+previous snapshot's storage instead of copying it: every snapshot only reads
+the first `len()` rows, which are never written again.
+"""
+import threading
+
+import numpy as np
+
+_append_lock = threading.Lock()
+
+
+class _Storage:
+    __slots__ = ('array', 'length')
+
+    def __init__(self, array, length):
+        self.array = array
+        self.length = length  # Rows written so far, by the newest snapshot
+
+
+class AppendArray:
+    """Read-only view of the first rows of a growable array"""
+
+    def __init__(self, array):
+        array = np.asarray(array)
+        self._storage = _Storage(np.array(array), len(array))
+        self._length = len(array)
+
+    @classmethod
+    def _view(cls, storage, length):
+        instance = cls.__new__(cls)
+        instance._storage = storage
+        instance._length = length
+        return instance
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def dtype(self):
+        return self._storage.array.dtype
+
+    @property
+    def nbytes(self):
+        """Bytes of the underlying storage, including room reserved for appends"""
+        return self._storage.array.nbytes
+
+    def array(self):
+        """The rows of this snapshot as an ndarray (no copy)"""
+        return self._storage.array[:self._length]
+
+    def appended(self, rows):
+        """New view with `rows` added; this view is unchanged
+
+        Appending to the newest view writes in place, growing the storage by
+        an eighth when it is full, so a sync costs O(rows added). Appending
+        to an older view, which would overwrite rows a newer view owns,
+        copies its rows to new storage first.
+        """
+        storage = self._storage
+        rows = np.asarray(rows, dtype=storage.array.dtype).reshape((-1,) + storage.array.shape[1:])
+        end = self._length + len(rows)
+        with _append_lock:
+            if storage.length != self._length or end > len(storage.array):
+                grown = np.empty((max(end, self._length + self._length // 8, 16),) + storage.array.shape[1:], storage.array.dtype)
+                grown[:self._length] = storage.array[:self._length]
+                if storage.length == self._length:
+                    # Older views keep reading the old array, whose rows are identical
+                    storage.array = grown
+                else:
+                    storage = _Storage(grown, self._length)
+            storage.array[self._length:end] = rows
+            storage.length = end
+        return AppendArray._view(storage, end)
+
+
+class StringColumn:
+    """Read-only column of strings packed into one UTF-8 buffer
+
+    Each row is an offset and length into the buffer (length -1 for None);
+    equal values in one batch of rows are stored once. Values are read back
+    as str.
+    """
+
+    def __init__(self, values=()):
+        data, offsets, lengths = self._pack(values, 0)
+        self._data = AppendArray(np.frombuffer(data, dtype=np.uint8))
+        self._offsets = AppendArray(offsets)
+        self._lengths = AppendArray(lengths)
+
+    @staticmethod
+    def _pack(values, base):
+        interned = {}  # value -> index into the unique values
+        ids = np.fromiter((-1 if value is None else interned.setdefault(str(value), len(interned))
+                           for value in values), dtype=np.int64)
+        data = [value.encode('utf-8') for value in interned]
+        sizes = np.fromiter(map(len, data), dtype=np.int64, count=len(data))
+        starts = np.zeros(len(data) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=starts[1:])
+        # Row -1 (None) picks the sentinel appended to each array
+        offsets = (starts + base)[ids].astype(np.uint32)  # The buffer holds up to 4 GB of text
+        return b''.join(data), offsets, np.append(sizes, -1)[ids].astype(np.int32)
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def __getitem__(self, row):
+        length = int(self._lengths.array()[row])
+        if length < 0:
+            return None
+        offset = int(self._offsets.array()[row])
+        return self._data.array()[offset:offset + length].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        data = self._data.array().tobytes()
+        for offset, length in zip(self._offsets.array().tolist(), self._lengths.array().tolist()):
+            yield None if length < 0 else data[offset:offset + length].decode('utf-8')
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes + self._offsets.nbytes + self._lengths.nbytes
+
+    def appended(self, values):
+        """New column with `values` added after the existing rows"""
+        data, offsets, lengths = self._pack(values, len(self._data))
+        column = StringColumn.__new__(StringColumn)
+        column._data = self._data.appended(np.frombuffer(data, dtype=np.uint8))
+        column._offsets = self._offsets.appended(offsets)
+        column._lengths = self._lengths.appended(lengths)
+        return column
+
+    def take(self, rows):
+        """New column holding only `rows`, in that order"""
+        values = list(self)
+        return StringColumn(values[row] for row in rows)
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from face_matcher import DEFAULT_TOLERANCE, match_encodings
+
+# Per-worker caches of the memory mappings opened so far, one per frame slot
+_worker_frames = {}
+_worker_gallery = {'path': None, 'matrix': None, 'norms': None}
+_worker_detector = None
+
+
+def _shared_dir():
+    """tmpfs when available so frame and gallery files never touch the disk"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    return tempfile.mkdtemp(prefix='milap-detect-', dir=base)
+
+
+def _map_frame(path, shape, dtype):
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    buffer = _worker_frames.get(path)
+    if buffer is None or buffer.size < nbytes:  # Slot files only grow, so remap only then
+        buffer = np.memmap(path, mode='r', dtype=np.uint8)
+        _worker_frames[path] = buffer
+    return buffer[:nbytes].view(dtype).reshape(shape)
+
+
+def _map_gallery(path):
+    if _worker_gallery['path'] != path:
+        data = np.load(path, mmap_mode='r')
+        _worker_gallery.update(path=path, matrix=data[:, :-1], norms=data[:, -1])
+    return _worker_gallery['matrix'], _worker_gallery['norms']
+
+
+def _init_worker(detector_kind, detector_options):
+    from detectors import create_detector  # Loads dlib, which only the workers need
+
+    global _worker_detector
+    _worker_detector = create_detector(detector_kind, **detector_options)
+
+
+def _detect_in_worker(frame_path, shape, dtype, gallery_path, tolerance, scale=0.25):
+    """Runs in a pool process: detect, encode and (when given a gallery) match"""
+    from face_detection import locate_and_encode
+
+    frame = _map_frame(frame_path, shape, dtype)
+    face_locations, face_encodings = locate_and_encode(frame, scale, _worker_detector)
+    if gallery_path is None:
+        return face_locations, [np.asarray(e, dtype=np.float32) for e in face_encodings], None
+    matrix, norms = _map_gallery(gallery_path)
+    best_indices, _ = match_encodings(matrix, norms, face_encodings, tolerance)
+    return face_locations, None, best_indices
+
+
+class FrameSlot:
+    """A file mapping the parent writes frames into and workers map read-only
+
+    Frames (full frames or ROI crops) are written at the start of the file,
+    which grows to the largest frame seen and is never shrunk, so changing
+    crop sizes reuse one mapping on each side instead of remapping per frame.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.shape = None
+        self.dtype = None
+        self._buffer = None
+
+    def write(self, frame):
+        if self._buffer is None or self._buffer.size < frame.nbytes:
+            self._buffer = np.memmap(self.path, mode='w+', dtype=np.uint8, shape=frame.nbytes)
+        self.shape = frame.shape
+        self.dtype = str(frame.dtype)
+        self._buffer[:frame.nbytes].view(frame.dtype).reshape(frame.shape)[...] = frame
+
+
+class DetectionPool:
+    """Face detection and encoding in a pool of worker processes
+
+    HOG detection and dlib encoding hold the GIL, so one process can only
+    use one core for them. Frames are handed to the workers through
+    memory-mapped files on tmpfs instead of being pickled, and the gallery
+    matrix is published the same way: every worker maps it read-only and
+    matches locally, returning only boxes and gallery row indices. Matchers
+    without a plain gallery matrix (e.g. IVF) get the encodings back and
+    match in the calling process.
+    """
+
+    def __init__(self, workers, tolerance=DEFAULT_TOLERANCE, detector='hog', detector_options=None):
+        self.workers = workers
+        self.tolerance = tolerance
+        self._dir = _shared_dir()
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(detector, detector_options or {}))
+        self._slots = queue.Queue()
+        for i in range(workers):
+            self._slots.put(FrameSlot(os.path.join(self._dir, f'frame-{i}.bin')))
+        self._gallery_lock = threading.Lock()
+        self._gallery_matcher = None
+        self._gallery_path = None
+        self._previous_gallery_path = None
+        self._gallery_version = 0
+
+    def _publish_gallery(self, matcher):
+        """Path of the mapped gallery for this matcher, written once per matcher"""
+        if getattr(matcher, 'gallery_matrix', None) is None:
+            return None
+        with self._gallery_lock:
+            if matcher is not self._gallery_matcher:
+                self._gallery_version += 1
+                path = os.path.join(self._dir, f'gallery-{self._gallery_version}.npy')
+                data = np.hstack([matcher.gallery_matrix, matcher.gallery_norms[:, np.newaxis]])
+                np.save(path, data.astype(np.float32))
+                # Keep the previous file for calls already in flight; mapped files stay valid
+                if self._previous_gallery_path:
+                    try:
+                        os.remove(self._previous_gallery_path)
+                    except OSError:
+                        pass
+                self._previous_gallery_path = self._gallery_path
+                self._gallery_matcher = matcher
+                self._gallery_path = path
+            return self._gallery_path
+
+    def detect(self, frame, matcher, scale=0.25):
+        """Returns (face_locations, best_indices) like a local detect + match"""
+        gallery_path = self._publish_gallery(matcher)
+        slot = self._slots.get()
+        try:
+            slot.write(frame)
+            future = self._executor.submit(
+                _detect_in_worker, slot.path, slot.shape, slot.dtype, gallery_path, self.tolerance, scale)
+            face_locations, face_encodings, best_indices = future.result()
+        finally:
+            self._slots.put(slot)
+
+        if best_indices is None:
+            best_indices, _ = matcher.match(face_encodings, tolerance=self.tolerance)
+        return face_locations, best_indices
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self._dir, ignore_errors=True)
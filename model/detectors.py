@@ -0,0 +1,119 @@
+import os
+import threading
+
+import cv2
+import face_recognition
+
+
+def boxes_to_locations(boxes, shape):
+    """Convert OpenCV (x, y, w, h) boxes to clipped (top, right, bottom, left) tuples"""
+    height, width = shape[:2]
+    locations = []
+    for x, y, w, h in boxes:
+        top, left = max(0, int(y)), max(0, int(x))
+        bottom, right = min(height, int(y + h)), min(width, int(x + w))
+        if bottom > top and right > left:
+            locations.append((top, right, bottom, left))
+    return locations
+
+
+class HogDetector:
+    """dlib HOG + linear SVM, face_recognition's default; CPU friendly, frontal faces only"""
+
+    name = 'hog'
+
+    def __init__(self, upsample=1):
+        self.upsample = upsample
+
+    def locate(self, rgb_image):
+        return face_recognition.face_locations(rgb_image, self.upsample, model='hog')
+
+
+class CnnDetector:
+    """dlib's max-margin CNN detector; more robust to pose, much slower on CPU"""
+
+    name = 'cnn'
+
+    def __init__(self, upsample=0):
+        self.upsample = upsample
+
+    def locate(self, rgb_image):
+        return face_recognition.face_locations(rgb_image, self.upsample, model='cnn')
+
+
+class YuNetDetector:
+    """OpenCV DNN face detector (YuNet ONNX model via cv2.FaceDetectorYN)
+
+    The model file is not bundled; download face_detection_yunet_2023mar.onnx
+    from the OpenCV model zoo and point FACE_DETECTOR_MODEL at it.
+    """
+
+    name = 'yunet'
+
+    def __init__(self, model_path='./models/face_detection_yunet_2023mar.onnx',
+                 score_threshold=0.8, nms_threshold=0.3):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet model not found at {model_path}")
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self._local = threading.local()  # The OpenCV detector keeps per-call state
+
+    def _detector(self, width, height):
+        detector = getattr(self._local, 'detector', None)
+        if detector is None:
+            detector = cv2.FaceDetectorYN.create(self.model_path, "", (width, height),
+                                                 self.score_threshold, self.nms_threshold)
+            self._local.detector = detector
+        detector.setInputSize((width, height))
+        return detector
+
+    def locate(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+        bgr_image = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2BGR)
+        _, faces = self._detector(width, height).detect(bgr_image)
+        if faces is None:
+            return []
+        return boxes_to_locations(faces[:, :4], rgb_image.shape)
+
+
+class HaarDetector:
+    """OpenCV Haar cascade; the cheapest option, with the most false positives"""
+
+    name = 'haar'
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=20):
+        self.cascade_path = cascade_path or os.path.join(cv2.data.haarcascades,
+                                                         'haarcascade_frontalface_default.xml')
+        if not os.path.exists(self.cascade_path):
+            raise FileNotFoundError(f"Haar cascade not found at {self.cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self._local = threading.local()
+
+    def locate(self, rgb_image):
+        cascade = getattr(self._local, 'cascade', None)
+        if cascade is None:
+            cascade = self._local.cascade = cv2.CascadeClassifier(self.cascade_path)
+        gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+        boxes = cascade.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                         minSize=(self.min_size, self.min_size))
+        return boxes_to_locations(boxes, rgb_image.shape)
+
+
+DETECTORS = {
+    HogDetector.name: HogDetector,
+    CnnDetector.name: CnnDetector,
+    YuNetDetector.name: YuNetDetector,
+    HaarDetector.name: HaarDetector,
+}
+
+
+def create_detector(kind='hog', **options):
+    """Create a face detector backend by name ('hog', 'cnn', 'yunet' or 'haar')"""
+    try:
+        detector_cls = DETECTORS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown face detector '{kind}', expected one of {sorted(DETECTORS)}")
+    return detector_cls(**options)
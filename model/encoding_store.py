@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from app_logging import get_logger
+
+log = get_logger('encoding_store')
+
+ENCODING_DIM = 128
+MANIFEST_VERSION = 1
+
+
+def content_hash(image_bytes):
+    """Hash raw image bytes so re-downloaded but unchanged images hit the cache"""
+    return hashlib.sha1(image_bytes).hexdigest()
+
+
+class EncodingStore:
+    """On-disk cache of face encodings keyed by (name, adhaar, image content hash)
+
+    Encodings live in a single .npy matrix that is memory-mapped on load, and
+    a small JSON manifest maps each key to its row. Images in which no face
+    was found are recorded with row -1 so they are not re-encoded either.
+    """
+
+    def __init__(self, store_dir="./encodings"):
+        self.store_dir = store_dir
+        self.encodings_path = os.path.join(store_dir, "encodings.npy")
+        self.manifest_path = os.path.join(store_dir, "manifest.json")
+        self._rows = {}          # key -> row index (-1 when no face was found)
+        self._matrix = None      # memory-mapped encodings from the last flush
+        self._records = {}       # key -> encoding (or None) seen in this load
+        self._dirty = False
+        self.hits = 0
+
+    @staticmethod
+    def _key(name, adhaar, image_hash):
+        return f"{name}|{adhaar}|{image_hash}"
+
+    def open(self):
+        """Load the manifest and memory-map the stored encodings"""
+        self._rows = {}
+        self._matrix = None
+        self._records = {}
+        self._dirty = False
+        self.hits = 0
+
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.encodings_path)):
+            return 0
+
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                log.warning("Encoding store format changed, rebuilding cache...")
+                return 0
+
+            matrix = np.load(self.encodings_path, mmap_mode="r")
+            if matrix.ndim != 2 or matrix.shape[1] != ENCODING_DIM:
+                log.warning("Unexpected encoding store shape %s, rebuilding cache...", matrix.shape)
+                return 0
+
+            for entry in manifest.get("entries", []):
+                row = int(entry["row"])
+                if row >= len(matrix):
+                    continue
+                self._rows[self._key(entry["name"], entry["adhaar"], entry["hash"])] = row
+            self._matrix = matrix
+        except Exception as e:
+            log.warning("Could not read encoding store, rebuilding cache: %s", e)
+            self._rows = {}
+            self._matrix = None
+
+        return len(self._rows)
+
+    def lookup(self, name, adhaar, image_hash):
+        """Return (hit, encoding); encoding is None for images with no face"""
+        row = self._rows.get(self._key(name, adhaar, image_hash))
+        if row is None:
+            return False, None
+        self.hits += 1
+        if row < 0:
+            return True, None
+        return True, self._matrix[row]
+
+    def put(self, name, adhaar, image_hash, encoding):
+        """Record the encoding used for this key in the current load"""
+        key = self._key(name, adhaar, image_hash)
+        if key not in self._rows:
+            self._dirty = True
+        self._records[key] = (name, adhaar, image_hash, encoding)
+
+    def flush(self):
+        """Persist the current load if anything was added or removed"""
+        if not self._dirty and len(self._records) == len(self._rows):
+            return False
+
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        entries = []
+        rows = []
+        for name, adhaar, image_hash, encoding in self._records.values():
+            row = -1
+            if encoding is not None:
+                row = len(rows)
+                rows.append(np.asarray(encoding, dtype=np.float64))
+            entries.append({"name": name, "adhaar": adhaar, "hash": image_hash, "row": row})
+
+        matrix = np.stack(rows) if rows else np.empty((0, ENCODING_DIM), dtype=np.float64)
+
+        # Drop the old mapping before replacing the file underneath it
+        self._matrix = None
+
+        tmp_encodings = self.encodings_path + ".tmp"
+        tmp_manifest = self.manifest_path + ".tmp"
+        with open(tmp_encodings, "wb") as f:
+            np.save(f, matrix)
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "dim": ENCODING_DIM, "entries": entries}, f)
+        os.replace(tmp_encodings, self.encodings_path)
+        os.replace(tmp_manifest, self.manifest_path)
+
+        self._rows = {self._key(e["name"], e["adhaar"], e["hash"]): e["row"] for e in entries}
+        self._matrix = np.load(self.encodings_path, mmap_mode="r")
+        # Point the records at the mapped rows so computed encodings are not kept in memory
+        self._records = {
+            key: (name, adhaar, image_hash, self._matrix[self._rows[key]] if self._rows[key] >= 0 else None)
+            for key, (name, adhaar, image_hash, _) in self._records.items()}
+        self._dirty = False
+        return True
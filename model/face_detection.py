@@ -0,0 +1,63 @@
+import cv2
+import face_recognition
+import numpy as np
+
+from detectors import HogDetector
+
+default_detector = HogDetector()
+
+
+def prepare_frame(frame, scale=0.25):
+    """Downscaled RGB copy of a BGR frame for detection and encoding"""
+    # Resize for faster processing
+    small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    return cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+
+def locate_faces(rgb_small_frame, detector=None):
+    """Face boxes in the downscaled frame"""
+    return (detector or default_detector).locate(rgb_small_frame)
+
+
+def encode_faces(rgb_small_frame, face_locations):
+    """128-d encodings of the given boxes in the downscaled frame"""
+    if not face_locations:
+        return []
+    return face_recognition.face_encodings(rgb_small_frame, face_locations)
+
+
+def encode_faces_batch(rgb_small_frames, face_locations_list):
+    """Encode the faces of several frames in one dlib call; returns one list of encodings per frame"""
+    landmarks = [face_recognition.api._raw_face_landmarks(rgb_small_frame, face_locations, model="small")
+                 for rgb_small_frame, face_locations in zip(rgb_small_frames, face_locations_list)]
+    try:
+        descriptors = face_recognition.api.face_encoder.compute_face_descriptor(rgb_small_frames, landmarks, 1)
+    except TypeError:
+        # dlib builds without the batched overload
+        return [encode_faces(rgb_small_frame, face_locations)
+                for rgb_small_frame, face_locations in zip(rgb_small_frames, face_locations_list)]
+    return [[np.array(descriptor) for descriptor in frame_descriptors] for frame_descriptors in descriptors]
+
+
+def scale_locations(face_locations, scale=0.25):
+    """Map (top, right, bottom, left) boxes from the downscaled frame back to full size"""
+    factor = 1.0 / scale
+    return [(int(top * factor), int(right * factor), int(bottom * factor), int(left * factor))
+            for (top, right, bottom, left) in face_locations]
+
+
+def offset_locations(face_locations, top, left):
+    """Shift boxes found in a crop back into full-frame coordinates"""
+    return [(t + top, r + left, b + top, l + left) for (t, r, b, l) in face_locations]
+
+
+def locate_and_encode(frame, scale=0.25, detector=None):
+    """Find faces in a BGR frame and encode them
+
+    Detection runs on a downscaled copy; returned locations are scaled back
+    to the full frame as (top, right, bottom, left) tuples.
+    """
+    rgb_small_frame = prepare_frame(frame, scale)
+    face_locations = locate_faces(rgb_small_frame, detector)
+    face_encodings = encode_faces(rgb_small_frame, face_locations)
+    return scale_locations(face_locations, scale), face_encodings
@@ -0,0 +1,465 @@
+import copy
+
+import numpy as np
+
+from columns import AppendArray
+
+DEFAULT_TOLERANCE = 0.6
+ENCODING_DIM = 128
+PRECISIONS = ('float32', 'float16', 'int8')
+
+
+def build_gallery_matrix(encodings):
+    """Stack encodings into one contiguous float32 matrix plus squared row norms"""
+    if len(encodings) == 0:
+        return np.empty((0, ENCODING_DIM), dtype=np.float32), np.empty(0, dtype=np.float32)
+    matrix = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32))
+    norms = np.einsum('ij,ij->i', matrix, matrix)
+    return matrix, norms
+
+
+def quantize(matrix, precision='float32'):
+    """(codes, scales) storing float32 rows at `precision`; scales is None except for int8
+
+    int8 keeps one float32 scale per row (max |x| / 127), so every code is
+    within half a step of its value.
+    """
+    if precision == 'float32':
+        return matrix, None
+    if precision == 'float16':
+        return matrix.astype(np.float16), None
+    if precision == 'int8':
+        scales = (np.abs(matrix).max(axis=1) / 127.0).astype(np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(matrix / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown gallery precision '{precision}', expected one of {list(PRECISIONS)}")
+
+
+def dequantize(codes, scales):
+    """float32 rows back from quantize() output (float32 codes are returned as-is)"""
+    if scales is not None:
+        return codes.astype(np.float32) * scales[:, np.newaxis]
+    return codes if codes.dtype == np.float32 else codes.astype(np.float32)
+
+
+def quantization_error(matrix, codes, scales, chunk_size=16384):
+    """Largest L2 distance between a row and its stored value
+
+    The triangle inequality bounds every query distance by it:
+    |d(q, stored) - d(q, x)| <= max_error. So a face whose exact distance to
+    its best match is further than max_error from the tolerance gets the
+    same decision, and the identity can only change when the two best
+    candidates are within 2 * max_error of each other.
+    """
+    if codes.dtype == np.float32 or len(matrix) == 0:
+        return 0.0
+    worst = 0.0
+    for start in range(0, len(matrix), chunk_size):
+        end = start + chunk_size
+        stored = dequantize(codes[start:end], None if scales is None else scales[start:end])
+        diff = matrix[start:end].astype(np.float64) - stored
+        worst = max(worst, float(np.sqrt(np.einsum('ij,ij->i', diff, diff).max())))
+    return worst
+
+
+def squared_distances(queries, matrix, norms):
+    """All pairwise squared L2 distances between queries and matrix rows via one GEMM"""
+    query_norms = np.einsum('ij,ij->i', queries, queries)
+    sq_distances = queries @ matrix.T
+    sq_distances *= -2.0
+    sq_distances += norms[np.newaxis, :]
+    sq_distances += query_norms[:, np.newaxis]
+    return sq_distances
+
+
+def match_encodings(gallery, gallery_norms, face_encodings, tolerance=DEFAULT_TOLERANCE):
+    """Score every face in a frame against the gallery in one batched pass
+
+    Returns (best_indices, best_distances) where best_indices is -1 for faces
+    with no gallery entry within tolerance. This matches compare_faces +
+    argmin(face_distance): a face is recognized when its nearest gallery
+    encoding is at most `tolerance` away.
+    """
+    faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, gallery.shape[1])
+    if len(faces) == 0 or len(gallery) == 0:
+        return (np.full(len(faces), -1, dtype=np.int64),
+                np.full(len(faces), np.inf, dtype=np.float32))
+
+    sq_distances = squared_distances(faces, gallery, gallery_norms)
+    best_indices = np.argmin(sq_distances, axis=1)
+    best_sq = sq_distances[np.arange(len(faces)), best_indices]
+    best_distances = np.sqrt(np.maximum(best_sq, 0.0))
+
+    best_indices = np.where(best_distances <= tolerance, best_indices, -1)
+    return best_indices, best_distances
+
+
+class EncodingTable:
+    """Gallery encodings as a matcher stores them, in gallery row order
+
+    Rows are quantized once, when they are added, and are only appended
+    (see columns.AppendArray). A removed row keeps its codes but gets an
+    infinite norm, so every distance to it is infinite and it never matches.
+    `max_error` is the quantization bound over every row ever added, so it
+    stays true across syncs.
+    """
+
+    def __init__(self, precision='float32'):
+        codes, scales = quantize(np.empty((0, ENCODING_DIM), dtype=np.float32), precision)  # Validates precision
+        self.precision = precision
+        self.codes = AppendArray(codes)
+        self.scales = AppendArray(np.empty(0, dtype=np.float32)) if precision == 'int8' else None
+        self.norms = np.empty(0, dtype=np.float32)
+        self.max_error = 0.0
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.norms)
+
+    @property
+    def live(self):
+        """Rows that have not been removed"""
+        return len(self.norms) - self.removed
+
+    @property
+    def nbytes(self):
+        scales = 0 if self.scales is None else self.scales.nbytes
+        return self.codes.nbytes + scales + self.norms.nbytes
+
+    def appended(self, encodings, removed_rows=()):
+        """New table with `encodings` added as the next rows and `removed_rows` masked out
+
+        Only the new rows are quantized; existing codes are shared with this
+        table, and only the (4 bytes per row) norms are copied.
+        """
+        matrix, _ = build_gallery_matrix(encodings)
+        codes, scales = quantize(matrix, self.precision)
+        stored = dequantize(codes, scales)
+        table = copy.copy(self)
+        table.codes = self.codes.appended(codes)
+        table.scales = None if scales is None else self.scales.appended(scales)
+        norms = np.concatenate([self.norms, np.einsum('ij,ij->i', stored, stored)])
+        removed_rows = np.asarray(removed_rows, dtype=np.int64)
+        table.removed = self.removed + int(np.isfinite(norms[removed_rows]).sum())
+        norms[removed_rows] = np.inf
+        table.norms = norms
+        table.max_error = max(self.max_error, quantization_error(matrix, codes, scales))
+        return table
+
+    def taken(self, rows):
+        """New table holding only `rows`, in that order, with their codes and the error bound kept"""
+        rows = np.asarray(rows, dtype=np.int64)
+        table = copy.copy(self)
+        table.codes = AppendArray(self.codes.array()[rows])
+        table.scales = None if self.scales is None else AppendArray(self.scales.array()[rows])
+        table.norms = self.norms[rows]
+        table.removed = int(np.isinf(table.norms).sum())
+        return table
+
+    def rows(self, start=0, end=None):
+        """Stored rows [start, end) as float32"""
+        scales = None if self.scales is None else self.scales.array()[start:end]
+        return dequantize(self.codes.array()[start:end], scales)
+
+    def take(self, rows):
+        """Stored values of the given rows as float32"""
+        scales = None if self.scales is None else self.scales.array()[rows]
+        return dequantize(self.codes.array()[rows], scales)
+
+
+def match_table(table, face_encodings, tolerance=DEFAULT_TOLERANCE, chunk_size=16384):
+    """match_encodings over an EncodingTable, dequantizing `chunk_size` rows at a time"""
+    faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+    best_indices = np.full(len(faces), -1, dtype=np.int64)
+    best_sq = np.full(len(faces), np.inf, dtype=np.float32)
+    if len(faces) == 0 or len(table) == 0:
+        return best_indices, best_sq
+    if table.precision == 'float32':
+        return match_encodings(table.codes.array(), table.norms, faces, tolerance)
+
+    faces_range = np.arange(len(faces))
+    for start in range(0, len(table), chunk_size):
+        end = start + chunk_size
+        sq = squared_distances(faces, table.rows(start, end), table.norms[start:end])
+        nearest = np.argmin(sq, axis=1)
+        nearest_sq = sq[faces_range, nearest]
+        better = nearest_sq < best_sq
+        best_sq[better] = nearest_sq[better]
+        best_indices[better] = nearest[better] + start
+
+    best_distances = np.sqrt(np.maximum(best_sq, 0.0))
+    return np.where(best_distances <= tolerance, best_indices, -1), best_distances
+
+
+class BruteForceMatcher:
+    """Exact nearest-neighbour search over the whole gallery
+
+    With a float16 or int8 `precision` the gallery is stored quantized and
+    dequantized `chunk_size` rows at a time while matching; distances are
+    exact for the stored values, which are at most `max_error` away from the
+    original encodings (see quantization_error).
+
+    Matchers are snapshots: `updated` returns a new matcher for a gallery
+    change and leaves this one as it was.
+    """
+
+    name = 'brute'
+
+    def __init__(self, precision='float32', chunk_size=16384):
+        self.precision = precision
+        self.chunk_size = chunk_size
+        self.table = EncodingTable(precision)
+
+    def __len__(self):
+        return self.table.live
+
+    @property
+    def max_error(self):
+        return self.table.max_error
+
+    @property
+    def nbytes(self):
+        """Bytes held for the gallery (codes, scales and norms)"""
+        return self.table.nbytes
+
+    @property
+    def gallery_matrix(self):
+        """float32 rows for shared-memory detection workers, or None when the gallery is quantized"""
+        return self.table.codes.array() if self.precision == 'float32' else None
+
+    @property
+    def gallery_norms(self):
+        return self.table.norms
+
+    def build(self, encodings):
+        self.table = EncodingTable(self.precision).appended(encodings)
+        return self
+
+    def updated(self, encodings, removed_rows=()):
+        """New matcher with `encodings` appended as the next rows and `removed_rows` dropped"""
+        matcher = copy.copy(self)
+        matcher.table = self.table.appended(encodings, removed_rows)
+        return matcher
+
+    def taken(self, rows):
+        """New matcher over only `rows` (renumbered in that order), without requantizing"""
+        matcher = copy.copy(self)
+        matcher.table = self.table.taken(rows)
+        return matcher
+
+    def encodings(self):
+        """Stored rows as a float32 matrix, in row order (removed rows included)"""
+        return self.table.rows()
+
+    def match(self, face_encodings, tolerance=DEFAULT_TOLERANCE):
+        return match_table(self.table, face_encodings, tolerance, self.chunk_size)
+
+
+def _nearest_centroids(data, centroids, centroid_norms, chunk_size=8192):
+    """Index of the nearest centroid for every row, computed in bounded-memory chunks"""
+    assignments = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        assignments[start:start + chunk_size] = np.argmin(
+            squared_distances(chunk, centroids, centroid_norms), axis=1)
+    return assignments
+
+
+def kmeans(data, k, iterations=10, seed=0):
+    """Plain Lloyd's k-means returning float32 centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assignments = _nearest_centroids(data, centroids, centroid_norms)
+
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[filled] = sums / counts[filled, np.newaxis]
+
+        # Re-seed empty cells with random points so every list stays useful
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), size=len(empty), replace=False)]
+
+    return centroids.astype(np.float32)
+
+
+class IVFMatcher:
+    """Approximate search with an inverted file over k-means coarse cells
+
+    The gallery is partitioned into `nlist` cells; a query is compared exactly
+    against the rows of its `nprobe` nearest cells only. A returned match is
+    always within tolerance, but a true match in an unprobed cell can be
+    missed, so recall is traded for speed through `nprobe`. Galleries smaller
+    than `min_gallery` are searched exhaustively.
+
+    Rows added by `updated` are assigned to the existing cells; k-means is
+    only rerun once more than `retrain_ratio` of the trained gallery has been
+    added since the last training.
+    """
+
+    name = 'ivf'
+
+    def __init__(self, nlist=0, nprobe=8, min_gallery=5000, train_size=64, iterations=10, seed=0,
+                 precision='float32', retrain_ratio=0.1):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_gallery = min_gallery
+        self.train_size = train_size
+        self.iterations = iterations
+        self.seed = seed
+        self.precision = precision
+        self.retrain_ratio = retrain_ratio
+        self.table = EncodingTable(precision)
+        self.centroids = None
+        self.trained_rows = 0
+
+    def __len__(self):
+        return self.table.live
+
+    @property
+    def max_error(self):
+        return self.table.max_error
+
+    @property
+    def nbytes(self):
+        if self.centroids is None:
+            return self.table.nbytes
+        return (self.table.nbytes + self.centroids.nbytes + self.list_rows.nbytes + self.list_offsets.nbytes
+                + self.delta_rows.nbytes + self.delta_cells.nbytes + self.delta_offsets.nbytes)
+
+    def build(self, encodings):
+        self.table = EncodingTable(self.precision).appended(encodings)
+        self._train()
+        return self
+
+    def updated(self, encodings, removed_rows=()):
+        """New matcher with `encodings` appended as the next rows and `removed_rows` dropped"""
+        matcher = copy.copy(self)
+        matcher.table = self.table.appended(encodings, removed_rows)
+        added = np.arange(len(self.table), len(matcher.table))
+        if self.centroids is None:
+            if matcher.table.live >= self.min_gallery:
+                matcher._train()
+            return matcher
+        if len(self.delta_rows) + len(added) > self.retrain_ratio * self.trained_rows:
+            matcher._train()
+            return matcher
+
+        # Removed rows stay in their lists; their infinite norms keep them from matching
+        rows = np.concatenate([self.delta_rows, added])
+        cells = np.concatenate([self.delta_cells, matcher._cells(added)])
+        matcher._set_delta(rows, cells)
+        return matcher
+
+    def taken(self, rows):
+        """New matcher over only `rows` (renumbered in that order), keeping the cells and codes"""
+        matcher = copy.copy(self)
+        matcher.table = self.table.taken(rows)
+        if self.centroids is None:
+            return matcher
+        position = np.full(len(self.table), -1, dtype=np.int64)
+        position[np.asarray(rows, dtype=np.int64)] = np.arange(len(rows))
+        list_cells = np.repeat(np.arange(len(self.centroids)), np.diff(self.list_offsets))
+        renumbered = position[np.concatenate([self.list_rows, self.delta_rows])]
+        cells = np.concatenate([list_cells, self.delta_cells])
+        kept = renumbered >= 0
+        order = np.argsort(cells[kept], kind='stable')
+        matcher.list_rows = renumbered[kept][order]
+        matcher.list_offsets = self._offsets(cells[kept])
+        matcher._set_delta(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        return matcher
+
+    def encodings(self):
+        """Stored rows as a float32 matrix, in row order (removed rows included)"""
+        return self.table.rows()
+
+    def _offsets(self, cells):
+        return np.concatenate(([0], np.cumsum(np.bincount(cells, minlength=len(self.centroids)))))
+
+    def _set_delta(self, rows, cells):
+        order = np.argsort(cells, kind='stable')
+        self.delta_rows = rows[order]
+        self.delta_cells = cells[order]
+        self.delta_offsets = self._offsets(self.delta_cells)
+
+    def _cells(self, rows, chunk_size=8192):
+        """Nearest cell of each of the given table rows"""
+        cells = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), chunk_size):
+            chunk = self.table.take(rows[start:start + chunk_size])
+            cells[start:start + chunk_size] = _nearest_centroids(chunk, self.centroids, self.centroid_norms)
+        return cells
+
+    def _train(self):
+        """Partition the live rows into freshly trained k-means cells"""
+        live = np.flatnonzero(np.isfinite(self.table.norms))
+        self.centroids = None
+        self.trained_rows = len(live)
+        if len(live) < self.min_gallery:
+            return
+
+        nlist = self.nlist or int(4 * np.sqrt(len(live)))
+        nlist = max(1, min(nlist, len(live)))
+
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(live), nlist * self.train_size)
+        sample = self.table.take(live[rng.choice(len(live), size=sample_size, replace=False)])
+        self.centroids = kmeans(sample, nlist, self.iterations, self.seed)
+        self.centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        # Keep each cell's rows together so probing a cell is one slice of row ids
+        assignments = self._cells(live)
+        self.list_rows = live[np.argsort(assignments, kind='stable')]
+        self.list_offsets = self._offsets(assignments)
+        self._set_delta(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    def match(self, face_encodings, tolerance=DEFAULT_TOLERANCE):
+        if self.centroids is None:
+            return match_table(self.table, face_encodings, tolerance)
+
+        faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        best_indices = np.full(len(faces), -1, dtype=np.int64)
+        best_distances = np.full(len(faces), np.inf, dtype=np.float32)
+        if len(faces) == 0:
+            return best_indices, best_distances
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        cell_distances = squared_distances(faces, self.centroids, self.centroid_norms)
+        probes = np.argpartition(cell_distances, nprobe - 1, axis=1)[:, :nprobe]
+
+        for i, cells in enumerate(probes):
+            rows = np.concatenate(
+                [self.list_rows[self.list_offsets[cell]:self.list_offsets[cell + 1]] for cell in cells]
+                + [self.delta_rows[self.delta_offsets[cell]:self.delta_offsets[cell + 1]] for cell in cells])
+            if len(rows) == 0:
+                continue
+            sq = squared_distances(faces[i:i + 1], self.table.take(rows), self.table.norms[rows])[0]
+            nearest = int(np.argmin(sq))
+            distance = float(np.sqrt(max(sq[nearest], 0.0)))
+            best_distances[i] = distance
+            if distance <= tolerance:
+                best_indices[i] = rows[nearest]
+
+        return best_indices, best_distances
+
+
+MATCHERS = {
+    BruteForceMatcher.name: BruteForceMatcher,
+    IVFMatcher.name: IVFMatcher,
+}
+
+
+def create_matcher(kind='brute', **options):
+    """Create a matcher backend by name ('brute' or 'ivf')"""
+    try:
+        matcher_cls = MATCHERS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown face matcher '{kind}', expected one of {sorted(MATCHERS)}")
+    return matcher_cls(**options)
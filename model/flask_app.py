@@ -1,16 +1,34 @@
 from flask import Flask, render_template, Response, jsonify, request
 from flask_cors import CORS
 import cv2
-import json
+import atexit
+import math
 import threading
 import time
+import uuid
 import requests
-import face_recognition
-import numpy as np
 import os
-from PIL import Image
-import base64
+import queue
 from dotenv import load_dotenv
+from alerts import AlertDispatcher
+from batch_match import BatchMatcher
+from batch_encoder import EncodingBatcher
+from encoding_store import EncodingStore, content_hash
+from face_detection import encode_faces, locate_faces, offset_locations, prepare_frame, scale_locations
+from face_matcher import create_matcher
+from detection_pool import DetectionPool
+from detectors import create_detector
+from gallery import CooldownTable, Gallery
+from gallery_ingest import encode_image_bytes, ingest_cases
+from json_stream import iter_json_array
+from gallery_sync import GallerySync, sync_cursor
+from app_logging import configure_logging, get_logger
+from metrics import REGISTRY, STAGE_SECONDS, CallbackMetric, timed_request
+from location_provider import CachedLocationProvider, LocationService, load_camera_locations
+from sources import SourceRegistry, parse_camera_sources
+from stream_encoding import create_jpeg_encoder, parse_stream_profile
+from scheduler import AdaptiveScheduler, MotionDetector
+from tracker import FaceTracker
 
 # Load environment variables
 load_dotenv()
@@ -19,11 +37,21 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend integration
 
 # Global variables
-camera = None
-face_recognizer = None
-detection_active = False
-latest_detection = None
-detected_persons = {}  # Track detected persons with timestamps to prevent duplicates
+face_recognizer = None  # Replaced only once a new recognizer has fully loaded
+detection_active = threading.Event()  # Set while detection is running
+detection_control_lock = threading.Lock()  # Serializes start / stop requests
+latest_detection = None  # Published as a new dict, never changed in place
+latest_detection_lock = threading.Lock()
+gallery_sync = None  # Background delta sync of approved cases into the live recognizer
+batch_jobs = {}  # Batch matching jobs over recorded footage, by job id
+batch_jobs_lock = threading.Lock()
+batch_queue = None  # Batch jobs waiting for the single batch thread, bounded by BATCH_QUEUE_LIMIT
+detection_pool = None  # Worker processes for detection when DETECTION_WORKERS > 0
+encoding_batcher = None  # Shared face encoder when ENCODE_BATCH_SIZE > 0
+jpeg_encoder = None  # Stream JPEG encoder shared by all sources, set up by init_app()
+camera_sources = None  # Camera sources sharing one face gallery and matcher, set up by init_app()
+location_service = None  # Per-source camera locations, set up by init_app()
+alert_dispatcher = None  # Background delivery of detection side effects, set up by init_app()
 
 # API Configuration
 API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:5000/api')
@@ -31,375 +59,424 @@ API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:5000/api')
 # WhatsApp Configuration
 WHATSAPP_INSTANCE_ID = os.getenv('WHATSAPP_INSTANCE_ID')
 WHATSAPP_API_TOKEN = os.getenv('WHATSAPP_API_TOKEN')
+WHATSAPP_API_URL = os.getenv('WHATSAPP_API_URL', 'https://api.ultramsg.com')  # UltraMsg API (or a local stub for benchmarks)
 
 # Configuration
 DETECTION_COOLDOWN = int(os.getenv('DETECTION_COOLDOWN', 300))  # 5 minutes cooldown between notifications for same person
+ENCODING_STORE_DIR = os.getenv('ENCODING_STORE_DIR', './encodings')  # On-disk cache of face encodings
+GALLERY_INGEST_WORKERS = int(os.getenv('GALLERY_INGEST_WORKERS', 0))  # Processes encoding new case images at startup, 0 = one per core
+FACE_DETECTOR = os.getenv('FACE_DETECTOR', 'hog')  # 'hog', 'cnn', 'yunet' (OpenCV DNN) or 'haar'
+CAMERA_DETECTORS = os.getenv('CAMERA_DETECTORS', '')  # Per-source overrides, e.g. 'gate=yunet,lobby=hog' (in-process detection only)
+FACE_DETECTOR_MODEL = os.getenv('FACE_DETECTOR_MODEL', './models/face_detection_yunet_2023mar.onnx')  # YuNet ONNX file
+FACE_MATCHER = os.getenv('FACE_MATCHER', 'brute')  # 'brute' (exact) or 'ivf' (approximate, for large galleries)
+IVF_NLIST = int(os.getenv('IVF_NLIST', 0))  # Number of IVF cells, 0 = 4 * sqrt(gallery size)
+IVF_NPROBE = int(os.getenv('IVF_NPROBE', 8))  # Cells searched per face, higher = better recall
+GALLERY_PRECISION = os.getenv('GALLERY_PRECISION', 'float32')  # Stored encodings: 'float32', 'float16' or 'int8' (smallest)
+GALLERY_SYNC_INTERVAL = int(os.getenv('GALLERY_SYNC_INTERVAL', 10))  # Seconds between delta syncs, 0 disables
+GALLERY_RECONCILE_EVERY = int(os.getenv('GALLERY_RECONCILE_EVERY', 30))  # Syncs between checks for deleted cases
+DETECTION_WORKERS = int(os.getenv('DETECTION_WORKERS', 0))  # Detection processes, 0 = detect in the Flask process
+CAMERA_SOURCES = os.getenv('CAMERA_SOURCES', 'default=0')  # id=device index / RTSP or HTTP URL / video file, comma separated
+ALERT_QUEUE_PATH = os.getenv('ALERT_QUEUE_PATH', './alerts.db')  # Persistent queue of undelivered alerts
+ALERT_WORKERS = int(os.getenv('ALERT_WORKERS', 2))  # Threads delivering location updates and WhatsApp alerts
+ALERT_MAX_ATTEMPTS = int(os.getenv('ALERT_MAX_ATTEMPTS', 6))  # Delivery attempts before an alert is marked failed
+LOCATION_CACHE_TTL = int(os.getenv('LOCATION_CACHE_TTL', 3600))  # Seconds an IP geolocation lookup is reused
+BATCH_INPUT_DIR = os.getenv('BATCH_INPUT_DIR', './footage')  # Batch jobs may only read files under this directory
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 0))  # Processes per batch job, 0 = one per core
+BATCH_QUEUE_LIMIT = int(os.getenv('BATCH_QUEUE_LIMIT', 4))  # Batch jobs waiting to run before new ones are refused
+BATCH_JOB_TTL = int(os.getenv('BATCH_JOB_TTL', 3600))  # Seconds a finished batch job's result is kept
+BATCH_JOB_LIMIT = int(os.getenv('BATCH_JOB_LIMIT', 100))  # Finished batch jobs kept at most, oldest dropped first
+CAMERA_LOCATIONS = os.getenv('CAMERA_LOCATIONS', '')  # JSON (or path to a JSON file) of fixed per-camera locations
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # DEBUG shows per-image and per-frame messages
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' or 'json' (one object per line)
+LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT', 5))  # Same message at most this many times per 10 seconds
+FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'  # Flask debugger and reloader, never in production
+FACE_TRACKING = os.getenv('FACE_TRACKING', 'true').lower() == 'true'  # Reuse identities of faces tracked across frames
+TRACK_REFRESH_INTERVAL = float(os.getenv('TRACK_REFRESH_INTERVAL', 2.0))  # Seconds before a tracked face is re-identified
+ENCODE_BATCH_SIZE = int(os.getenv('ENCODE_BATCH_SIZE', 0))  # Faces encoded per batch across frames/sources, 0 = no batching
+ENCODE_BATCH_WAIT_MS = float(os.getenv('ENCODE_BATCH_WAIT_MS', 20))  # Longest a face waits for its batch to fill
+ADAPTIVE_DETECTION = os.getenv('ADAPTIVE_DETECTION', 'true').lower() == 'true'  # Skip static frames, adapt scale, search moving regions
+DETECT_TARGET_LATENCY_MS = float(os.getenv('DETECT_TARGET_LATENCY_MS', 150))  # Full-frame detection time the scale adapts towards
+DETECT_CPU_BUDGET = float(os.getenv('DETECT_CPU_BUDGET', 1.0))  # Share of a core each source's detection may use
+MOTION_THRESHOLD = float(os.getenv('MOTION_THRESHOLD', 0.002))  # Fraction of pixels that must change to run detection
+STREAM_JPEG_QUALITY = int(os.getenv('STREAM_JPEG_QUALITY', 80))  # Default JPEG quality of /video_feed streams
+JPEG_ENCODER = os.getenv('JPEG_ENCODER', 'auto')  # 'auto' (PyTurboJPEG when installed), 'turbojpeg' or 'opencv'
+
+# Logging itself is configured by init_app()
+log = get_logger('app')
+
+# Notification cooldown per person, expired entries are dropped
+detection_cooldowns = CooldownTable(DETECTION_COOLDOWN)
+
+def detector_options(kind):
+    """Detector constructor options from environment configuration"""
+    if kind == 'yunet':
+        return {'model_path': FACE_DETECTOR_MODEL}
+    return {}
+
+def source_detector(source_id):
+    """Detector configured for one camera source, or None to use FACE_DETECTOR"""
+    for item in CAMERA_DETECTORS.split(','):
+        name, _, kind = item.partition('=')
+        if name.strip() == source_id and kind.strip():
+            return create_detector(kind.strip(), **detector_options(kind.strip()))
+    return None
+
+def matcher_options(kind):
+    """Matcher constructor options from environment configuration"""
+    if kind == 'ivf':
+        return {'nlist': IVF_NLIST, 'nprobe': IVF_NPROBE, 'precision': GALLERY_PRECISION}
+    return {'precision': GALLERY_PRECISION}
 
 class WebFaceRecognizer:
     def __init__(self):
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.known_phone_numbers = []
-        self.known_adhaar_numbers = []
-        self.detection_results = []
-        self.person_details_cache = {}  # Cache for person details
-        
-    def load_encoding_images(self, images_path="./images"):
-        """Load and encode images fetched from database"""
-        if not os.path.exists(images_path):
-            print(f"Images directory {images_path} not found, creating it...")
-            os.makedirs(images_path)
-            return False
-            
-        image_files = [f for f in os.listdir(images_path) if f.endswith((".jpg", ".png", ".jpeg"))]
-        print(f"Found {len(image_files)} image files from database")
-        
-        loaded_count = 0
-        for filename in image_files:
-            image_path = os.path.join(images_path, filename)
-            # Extract name from filename (before first underscore)
-            name = filename.split("_")[0]
-            name_key = name.lower()
-            
-            print(f"Processing database image: {filename} for person: {name} (key: {name_key})")
-            
-            # Get phone number and adhaar from cached database details
-            phone_number, adhaar_number = self.get_person_details(name)
-            if not phone_number:
-                print(f"No cached contact details found for {name} (key: {name_key}), skipping...")
-                continue
+        self.detector = create_detector(FACE_DETECTOR, **detector_options(FACE_DETECTOR))
+        # Immutable snapshot, replaced as a whole; readers take the reference without locking
+        self.gallery = Gallery((), create_matcher(FACE_MATCHER, **matcher_options(FACE_MATCHER)))
+        self.gallery_lock = threading.Lock()  # Serializes gallery updates (initial load, background sync)
+        self.encoding_store = EncodingStore(ENCODING_STORE_DIR)
+        self.detection_pool = None  # Optional DetectionPool for multi-core detection
+        self.encoding_batcher = None  # Optional EncodingBatcher shared by all sources
+        self.sync_cursor = None  # Delta sync cursor taken just before the full load
+        
+    def load_gallery(self, cases, workers=1):
+        """Encode approved cases (an iterable of case dicts, e.g. streamed from the database) into the gallery"""
+        self.encoding_store = EncodingStore(ENCODING_STORE_DIR)
+        cached_count = self.encoding_store.open()
+        log.info("Encoding store has %d cached entries", cached_count)
+        
+        persons = ingest_cases(cases, self.encoding_store, workers=workers)
+        
+        # Index the gallery for batched matching
+        gallery = Gallery(persons, create_matcher(FACE_MATCHER, **matcher_options(FACE_MATCHER)))
+        with self.gallery_lock:
+            self.gallery = gallery
+        log.info("Built '%s' matcher over %d %s encodings (%.1f MB, max quantization error %.4f)",
+                 gallery.matcher.name, len(gallery.matcher), GALLERY_PRECISION, gallery.nbytes / 1e6,
+                 gallery.matcher.max_error)
+        
+        self.flush_encoding_store()
                 
-            if name in self.known_face_names:
-                print(f"Encoding already exists for {name}, skipping...")
-                continue  # Skip duplicates
-                
-            try:
-                # Load and encode the image
-                image = cv2.imread(image_path)
-                if image is None:
-                    print(f"Could not read image: {image_path}")
-                    continue
-                    
-                rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                face_encodings = face_recognition.face_encodings(rgb_image)
-                
-                if len(face_encodings) > 0:
-                    self.known_face_encodings.append(face_encodings[0])
-                    self.known_face_names.append(name)
-                    self.known_phone_numbers.append(phone_number)
-                    self.known_adhaar_numbers.append(adhaar_number)
-                    loaded_count += 1
-                    print(f"✅ Loaded encoding for {name}")
-                else:
-                    print(f"❌ No faces found in {filename}")
-                    
-            except Exception as e:
-                print(f"Error loading/encoding image {filename}: {e}")
-                
-        print(f"Successfully loaded {loaded_count} face encodings")
-        return loaded_count > 0
+        log.info("Successfully loaded %d face encodings (%d from encoding store)", len(gallery), self.encoding_store.hits)
+        return len(gallery) > 0
     
-    def get_person_details(self, name):
-        """Get person details from cached database information"""
-        # Check cache using lowercase key for consistency
-        name_key = name.lower()
-        if name_key in self.person_details_cache:
-            details = self.person_details_cache[name_key]
-            print(f"Found cached details for {name} (key: {name_key})")
-            return details.get('phone'), details.get('adhaar')
-        
-        # No cache means person not in approved database cases
-        print(f"No cached details found for {name} (key: {name_key}) - not in approved cases")
-        print(f"Available cache keys: {list(self.person_details_cache.keys())}")
-        return None, None
+    def encode_case_image(self, name, adhaar_number, image_bytes):
+        """Face encoding for a case image, reusing the encoding store when it was seen before"""
+        image_hash = content_hash(image_bytes)
+        hit, face_encoding = self.encoding_store.lookup(name, adhaar_number, image_hash)
+        if not hit:
+            decoded, face_encoding = encode_image_bytes(image_bytes)
+            if not decoded:
+                log.warning("Could not decode image for %s", name)
+                return None
+        self.encoding_store.put(name, adhaar_number, image_hash, face_encoding)
+        return face_encoding
     
-    def detect_faces(self, frame):
-        """Detect and recognize faces in frame"""
-        # Resize for faster processing
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-        
-        # Find faces
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-        
-        # Scale locations back up
-        face_locations = [(top*4, right*4, bottom*4, left*4) 
-                         for (top, right, bottom, left) in face_locations]
-        
-        face_names = []
-        for face_encoding in face_encodings:
-            matches = face_recognition.compare_faces(
-                self.known_face_encodings, face_encoding, tolerance=0.6)
-            name = "Unknown"
-            
-            if True in matches:
-                face_distances = face_recognition.face_distance(
-                    self.known_face_encodings, face_encoding)
-                best_match_index = np.argmin(face_distances)
-                if matches[best_match_index]:
-                    name = self.known_face_names[best_match_index]
-            
-            face_names.append(name)
-        
+    def flush_encoding_store(self):
+        """Persist newly computed encodings so the next start can reuse them"""
+        try:
+            if self.encoding_store.flush():
+                log.info("Saved encoding store to %s", ENCODING_STORE_DIR)
+        except Exception as e:
+            log.error("Error saving encoding store: %s", e)
+    
+    def apply_gallery_changes(self, upserts, removed_names):
+        """Add, replace and drop people while detection keeps running
+        
+        The new gallery shares the current one's rows, adds the upserts and
+        is swapped in with a single assignment, so detect_faces always sees a
+        consistent gallery.
+        """
+        with self.gallery_lock:
+            self.gallery = self.gallery.with_changes(upserts, removed_names)
+    
+    def detect_faces(self, frame, tracker=None, plan=None, detector=None):
+        """Detect and recognize faces in frame
+        
+        A scheduler plan sets the downscale factor and may restrict the
+        search to a region of the frame. With a tracker, faces that continue
+        an already identified track keep its name and only new or
+        refresh-due tracks are encoded and matched.
+        """
+        gallery = self.gallery
+        matcher, known_face_names = gallery.matcher, gallery.names
+        
+        scale, roi = (plan.scale, plan.roi) if plan else (0.25, None)
+        region = frame if roi is None else frame[roi[0]:roi[2], roi[3]:roi[1]]
+        
+        if self.detection_pool:
+            # Detection, encoding and matching run in a worker process
+            with STAGE_SECONDS.labels(stage='pool').time():
+                face_locations, best_indices = self.detection_pool.detect(region, matcher, scale)
+            face_names = [known_face_names[i] if i >= 0 else "Unknown" for i in best_indices]
+            if roi:
+                face_locations = offset_locations(face_locations, roi[0], roi[3])
+            return face_locations, face_names
+        
+        with STAGE_SECONDS.labels(stage='resize').time():
+            rgb_small_frame = prepare_frame(region, scale)
+        with STAGE_SECONDS.labels(stage='detect').time():
+            small_locations = locate_faces(rgb_small_frame, detector or self.detector)
+        face_locations = scale_locations(small_locations, scale)
+        if roi:
+            face_locations = offset_locations(face_locations, roi[0], roi[3])
+        
+        if tracker is not None:
+            face_names = self.identify_tracked_faces(rgb_small_frame, small_locations, face_locations,
+                                                     tracker, matcher, known_face_names, roi)
+        else:
+            face_encodings = self.encode_faces(rgb_small_frame, small_locations)
+            # Score all faces in the frame against the gallery in one pass
+            with STAGE_SECONDS.labels(stage='match').time():
+                best_indices, _ = matcher.match(face_encodings, tolerance=0.6)
+            face_names = [known_face_names[i] if i >= 0 else "Unknown" for i in best_indices]
         return face_locations, face_names
-
-def get_location():
-    """Get current location using GeoJS API"""
-    try:
-        response = requests.get("https://get.geojs.io/v1/ip/geo.json", timeout=5)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"Error getting location: {e}")
-        return None
-
-def download_images():
-    """Download images from database only - no fallback to uploads folder"""
-    # Only try API - uploads folder is temporary and gets cleaned after database upload
-    downloaded = download_images_from_api()
     
-    if downloaded == 0:
-        print("No approved cases found in database. Make sure cases are approved by admin.")
+    def encode_faces(self, rgb_small_frame, face_locations):
+        """Encode faces directly or through the shared batcher"""
+        with STAGE_SECONDS.labels(stage='encode').time():
+            if self.encoding_batcher:
+                return self.encoding_batcher.encode(rgb_small_frame, face_locations)
+            return encode_faces(rgb_small_frame, face_locations)
     
-    return downloaded
+    def identify_tracked_faces(self, rgb_small_frame, small_locations, face_locations,
+                               tracker, matcher, known_face_names, roi=None):
+        """Names for this frame's faces, encoding only those whose track needs identifying"""
+        now = time.time()
+        tracks = tracker.update(face_locations, now, region=roi)
+        pending = [i for i, track in enumerate(tracks) if tracker.needs_identification(track, now)]
+        if pending:
+            face_encodings = self.encode_faces(rgb_small_frame, [small_locations[i] for i in pending])
+            with STAGE_SECONDS.labels(stage='match').time():
+                best_indices, best_distances = matcher.match(face_encodings, tolerance=0.6)
+            for i, encoding, index, distance in zip(pending, face_encodings, best_indices, best_distances):
+                name = known_face_names[index] if index >= 0 else "Unknown"
+                tracker.identify(tracks[i], name, float(distance), encoding, now)
+        
+        return [track.name for track in tracks]
 
-def download_images_from_api():
-    """Fetch approved case images from database for face recognition"""
-    global face_recognizer
-    
-    # Initialize a temporary cache for this session
-    temp_cache = {}
+def load_approved_cases(recognizer):
+    """Stream approved cases from the database into the recognizer's gallery
     
+    The response is parsed case by case as it arrives and new images are
+    encoded in GALLERY_INGEST_WORKERS processes while the rest downloads.
+    """
+    url = f"{API_BASE_URL}/cases/approved/face-recognition"
+    log.info("Fetching approved cases from database: %s", url)
+    recognizer.sync_cursor = sync_cursor()
     try:
-        url = f"{API_BASE_URL}/cases/approved/face-recognition"
-        print(f"Fetching approved cases from database: {url}")
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        cases = response.json()
-        
-        print(f"Database Response: Found {len(cases)} approved cases")
-        
-        if not os.path.exists("./images"):
-            os.makedirs("./images")
-        
-        processed = 0
-        for case in cases:
-            try:
-                name = case.get('name')
-                adhaar = case.get('adhaarNumber')
-                contact = case.get('contactNumber')
-                
-                if not name or not adhaar or not contact:
-                    print(f"Skipping case - missing required fields: {case.get('name', 'N/A')}")
-                    continue
-                
-                # Cache the person details using lowercase name as key for consistency
-                name_key = name.lower()
-                temp_cache[name_key] = {
-                    'phone': contact,
-                    'adhaar': adhaar,
-                    'original_name': name
-                }
-                print(f"Cached details for: {name} (key: {name_key})")
-                
-                filename = f"{name}_{adhaar}.png"
-                filepath = os.path.join("./images", filename)
-                
-                if os.path.exists(filepath):
-                    print(f"Image already exists for {name}")
-                    processed += 1
-                    continue
-                
-                # Extract and decode image from database
-                image_data = case.get('image')
-                if image_data:
-                    try:
-                        # Database stores base64 encoded images
-                        if isinstance(image_data, str):
-                            # Remove data URL prefix if present
-                            if image_data.startswith('data:'):
-                                image_data = image_data.split(',')[1]
-                            
-                            # Decode base64 image from database
-                            image_bytes = base64.b64decode(image_data)
-                            image_array = np.frombuffer(image_bytes, dtype=np.uint8)
-                            
-                            # Decode and save image for face recognition
-                            img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-                            if img is not None:
-                                cv2.imwrite(filepath, img)
-                                processed += 1
-                                print(f"Processed image for {name} from database")
-                            else:
-                                print(f"Failed to decode image for {name}")
-                        else:
-                            print(f"Invalid image data format for {name}")
-                            
-                    except Exception as decode_error:
-                        print(f"Error decoding image for {name}: {decode_error}")
-                        continue
-                else:
-                    print(f"No image data found in database for {name}")
-                        
-            except Exception as e:
-                print(f"Error processing case {case.get('name', 'Unknown')}: {e}")
-        
-        # Update face_recognizer cache with the temp cache
-        if face_recognizer:
-            face_recognizer.person_details_cache = temp_cache
-        
-        print(f"Processed {processed} cases from database for face recognition")
-        print(f"Cached contact details for {len(temp_cache)} persons")
-        return processed
-        
+        with timed_request('backend', requests.get, url, stream=True, timeout=10) as response:
+            response.raise_for_status()
+            cases = iter_json_array(response.iter_content(chunk_size=65536))
+            loaded = recognizer.load_gallery(cases, workers=GALLERY_INGEST_WORKERS or os.cpu_count() or 1)
     except requests.exceptions.ConnectionError:
-        print(f"Error: Could not connect to backend API at {API_BASE_URL}")
-        print("Make sure your backend server is running at http://localhost:5000")
-        return 0
+        log.error("Could not connect to backend API at %s - make sure the backend server is running", API_BASE_URL)
+        return False
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching from database: {e}")
-        return 0
+        log.error("Error fetching from database: %s", e)
+        return False
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return 0
+        log.exception("An unexpected error occurred: %s", e)
+        return False
+    
+    if not loaded:
+        log.warning("No approved cases found in database. Make sure cases are approved by admin.")
+    return loaded
 
-def should_process_detection(name):
-    """Check if enough time has passed since last detection of this person"""
-    global detected_persons
+def build_recognizer():
+    """A new recognizer loaded with approved cases, or None if nothing loaded"""
+    log.info("Initializing face recognizer...")
+    recognizer = WebFaceRecognizer()
     
-    current_time = time.time()
-    name_key = name.lower()
+    log.info("Loading face encodings from approved database cases...")
+    if not load_approved_cases(recognizer):
+        return None
+    return recognizer
+
+def load_recognizer():
+    """Create the global recognizer and load approved cases into it; None if nothing loaded"""
+    global face_recognizer
     
-    # Check if person was detected recently
-    if name_key in detected_persons:
-        time_since_last = current_time - detected_persons[name_key]['last_notification']
-        
-        if time_since_last < DETECTION_COOLDOWN:
-            # Only print cooldown message once every 30 seconds
-            last_log = detected_persons[name_key].get('last_log', 0)
-            if current_time - last_log >= 30:
-                remaining = int(DETECTION_COOLDOWN - time_since_last)
-                print(f"⏳ Cooldown active for {name}: {remaining}s remaining (notifications paused)")
-                detected_persons[name_key]['last_log'] = current_time
-            return False
+    # Other threads keep using the previous recognizer until this one is loaded
+    recognizer = build_recognizer()
+    if recognizer is not None:
+        face_recognizer = recognizer
+    return recognizer
+
+def should_process_detection(name):
+    """Check if enough time has passed since last detection of this person"""
+    allowed, remaining = detection_cooldowns.acquire(name.lower())
+    if not allowed:
+        # Rate limited by the logging layer
+        log.debug("⏳ Cooldown active for %s: %ds remaining (notifications paused)", name, remaining)
+        return False
     
-    # Update last detection time - this person will now get notification
-    detected_persons[name_key] = {
-        'last_notification': current_time,
-        'last_log': current_time
-    }
-    print(f"🔓 Cooldown cleared for {name} - processing notification")
+    log.info("🔓 Cooldown cleared for %s - processing notification", name)
     return True
 
-def generate_frames():
-    """Generate video frames with face detection"""
-    global camera, face_recognizer, detection_active, latest_detection
+def start_source(source):
+    """Start a camera source's capture / detect / encode pipeline"""
+    # Tracking needs frames in order, so it is only used with a single in-process detect thread
+    tracker = FaceTracker(refresh_interval=TRACK_REFRESH_INTERVAL) if FACE_TRACKING and DETECTION_WORKERS == 0 else None
+    scheduler = None
+    if ADAPTIVE_DETECTION:
+        scheduler = AdaptiveScheduler(MotionDetector(min_changed=MOTION_THRESHOLD),
+                                      target_latency=DETECT_TARGET_LATENCY_MS / 1000.0,
+                                      cpu_budget=DETECT_CPU_BUDGET)
+    detector = source_detector(source.source_id)
+    return source.start(lambda frame, plan=None: detect_frame(frame, tracker, plan, detector),
+                        on_result=make_detection_handler(source),
+                        detect_threads=max(1, DETECTION_WORKERS), scheduler=scheduler,
+                        jpeg_quality=STREAM_JPEG_QUALITY, jpeg_encoder=jpeg_encoder)
+
+def generate_frames(source_id, profile=None):
+    """Generate video frames with face detection in the requested stream profile"""
+    source = camera_sources.get(source_id)
+    if source is None or not detection_active.is_set():
+        return
     
-    if camera is None:
-        camera = cv2.VideoCapture(0)
-        if not camera.isOpened():
-            return
+    # Retry a source that could not be opened at start_detection (dropouts are reconnected by the pipeline)
+    if not source.running and not start_source(source):
+        return
     
-    frame_count = 0
-    detected_in_current_session = set()  # Track who we've processed in this session
+    pipeline = source.pipeline
+    if pipeline is None:
+        return
     
-    while detection_active:
-        if not detection_active:  # Check again before reading
-            break
-            
-        success, frame = camera.read()
-        if not success or not detection_active:
+    for frame_bytes in pipeline.frames(profile):
+        if not detection_active.is_set():
             break
-        
-        frame_count += 1
-        
-        # Process every 10th frame for better performance (reduced from 3)
-        if frame_count % 10 == 0 and face_recognizer:
-            try:
-                face_locations, face_names = face_recognizer.detect_faces(frame)
-                
-                # Draw rectangles and names
-                for (top, right, bottom, left), name in zip(face_locations, face_names):
-                    color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-                    
-                    cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                    cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
-                    cv2.putText(frame, name, (left + 6, bottom - 6), 
-                               cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 1)
-                    
-                    # Only check cooldown once per person per detection session
-                    # This prevents repeated calls to should_process_detection
-                    if name != "Unknown":
-                        if name not in detected_in_current_session:
-                            # First time seeing this person - check if we should notify
-                            if should_process_detection(name):
-                                detected_in_current_session.add(name)
-                                handle_detection(name)
-                        
-            except Exception as e:
-                print(f"Detection error: {e}")
-        
-        # Encode frame
-        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-        if ret:
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-
-def handle_detection(name):
-    """Handle when a person is detected"""
-    global latest_detection, face_recognizer
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+
+def detect_frame(frame, tracker=None, plan=None, detector=None):
+    """Run recognition on one frame for the pipeline's detection worker"""
+    if not detection_active.is_set() or face_recognizer is None:
+        return [], []
+    return face_recognizer.detect_faces(frame, tracker, plan, detector)
+
+def make_detection_handler(source):
+    """Per-session callback that notifies once per recognized person"""
+    detected_in_current_session = set()  # Track who we've processed in this session
+    
+    def on_result(face_locations, face_names):
+        for name in face_names:
+            # Only check cooldown once per person per detection session
+            # This prevents repeated calls to should_process_detection
+            if name != "Unknown" and name not in detected_in_current_session:
+                # First time seeing this person - check if we should notify
+                if should_process_detection(name):
+                    detected_in_current_session.add(name)
+                    handle_detection(name, source.source_id)
+    
+    return on_result
+
+def handle_detection(name, source_id=None):
+    """Handle when a person is detected
+    
+    Only records the detection and queues its side effects; the database
+    update and the WhatsApp alert are delivered by the alert dispatcher so
+    the detection thread never waits on HTTP.
+    """
+    global latest_detection
     
     try:
-        print(f"\n🚨 NEW DETECTION: Processing {name}...")
+        log.info("🚨 NEW DETECTION: Processing %s on camera '%s'...", name, source_id)
         
         # Get person details
-        name_index = face_recognizer.known_face_names.index(name)
-        phone_number = face_recognizer.known_phone_numbers[name_index]
-        adhaar_number = face_recognizer.known_adhaar_numbers[name_index]
+        details = face_recognizer.gallery.details(name)
+        if details is None:
+            log.warning("⚠️ %s left the gallery before the detection was handled", name)
+            return None
+        phone_number, adhaar_number = details['phone'], details['adhaar']
         
-        # Get location
-        location_data = get_location()
+        # Configured or cached camera location - never a network call here
+        location_data = location_service.peek(source_id)
         
         # Store latest detection
-        latest_detection = {
+        detection = {
             'name': name,
             'adhaar_number': adhaar_number,
             'phone_number': phone_number,
             'location': location_data,
+            'source': source_id,
             'timestamp': time.time()
         }
+        source = camera_sources.get(source_id)
+        with latest_detection_lock:
+            latest_detection = detection
+            if source is not None:
+                source.latest_detection = detection
         
-        # Update location in database (only once per detection)
-        db_success = False
+        alert = {
+            'name': name,
+            'adhaar_number': adhaar_number,
+            'phone_number': phone_number,
+            'source': source_id,
+            'timestamp': detection['timestamp']
+        }
         if location_data:
-            db_success = update_location_in_db(name, adhaar_number, location_data)
+            queue_delivery_alerts(dict(alert, location=location_data))
         else:
-            print("⚠️ No location data available, skipping database update")
-            
-        # Send WhatsApp notification (only once per detection)
-        whatsapp_success = False
-        if phone_number and location_data:
-            whatsapp_success = send_whatsapp_notification(phone_number, name, adhaar_number, location_data)
-        else:
-            print("⚠️ Missing phone or location data, skipping WhatsApp notification")
-        
-        # Summary
-        print(f"\n{'='*60}")
-        print(f"📊 DETECTION SUMMARY for {name}")
-        print(f"   Database Update: {'✅ Success' if db_success else '❌ Failed'}")
-        print(f"   WhatsApp Alert: {'✅ Sent' if whatsapp_success else '❌ Failed'}")
-        print(f"   Next notification allowed in: {DETECTION_COOLDOWN}s ({DETECTION_COOLDOWN//60} minutes)")
-        print(f"{'='*60}\n")
+            # First location lookup still in flight; an alert worker resolves it
+            alert_dispatcher.enqueue('detection', alert)
+        log.info("📬 Queued alerts for %s (next notification allowed in %ds)", name, DETECTION_COOLDOWN)
+        return detection
         
     except Exception as e:
-        print(f"Error handling detection: {e}")
+        log.exception("Error handling detection: %s", e)
+        return None
+
+def queue_delivery_alerts(alert):
+    """Queue the database update and WhatsApp alert for a located detection"""
+    alert_dispatcher.enqueue('location_history', alert)
+    if alert['phone_number']:
+        alert_dispatcher.enqueue('whatsapp', alert)
+    else:
+        log.warning("⚠️ Missing phone number, skipping WhatsApp notification")
 
-def update_location_in_db(name, adhaar_number, location_data):
+def deliver_detection(alert, session):
+    """Alert job: resolve a location that wasn't cached yet, then queue the deliveries"""
+    location_data = location_service.get(alert['source'], session)
+    if not location_data:
+        log.warning("⚠️ No location data available yet, will retry")
+        return False
+    
+    # Fill in the location on the detection shown in the UI, if it is still this one
+    fill_detection_location(alert, location_data)
+    
+    queue_delivery_alerts(dict(alert, location=location_data))
+    return True
+
+def fill_detection_location(alert, location_data):
+    """Republish the global and per-source latest detection for `alert` with its location"""
+    global latest_detection
+    
+    def located(detection):
+        if detection and detection['name'] == alert['name'] and detection['timestamp'] == alert['timestamp']:
+            return dict(detection, location=location_data)
+        return detection
+    
+    source = camera_sources.get(alert['source'])
+    with latest_detection_lock:
+        latest_detection = located(latest_detection)
+        if source is not None:
+            source.latest_detection = located(source.latest_detection)
+
+def deliver_location_history(alert, session):
+    """Alert job: record the sighting in the case's location history"""
+    return update_location_in_db(alert['name'], alert['adhaar_number'], alert['location'], session,
+                                 detected_at=alert['timestamp'])
+
+def deliver_whatsapp(alert, session):
+    """Alert job: notify the family on WhatsApp"""
+    return send_whatsapp_notification(alert['phone_number'], alert['name'], alert['adhaar_number'],
+                                      alert['location'], session)
+
+def update_location_in_db(name, adhaar_number, location_data, session=None, detected_at=None):
     """Update case location in database"""
     try:
-        current_time = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        # A retried update still records when the person was actually seen
+        current_time = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(detected_at))
         
         data = {
             "name": name,
@@ -416,29 +493,28 @@ def update_location_in_db(name, adhaar_number, location_data):
         }
         
         url = f"{API_BASE_URL}/foundlocation/addlocationhistory"
-        print(f"📍 Updating location in database: {url}")
-        print(f"   Data: {name} at {location_data.get('city', 'N/A')}, {location_data.get('country', 'N/A')}")
+        log.info("📍 Updating location in database: %s at %s, %s", name,
+                 location_data.get('city', 'N/A'), location_data.get('country', 'N/A'))
         
-        response = requests.post(url, json=data, timeout=10)
+        response = timed_request('backend', (session or requests).post, url, json=data, timeout=10)
         response.raise_for_status()
         
         response_data = response.json()
-        print(f"✅ Database response: {response_data}")
-        print(f"✅ Location successfully saved to database for {name}")
+        log.debug("✅ Database response: %s", response_data)
+        log.info("✅ Location successfully saved to database for %s", name)
         return True
         
     except requests.exceptions.ConnectionError:
-        print(f"❌ Error: Cannot connect to backend at {API_BASE_URL}")
-        print(f"   Make sure your backend server is running on port 5000")
+        log.error("❌ Cannot connect to backend at %s - make sure the backend server is running", API_BASE_URL)
         return False
     except requests.exceptions.Timeout:
-        print(f"❌ Error: Database request timed out")
+        log.error("❌ Database request timed out")
         return False
     except Exception as e:
-        print(f"❌ Error updating location in database: {e}")
+        log.error("❌ Error updating location in database: %s", e)
         return False
 
-def send_whatsapp_notification(phone_number, name, adhaar, location):
+def send_whatsapp_notification(phone_number, name, adhaar, location, session=None):
     """Send WhatsApp notification"""
     try:
         city = location.get('city', 'N/A')
@@ -454,24 +530,91 @@ def send_whatsapp_notification(phone_number, name, adhaar, location):
                   f"Please contact local authorities immediately.\n" \
                   f"Regards, Milap.AI - Missing Person Recovery System"
 
-        url = f"https://api.ultramsg.com/{WHATSAPP_INSTANCE_ID}/messages/chat"
+        url = f"{WHATSAPP_API_URL}/{WHATSAPP_INSTANCE_ID}/messages/chat"
         payload = f"token={WHATSAPP_API_TOKEN}&to=+91{phone_number}&body={message}&priority=1"
         headers = {'content-type': 'application/x-www-form-urlencoded'}
 
-        print(f"📱 Sending WhatsApp to +91{phone_number}...")
-        response = requests.post(url, data=payload, headers=headers, timeout=10)
+        log.info("📱 Sending WhatsApp to +91%s...", phone_number)
+        response = timed_request('whatsapp', (session or requests).post, url, data=payload, headers=headers, timeout=10)
         response.raise_for_status()
-        print(f"✅ WhatsApp notification successfully sent to +91{phone_number}")
+        log.info("✅ WhatsApp notification successfully sent to +91%s", phone_number)
         return True
         
     except requests.exceptions.HTTPError as e:
-        print(f"❌ WhatsApp API Error: {e}")
-        print(f"   This usually means your WhatsApp API token is invalid or expired")
+        log.error("❌ WhatsApp API Error: %s (the WhatsApp API token may be invalid or expired)", e)
         return False
     except Exception as e:
-        print(f"❌ Error sending WhatsApp: {e}")
+        log.error("❌ Error sending WhatsApp: %s", e)
         return False
 
+def pipeline_counts(read):
+    """Scrape-time series of one pipeline counter per running source"""
+    return [({'source': source.source_id}, read(source.pipeline))
+            for source in camera_sources if source.pipeline is not None]
+
+def dropped_frames():
+    series = []
+    for source in camera_sources:
+        if source.pipeline is not None:
+            series.append(({'source': source.source_id, 'queue': 'detect'}, source.pipeline.detect_queue.dropped))
+            series.append(({'source': source.source_id, 'queue': 'encode'}, source.pipeline.encode_queue.dropped))
+    return series
+
+def scheduler_skips():
+    series = []
+    for source in camera_sources:
+        scheduler = source.pipeline.scheduler if source.pipeline else None
+        if scheduler:
+            series.append(({'source': source.source_id, 'reason': 'static'}, scheduler.skipped_static))
+            series.append(({'source': source.source_id, 'reason': 'budget'}, scheduler.skipped_budget))
+    return series
+
+def init_app():
+    """Set up logging, camera sources and alert delivery; call once before serving
+
+    None of this runs on import: the detection, ingest and batch pools start
+    spawn worker processes, which import this module again as __mp_main__.
+    """
+    global jpeg_encoder, camera_sources, location_service, alert_dispatcher
+    if alert_dispatcher is not None:
+        return app
+    configure_logging(LOG_LEVEL, LOG_FORMAT, burst=LOG_RATE_LIMIT)
+
+    # Stream JPEG encoder shared by all sources
+    jpeg_encoder = create_jpeg_encoder(JPEG_ENCODER)
+    log.info("JPEG encoder for streams: %s", jpeg_encoder.name)
+
+    # Camera sources sharing one face gallery and matcher
+    camera_sources = SourceRegistry(parse_camera_sources(CAMERA_SOURCES))
+
+    # Camera locations: configured coordinates per source, else a cached GeoJS lookup
+    location_service = LocationService(CachedLocationProvider(ttl=LOCATION_CACHE_TTL),
+                                       load_camera_locations(CAMERA_LOCATIONS))
+
+    # Background delivery of detection side effects (database, WhatsApp)
+    alert_dispatcher = AlertDispatcher(ALERT_QUEUE_PATH, workers=ALERT_WORKERS, max_attempts=ALERT_MAX_ATTEMPTS)
+    alert_dispatcher.register('detection', deliver_detection)
+    alert_dispatcher.register('location_history', deliver_location_history)
+    alert_dispatcher.register('whatsapp', deliver_whatsapp)
+
+    REGISTRY.register(CallbackMetric('milap_frames_captured_total', 'Frames read from each camera source', 'counter',
+                                     lambda: pipeline_counts(lambda pipeline: pipeline.frames_captured)))
+    REGISTRY.register(CallbackMetric('milap_frames_processed_total', 'Frames run through face detection', 'counter',
+                                     lambda: pipeline_counts(lambda pipeline: pipeline.frames_detected)))
+    REGISTRY.register(CallbackMetric('milap_frames_dropped_total', 'Frames dropped because detection or encoding fell behind',
+                                     'counter', dropped_frames))
+    REGISTRY.register(CallbackMetric('milap_frames_skipped_total', 'Frames the detection scheduler skipped', 'counter',
+                                     scheduler_skips))
+    REGISTRY.register(CallbackMetric('milap_gallery_size', 'Encodings in the live face gallery', 'gauge',
+                                     lambda: [({}, len(face_recognizer.gallery) if face_recognizer else 0)]))
+    REGISTRY.register(CallbackMetric('milap_gallery_bytes', 'Approximate memory held by the live face gallery', 'gauge',
+                                     lambda: [({}, face_recognizer.gallery.nbytes if face_recognizer else 0)]))
+    REGISTRY.register(CallbackMetric('milap_alert_queue_depth', 'Alerts waiting to be delivered', 'gauge',
+                                     lambda: [({}, alert_dispatcher.pending_count())]))
+    REGISTRY.register(CallbackMetric('milap_alerts_failed', 'Alerts given up on after all retries', 'gauge',
+                                     lambda: [({}, alert_dispatcher.failed_count())]))
+    return app
+
 # Flask Routes
 @app.route('/')
 def index():
@@ -480,95 +623,246 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    """Video streaming route"""
-    return Response(generate_frames(),
+    """Video streaming route for the default camera source"""
+    return source_video_feed(camera_sources.default_id)
+
+@app.route('/video_feed/<source_id>')
+def source_video_feed(source_id):
+    """Video streaming route for one named camera source
+    
+    Optional query parameters pick the stream profile, e.g.
+    /video_feed/lobby?width=320&quality=60&fps=5 for a thumbnail.
+    """
+    if source_id not in camera_sources:
+        return jsonify({'status': 'error', 'message': f'Unknown camera source: {source_id}'}), 404
+    try:
+        profile = parse_stream_profile(request.args, default_quality=STREAM_JPEG_QUALITY)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return Response(generate_frames(source_id, profile),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/api/start_detection', methods=['POST'])
 def start_detection():
     """Start face detection"""
-    global detection_active, face_recognizer
-    
-    if detection_active:
-        return jsonify({'status': 'already_running'})
+    global face_recognizer, gallery_sync, detection_pool, encoding_batcher
     
-    try:
-        # Initialize face recognizer FIRST (before downloading)
-        print("Initializing face recognizer...")
-        face_recognizer = WebFaceRecognizer()
-        
-        # Fetch latest approved cases from database
-        print("Fetching approved cases from database...")
-        processed = download_images()
+    with detection_control_lock:
+        if detection_active.is_set():
+            return jsonify({'status': 'already_running'})
         
-        # Load face encodings from downloaded images
-        print("Loading face encodings from database images...")
-        
-        # Try to load face encodings
-        if not face_recognizer.load_encoding_images():
+        try:
+            recognizer = load_recognizer()
+            if recognizer is None:
+                return jsonify({
+                    'status': 'error', 
+                    'message': 'No face encodings loaded. Please ensure your backend is running and has approved missing person cases in the database.'
+                })
+            
+            # Keep the gallery in step with newly approved / withdrawn cases
+            gallery_sync = GallerySync(recognizer, API_BASE_URL,
+                                       interval=GALLERY_SYNC_INTERVAL,
+                                       reconcile_every=GALLERY_RECONCILE_EVERY)
+            gallery_sync.seed(recognizer.gallery, recognizer.sync_cursor)
+            gallery_sync.start()
+            
+            if DETECTION_WORKERS > 0:
+                if detection_pool is None:
+                    log.info("Starting %d detection worker processes...", DETECTION_WORKERS)
+                    detection_pool = DetectionPool(DETECTION_WORKERS, detector=FACE_DETECTOR,
+                                                   detector_options=detector_options(FACE_DETECTOR))
+                    atexit.register(detection_pool.shutdown)
+                recognizer.detection_pool = detection_pool
+            elif ENCODE_BATCH_SIZE > 0:
+                if encoding_batcher is None:
+                    encoding_batcher = EncodingBatcher(ENCODE_BATCH_SIZE, ENCODE_BATCH_WAIT_MS / 1000.0).start()
+                    atexit.register(encoding_batcher.stop)
+                recognizer.encoding_batcher = encoding_batcher
+            
+            # Deliver queued alerts, including any left over from a previous run
+            alert_dispatcher.start()
+            location_service.refresh_async([source.source_id for source in camera_sources])
+            
+            detection_active.set()
+            
+            # Every source watches continuously, whether or not anyone is viewing it
+            started_sources = [source.source_id for source in camera_sources if start_source(source)]
+            
+            loaded_faces = len(recognizer.gallery)
             return jsonify({
-                'status': 'error', 
-                'message': 'No face encodings loaded. Please ensure your backend is running and has approved missing person cases in the database.'
+                'status': 'started', 
+                'loaded_faces': loaded_faces,
+                'sources': started_sources,
+                'message': f'Successfully loaded {loaded_faces} approved missing person cases from database'
             })
-        
-        detection_active = True
-        return jsonify({
-            'status': 'started', 
-            'loaded_faces': len(face_recognizer.known_face_names),
-            'message': f'Successfully loaded {len(face_recognizer.known_face_names)} approved missing person cases from database'
-        })
-        
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)})
+            
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)})
 
 @app.route('/api/stop_detection', methods=['POST'])
 def stop_detection():
     """Stop face detection"""
-    global detection_active, camera, detected_persons
-    
-    print("🛑 Stopping detection...")
-    detection_active = False
+    global gallery_sync
     
-    # Give time for frame generation to stop
-    time.sleep(0.5)
-    
-    # Release camera gracefully
-    if camera:
+    with detection_control_lock:
+        log.info("🛑 Stopping detection...")
+        detection_active.clear()
+        
+        if gallery_sync:
+            gallery_sync.stop()
+            gallery_sync = None
+        
+        # Stop every source's pipeline and release its camera
+        camera_sources.stop_all()
         try:
-            camera.release()
             cv2.destroyAllWindows()  # Clean up any OpenCV windows
-            print("✅ Camera released successfully")
-        except Exception as e:
-            print(f"⚠️ Camera release warning (can be ignored): {e}")
-        finally:
-            camera = None
-    
-    # Clear detection history when stopping
-    detected_persons.clear()
-    print("✅ Detection stopped - cleared detection history")
+        except cv2.error:
+            pass  # Headless OpenCV builds have no window support
+        log.info("✅ Cameras released successfully")
+        
+        # Clear detection history when stopping
+        detection_cooldowns.clear()
+        log.info("✅ Detection stopped - cleared detection history")
     
     return jsonify({'status': 'stopped'})
 
 @app.route('/api/detection_status')
 def detection_status():
     """Get detection status"""
-    global latest_detection
-    
+    recognizer = face_recognizer
     return jsonify({
-        'active': detection_active,
+        'active': detection_active.is_set(),
         'latest_detection': latest_detection,
-        'loaded_faces': len(face_recognizer.known_face_names) if face_recognizer else 0
+        'loaded_faces': len(recognizer.gallery) if recognizer else 0,
+        'gallery_precision': GALLERY_PRECISION,
+        # Bound on how far any match distance can be from the unquantized one
+        'max_quantization_error': recognizer.gallery.matcher.max_error if recognizer else 0.0,
+        'sources': camera_sources.status(),
+        'sources_down': camera_sources.down(),
+        'pending_alerts': alert_dispatcher.pending_count(),
+        'encoding_batches': encoding_batcher.stats() if encoding_batcher else None
+    })
+
+@app.route('/api/sources')
+def list_sources():
+    """Configured camera sources and their detection status"""
+    return jsonify({
+        'default': camera_sources.default_id,
+        'sources': list(camera_sources.status().values())
     })
 
+def resolve_batch_path(path):
+    """Absolute path of a batch input, or None if it is outside BATCH_INPUT_DIR"""
+    root = os.path.realpath(BATCH_INPUT_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if resolved != root and not resolved.startswith(root + os.sep):
+        return None
+    return resolved
+
+def run_batch_job(job, paths, options):
+    """Run one batch job, on the batch thread"""
+    try:
+        # Without live detection, load a gallery just for this job. Holding the lock keeps a
+        # start_detection from loading / flushing the shared encoding store at the same time
+        with detection_control_lock:
+            recognizer = face_recognizer or build_recognizer()
+            if recognizer is None:
+                raise RuntimeError('No face encodings loaded')
+            gallery = recognizer.gallery.compacted()  # Rows line up with live people only
+
+        matcher = BatchMatcher(gallery.encodings, gallery.names, gallery.adhaar_numbers, workers=BATCH_WORKERS or None,
+                               detector=FACE_DETECTOR, detector_options=detector_options(FACE_DETECTOR),
+                               **options)
+        job['status'] = 'running'
+        job['result'] = matcher.run(paths, progress=lambda done, total: job.update(progress=[done, total]))
+        job['status'] = 'finished'
+        log.info("✅ Batch job %s finished: %d cases matched", job['id'], len(job['result']['cases']))
+    except Exception as e:
+        job['status'] = 'error'
+        job['error'] = str(e)
+        log.exception("❌ Batch job %s failed: %s", job['id'], e)
+    finally:
+        job['finished_at'] = time.time()
+
+def batch_worker():
+    """Run queued batch jobs one at a time, so jobs never compete for the cores"""
+    while True:
+        run_batch_job(*batch_queue.get())
+
+def prune_batch_jobs(now):
+    """Drop finished jobs older than BATCH_JOB_TTL, then the oldest beyond BATCH_JOB_LIMIT; call under batch_jobs_lock"""
+    finished = sorted((job for job in batch_jobs.values() if job['finished_at'] is not None),
+                      key=lambda job: job['finished_at'])
+    for i, job in enumerate(finished):
+        if now - job['finished_at'] > BATCH_JOB_TTL or len(finished) - i > BATCH_JOB_LIMIT:
+            del batch_jobs[job['id']]
+
+@app.route('/api/batch_jobs', methods=['POST'])
+def create_batch_job():
+    """Match recorded videos / image folders under BATCH_INPUT_DIR against the gallery
+    
+    Body: {"paths": ["cam1/2024-05-01.mp4", "photos/"], "sample_fps": 1, "chunk_seconds": 60}
+    """
+    global batch_queue
+    body = request.get_json(silent=True) or {}
+    paths = body.get('paths')
+    if not isinstance(paths, list) or not paths:
+        return jsonify({'status': 'error', 'message': "'paths' must be a non-empty list"}), 400
+    
+    resolved = [resolve_batch_path(str(path)) for path in paths]
+    if None in resolved:
+        return jsonify({'status': 'error', 'message': f'Paths must be inside {BATCH_INPUT_DIR}'}), 400
+    missing = [path for path, full_path in zip(paths, resolved) if not os.path.exists(full_path)]
+    if missing:
+        return jsonify({'status': 'error', 'message': f'Not found: {missing}'}), 404
+    
+    try:
+        options = {'sample_fps': float(body.get('sample_fps', 1.0)),
+                   'chunk_seconds': float(body.get('chunk_seconds', 60))}
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': "'sample_fps' and 'chunk_seconds' must be numbers"}), 400
+    if not all(math.isfinite(value) and value > 0 for value in options.values()):  # float('nan') parses
+        return jsonify({'status': 'error', 'message': "'sample_fps' and 'chunk_seconds' must be positive"}), 400
+    
+    now = time.time()
+    job = {'id': uuid.uuid4().hex[:12], 'status': 'queued', 'paths': paths, 'progress': [0, 0],
+           'created_at': now, 'finished_at': None, 'result': None, 'error': None}
+    with batch_jobs_lock:
+        prune_batch_jobs(now)
+        if batch_queue is None:
+            batch_queue = queue.Queue(maxsize=BATCH_QUEUE_LIMIT)
+            threading.Thread(target=batch_worker, name='batch', daemon=True).start()
+        try:
+            batch_queue.put_nowait((job, resolved, options))
+        except queue.Full:
+            return jsonify({'status': 'error', 'message': 'Too many batch jobs queued, try again later'}), 429
+        batch_jobs[job['id']] = job
+    return jsonify({'status': 'queued', 'job_id': job['id']}), 202
+
+@app.route('/api/batch_jobs/<job_id>')
+def batch_job_status(job_id):
+    """Progress of a batch job, with its per-case matches once finished"""
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': f"Unknown batch job '{job_id}'"}), 404
+    return jsonify(job)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text-format metrics"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health')
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy', 'timestamp': time.time()})
 
 if __name__ == '__main__':
+    init_app()
     print("Starting Milap.AI Face Recognition Web Server...")
     print("Server will be available at: http://localhost:5001")
     print("Video feed: http://localhost:5001/video_feed")
+    print(f"Camera sources: {', '.join(f'/video_feed/{source.source_id}' for source in camera_sources)}")
     print("API docs: http://localhost:5001/api/health")
     
-    app.run(host='0.0.0.0', port=5001, debug=True, threaded=True)
+    app.run(host='0.0.0.0', port=5001, debug=FLASK_DEBUG, threaded=True)
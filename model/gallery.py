@@ -0,0 +1,219 @@
+"""Immutable face gallery snapshots and the detection cooldown table
+
+A `Gallery` is never changed after it is built: reloads and syncs build a
+new one and swap the recognizer's reference, so readers (detection threads,
+status requests) just take the current reference without locking and always
+see encodings, matcher and details that belong together.
+
+Galleries are columnar (a float32 or quantized encoding matrix in the
+matcher, packed string columns and a hash index for names) so a case costs
+a few hundred bytes instead of a float64 array plus lists and dicts. The
+columns and matcher rows are append-only and shared between versions, so a
+new version for a sync costs O(changes) rather than a rebuild.
+"""
+import copy
+import threading
+import time
+
+import numpy as np
+
+from columns import StringColumn
+from face_matcher import BruteForceMatcher
+
+PERSON_FIELDS = ('name', 'phone', 'adhaar', 'case_id', 'updated_at')
+
+
+class NameIndex:
+    """Case-insensitive name -> row lookup
+
+    Rows present when the index is built are found by binary search over
+    sorted name hashes and confirmed against the stored name, so hash
+    collisions cost a comparison, not a wrong row. Rows added later by syncs
+    sit in a small dict until the gallery is compacted.
+    """
+
+    def __init__(self, names):
+        self._names = names
+        hashes = np.fromiter((hash(name.lower()) for name in names), dtype=np.int64, count=len(names))
+        self._order = np.argsort(hashes, kind='stable').astype(np.int32)
+        self._hashes = hashes[self._order]
+        self._added = {}  # lowercase name -> row, for rows added after the build
+
+    def get(self, name, removed=frozenset()):
+        """Row of a name that is not in `removed`, or None"""
+        key = name.lower()
+        row = self._added.get(key)
+        if row is not None and row not in removed:
+            return row
+        position = int(np.searchsorted(self._hashes, hash(key)))
+        while position < len(self._hashes) and self._hashes[position] == hash(key):
+            row = int(self._order[position])
+            if row not in removed and self._names[row].lower() == key:
+                return row
+            position += 1
+        return None
+
+    def updated(self, added):
+        """New index that also maps the lowercase names in `added` to their rows"""
+        index = copy.copy(self)
+        index._added = {**self._added, **added}
+        return index
+
+    @property
+    def nbytes(self):
+        return self._hashes.nbytes + self._order.nbytes
+
+
+class Gallery:
+    """One consistent version of the gallery, stored column by column
+
+    `persons` are dicts with an 'encoding' and the PERSON_FIELDS; the first
+    person with a given name (case-insensitively) wins. Encodings live only
+    in the matcher (quantized if it was created with a lower precision) and
+    the person fields in StringColumns, so no per-person Python objects are
+    kept.
+
+    `with_changes` appends rows and marks replaced or dropped ones removed,
+    so a sync costs O(changes). Once more than `compact_ratio` of the rows
+    are removed the gallery is compacted. Row numbers are shared by the
+    columns and the matcher, so `names[row]` is the person a match refers to.
+    """
+
+    def __init__(self, persons=(), matcher=None, compact_ratio=0.1):
+        seen = set()
+        kept = []
+        for person in persons:
+            if person['name'].lower() not in seen:
+                seen.add(person['name'].lower())
+                kept.append(person)
+        self.names = StringColumn(person['name'] for person in kept)
+        self.phones = StringColumn(person['phone'] for person in kept)
+        self.adhaar_numbers = StringColumn(person['adhaar'] for person in kept)
+        self.case_ids = StringColumn(person.get('case_id') for person in kept)
+        self.updated_ats = StringColumn(person.get('updated_at') for person in kept)
+        self.compact_ratio = compact_ratio
+        self._rows = NameIndex(self.names)
+        self._removed = frozenset()  # rows replaced or dropped since the last compaction
+        matcher = matcher if matcher is not None else BruteForceMatcher()
+        self.matcher = matcher.build([person['encoding'] for person in kept])
+
+    def __len__(self):
+        return len(self.names) - len(self._removed)
+
+    @property
+    def encodings(self):
+        """All rows' encodings as a float32 (N, 128) matrix, as stored by the matcher
+
+        Removed rows are included until the gallery is compacted, so take
+        them from `compacted()` when they must line up with live people only.
+        """
+        return self.matcher.encodings()
+
+    @property
+    def nbytes(self):
+        """Approximate bytes held by the gallery's columns and matcher"""
+        return sum(column.nbytes for column in self._columns()) + self._rows.nbytes + self.matcher.nbytes
+
+    def row(self, name):
+        """Row of a person by name (case-insensitive), or None"""
+        return self._rows.get(name, self._removed)
+
+    def _columns(self):
+        return self.names, self.phones, self.adhaar_numbers, self.case_ids, self.updated_ats
+
+    def _live_rows(self):
+        return [row for row in range(len(self.names)) if row not in self._removed]
+
+    def details(self, name):
+        """Person fields (no encoding) for a name, or None if it is not in the gallery"""
+        row = self.row(name)
+        if row is None:
+            return None
+        return {field: column[row] for field, column in zip(PERSON_FIELDS, self._columns())}
+
+    def persons(self):
+        """Person dicts with encodings for everyone in the gallery"""
+        columns = [list(column) for column in self._columns()]
+        encodings = self.encodings
+        return [dict(zip(PERSON_FIELDS, [column[row] for column in columns]), encoding=encodings[row])
+                for row in self._live_rows()]
+
+    def with_changes(self, upserts, removed_names):
+        """New gallery with `removed_names` dropped and `upserts` added or replaced
+
+        Only the upserts are encoded into the matcher; the rows of everyone
+        else, and their codes, are shared with this gallery.
+        """
+        added = {}
+        for person in upserts:
+            added.setdefault(person['name'].lower(), person)
+        removed = set(self._removed)
+        for name in list(removed_names) + [person['name'] for person in added.values()]:
+            row = self.row(name)
+            if row is not None:
+                removed.add(row)
+
+        persons = list(added.values())
+        gallery = copy.copy(self)
+        gallery.names = self.names.appended(person['name'] for person in persons)
+        gallery.phones = self.phones.appended(person['phone'] for person in persons)
+        gallery.adhaar_numbers = self.adhaar_numbers.appended(person['adhaar'] for person in persons)
+        gallery.case_ids = self.case_ids.appended(person.get('case_id') for person in persons)
+        gallery.updated_ats = self.updated_ats.appended(person.get('updated_at') for person in persons)
+        gallery._rows = self._rows.updated({key: len(self.names) + i for i, key in enumerate(added)})
+        gallery._removed = frozenset(removed)
+        gallery.matcher = self.matcher.updated([person['encoding'] for person in persons],
+                                               sorted(removed - self._removed))
+        if len(removed) > self.compact_ratio * len(gallery.names):
+            return gallery.compacted()
+        return gallery
+
+    def compacted(self):
+        """Equivalent gallery without removed rows (this gallery if there are none)"""
+        if not self._removed:
+            return self
+        rows = self._live_rows()
+        gallery = copy.copy(self)
+        gallery.names, gallery.phones, gallery.adhaar_numbers, gallery.case_ids, gallery.updated_ats = (
+            column.take(rows) for column in self._columns())
+        gallery._rows = NameIndex(gallery.names)
+        gallery._removed = frozenset()
+        gallery.matcher = self.matcher.taken(rows)
+        return gallery
+
+
+class CooldownTable:
+    """Thread-safe 'last notified' times that expire after `ttl` seconds
+
+    `acquire` checks and starts a cooldown in one step, so two threads
+    seeing the same person at once cannot both notify. Expired entries are
+    purged every `purge_interval` seconds so the table stays bounded by the
+    people seen within one cooldown.
+    """
+
+    def __init__(self, ttl, purge_interval=60.0):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._started = {}  # key -> time the cooldown started
+        self._lock = threading.Lock()
+        self._last_purge = time.time()
+
+    def __len__(self):
+        return len(self._started)
+
+    def acquire(self, key, now=None):
+        """(True, 0) and start a cooldown if `key` has none, else (False, seconds remaining)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if now - self._last_purge >= self.purge_interval:
+                self._started = {k: t for k, t in self._started.items() if now - t < self.ttl}
+                self._last_purge = now
+            started = self._started.get(key)
+            if started is not None and now - started < self.ttl:
+                return False, self.ttl - (now - started)
+            self._started[key] = now
+            return True, 0.0
+
+    def clear(self):
+        with self._lock:
+            self._started.clear()
@@ -0,0 +1,150 @@
+"""Cold-start gallery loading: stream the approved cases and encode them in parallel
+
+The backend returns every approved case, image included, as one JSON array.
+It is parsed element by element as it arrives (see json_stream), each image
+is decoded straight from its base64 payload into an array, and images that
+are not in the encoding store yet are encoded across a pool of worker
+processes.
+"""
+import base64
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+import face_recognition
+import numpy as np
+
+from app_logging import get_logger
+from encoding_store import content_hash
+
+log = get_logger('gallery_ingest')
+
+
+def case_key(case):
+    """Stable identifier of a case across syncs"""
+    return case.get('caseId') or case.get('_id')
+
+
+def case_image_bytes(image_data):
+    """Raw image file bytes of a base64 (optionally data-URL prefixed) case image, or None"""
+    if not isinstance(image_data, str) or not image_data:
+        return None
+    if image_data.startswith('data:'):
+        image_data = image_data.split(',', 1)[1]
+    return base64.b64decode(image_data)
+
+
+def encode_image_bytes(image_bytes):
+    """(decoded, encoding) for an encoded image file; encoding is None when no face is found"""
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return False, None
+    face_encodings = face_recognition.face_encodings(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return True, (face_encodings[0] if len(face_encodings) > 0 else None)
+
+
+def _person(case, encoding):
+    return {
+        'name': case['name'],
+        'phone': case['contactNumber'],
+        'adhaar': case['adhaarNumber'],
+        'case_id': case_key(case),
+        'updated_at': case.get('updatedAt'),
+        'encoding': encoding,
+    }
+
+
+def ingest_cases(cases, encoding_store, workers=1, max_in_flight=None):
+    """Encode approved cases into gallery entries, in input order
+
+    Encodings already in the store are reused; the rest are decoded and
+    encoded in memory by a process pool (started only if there is something
+    to encode). At most `max_in_flight` images are queued for the pool at a
+    time, so cases are consumed from the (streaming) iterable as encoding
+    keeps up. Every case that was looked at is recorded in the store.
+
+    A name is skipped only once an earlier case with that name produced an
+    encoding, so a duplicate case can stand in for an image with no face.
+    """
+    max_in_flight = max_in_flight or 4 * workers
+    results = {}  # input position -> person
+    pending = {}  # future -> (position, case, image hash)
+    seen_names = set()  # lowercase names that already have an encoding
+    executor = None
+
+    def collect(done):
+        for future in done:
+            position, case, image_hash = pending.pop(future)
+            try:
+                decoded, encoding = future.result()
+            except Exception as e:
+                log.error("Error encoding image for %s: %s", case['name'], e)
+                continue
+            if not decoded:
+                log.warning("Failed to decode image for %s", case['name'])
+                continue
+            encoding_store.put(case['name'], case['adhaarNumber'], image_hash, encoding)
+            if encoding is None:
+                log.warning("❌ No faces found in image for %s", case['name'])
+                continue
+            seen_names.add(case['name'].lower())
+            results[position] = _person(case, encoding)
+
+    try:
+        for position, case in enumerate(cases):
+            name, adhaar = case.get('name'), case.get('adhaarNumber')
+            if not name or not adhaar or not case.get('contactNumber'):
+                log.warning("Skipping case - missing required fields: %s", case.get('name', 'N/A'))
+                continue
+            if name.lower() in seen_names:
+                log.debug("Encoding already exists for %s, skipping...", name)
+                continue
+            try:
+                image_bytes = case_image_bytes(case.pop('image', None))
+            except Exception as e:
+                log.error("Error decoding image for %s: %s", name, e)
+                continue
+            if image_bytes is None:
+                log.warning("No image data found in database for %s", name)
+                continue
+
+            image_hash = content_hash(image_bytes)
+            hit, encoding = encoding_store.lookup(name, adhaar, image_hash)
+            if hit:
+                encoding_store.put(name, adhaar, image_hash, encoding)
+                if encoding is not None:
+                    seen_names.add(name.lower())
+                    results[position] = _person(case, encoding)
+                continue
+
+            if workers <= 1:
+                decoded, encoding = encode_image_bytes(image_bytes)
+                if decoded:
+                    encoding_store.put(name, adhaar, image_hash, encoding)
+                if decoded and encoding is not None:
+                    seen_names.add(name.lower())
+                    results[position] = _person(case, encoding)
+                else:
+                    log.warning("❌ No usable face in image for %s", name)
+                continue
+
+            if executor is None:
+                log.info("Encoding new gallery images in %d worker processes...", workers)
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(encode_image_bytes, image_bytes)] = (position, case, image_hash)
+
+        if pending:
+            done, _ = wait(pending)
+            collect(done)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # Duplicates that were in flight together: the earliest case with a face wins
+    persons = {}
+    for position in sorted(results):
+        persons.setdefault(results[position]['name'].lower(), results[position])
+    return list(persons.values())
@@ -0,0 +1,184 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from app_logging import get_logger
+from gallery_ingest import case_image_bytes, case_key
+from metrics import timed_request
+
+log = get_logger('gallery_sync')
+
+APPROVED_STATUS = 'approved'
+
+
+def sync_cursor(margin=60.0):
+    """Current UTC time minus `margin` seconds, in the backend's updatedAt format
+
+    Taken before the full load starts, so a case edited while the load is
+    streaming is fetched again by the first delta. The margin covers clock
+    skew with the backend; re-fetched versions that are already loaded are
+    skipped.
+    """
+    moment = datetime.now(timezone.utc) - timedelta(seconds=margin)
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class GallerySync:
+    """Keeps a live WebFaceRecognizer in step with the approved cases in the backend
+
+    After the initial full download, each tick asks the backend only for cases
+    updated since the last seen `updatedAt` and applies the delta to the
+    recognizer: new approved cases are encoded and added, changed cases are
+    re-encoded, and cases that left the approved state are dropped. Deleted
+    cases never show up in a delta, so every `reconcile_every` ticks the list
+    of approved case ids is fetched (no images) to drop them too.
+    """
+
+    def __init__(self, recognizer, api_base_url, interval=10, reconcile_every=30):
+        self.recognizer = recognizer
+        self.api_base_url = api_base_url
+        self.interval = interval
+        self.reconcile_every = reconcile_every
+        self.versions = {}    # case key -> updatedAt of the version loaded
+        self.case_names = {}  # case key -> name the case is loaded under
+        self.cursor = None    # highest updatedAt seen so far
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._ticks = 0
+
+    def seed(self, gallery, cursor):
+        """Record the case versions loaded by the initial full download
+
+        `cursor` is a sync_cursor() taken before that download started, not
+        the newest updatedAt it returned: a case edited mid-download may have
+        been streamed in its old version while later cases carry newer times.
+        """
+        gallery = gallery.compacted()
+        for key, name, updated_at in zip(gallery.case_ids, gallery.names, gallery.updated_ats):
+            if not key:
+                continue
+            self.versions[key] = updated_at
+            self.case_names[key] = name
+        self.cursor = cursor
+
+    def _advance_cursor(self, updated_at):
+        # updatedAt is an ISO-8601 UTC string, so string order is time order
+        if updated_at and (self.cursor is None or updated_at > self.cursor):
+            self.cursor = updated_at
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="gallery-sync", daemon=True)
+        self._thread.start()
+        log.info("🔄 Gallery sync running every %ss", self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self._ticks += 1
+                self.sync_once(reconcile=self._ticks % self.reconcile_every == 0)
+            except Exception as e:
+                log.error("Gallery sync error: %s", e)
+
+    def fetch_delta(self):
+        url = f"{self.api_base_url}/cases/approved/face-recognition"
+        params = {'since': self.cursor} if self.cursor else None
+        response = timed_request('backend', requests.get, url, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_approved_keys(self):
+        url = f"{self.api_base_url}/cases/approved/face-recognition/ids"
+        response = timed_request('backend', requests.get, url, timeout=10)
+        response.raise_for_status()
+        return {case_key(case) for case in response.json()}
+
+    def sync_once(self, reconcile=False):
+        """Fetch and apply one delta; returns (added_or_updated, removed)"""
+        full_fetch = self.cursor is None
+        cases = self.fetch_delta()
+
+        upserts = []
+        removed_names = []
+        seen = set()
+        for case in cases:
+            key = case_key(case)
+            if not key:
+                continue
+            seen.add(key)
+            self._advance_cursor(case.get('updatedAt'))
+
+            if case.get('status', APPROVED_STATUS) != APPROVED_STATUS:
+                if key in self.versions:
+                    removed_names.append(self._forget(key))
+                continue
+
+            if key in self.versions and self.versions[key] == case.get('updatedAt'):
+                continue  # Already loaded; the cursor is inclusive
+
+            person = self._prepare_case(key, case)
+            if person is None:
+                continue
+            if key in self.case_names and self.case_names[key] != person['name']:
+                removed_names.append(self.case_names[key])  # Renamed
+            upserts.append(person)
+            self.versions[key] = case.get('updatedAt')
+            self.case_names[key] = person['name']
+
+        stale = set()
+        if full_fetch:
+            stale = set(self.versions) - seen
+        elif reconcile:
+            stale = set(self.versions) - self.fetch_approved_keys()
+        for key in stale:
+            removed_names.append(self._forget(key))
+
+        if upserts or removed_names:
+            self.recognizer.apply_gallery_changes(upserts, removed_names)
+            gallery = self.recognizer.gallery
+            log.info("🔄 Gallery sync: %d added/updated, %d removed (%d faces loaded, max quantization error %.4f)",
+                     len(upserts), len(removed_names), len(gallery), gallery.matcher.max_error)
+
+        if reconcile:
+            self.recognizer.flush_encoding_store()
+
+        return len(upserts), len(removed_names)
+
+    def _forget(self, key):
+        self.versions.pop(key, None)
+        return self.case_names.pop(key, None)
+
+    def _prepare_case(self, key, case):
+        """Decode and encode one approved case; None if it can't be matched"""
+        name = case.get('name')
+        adhaar = case.get('adhaarNumber')
+        contact = case.get('contactNumber')
+        if not name or not adhaar or not contact:
+            log.warning("Skipping case - missing required fields: %s", case.get('name', 'N/A'))
+            return None
+
+        try:
+            image_bytes = case_image_bytes(case.get('image'))
+        except Exception as e:
+            log.error("Error decoding image for %s: %s", name, e)
+            return None
+        if image_bytes is None:
+            log.warning("No image data found for %s", name)
+            return None
+
+        encoding = self.recognizer.encode_case_image(name, adhaar, image_bytes)
+        if encoding is None:
+            log.warning("❌ No faces found in synced image for %s", name)
+            return None
+
+        return {'name': name, 'phone': contact, 'adhaar': adhaar, 'case_id': key,
+                'updated_at': case.get('updatedAt'), 'encoding': encoding}
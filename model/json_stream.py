@@ -0,0 +1,91 @@
+"""Incremental parsing of a JSON array streamed as byte chunks
+
+The backend returns every approved case, image included, as one JSON array;
+`iter_json_array` yields its elements as they arrive instead of waiting for
+(and holding) the whole response.
+"""
+import codecs
+import json
+import re
+
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_SCALAR = re.compile(r'[^,\]\s]+')
+_WHITESPACE = re.compile(r'\s*')
+
+
+def _string_end(text, start):
+    """Index just past the closing quote of a string whose contents begin at `start`, or None"""
+    position = start
+    while True:
+        # str.find skips long strings (base64 images) at memchr speed
+        quote = text.find('"', position)
+        if quote < 0:
+            return None
+        backslashes = 0
+        while quote - backslashes > start and text[quote - backslashes - 1] == '\\':
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return quote + 1
+        position = quote + 1
+
+
+def _scan_value(text, start):
+    """End index of the JSON value starting at `start`, or None if it is not complete yet"""
+    first = text[start]
+    if first == '"':
+        return _string_end(text, start + 1)
+    if first not in '{[':
+        end = _SCALAR.match(text, start).end()
+        return end if end < len(text) else None  # Need the delimiter to know the scalar ended
+
+    depth = 0
+    position = start
+    while True:
+        match = _STRUCTURAL.search(text, position)
+        if match is None:
+            return None
+        if match.group() == '"':
+            position = _string_end(text, match.end())
+            if position is None:
+                return None
+            continue
+        depth += 1 if match.group() in '{[' else -1
+        position = match.end()
+        if depth == 0:
+            return position
+
+
+def iter_json_array(chunks):
+    """Yield the elements of a JSON array read from an iterable of UTF-8 byte chunks
+
+    Only the element being parsed is buffered, so a large response (one
+    base64 image per case) is never held in memory as a whole.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    text = ''
+    position = 0
+    opened = False
+    for chunk in chunks:
+        text = text[position:] + decoder.decode(chunk)
+        position = 0
+        while True:
+            position = _WHITESPACE.match(text, position).end()
+            if position >= len(text):
+                break
+            if not opened:
+                if text[position] != '[':
+                    raise ValueError("Expected a JSON array")
+                opened = True
+                position += 1
+                continue
+            if text[position] == ']':
+                return
+            if text[position] == ',':
+                position += 1
+                continue
+            end = _scan_value(text, position)
+            if end is None:
+                break
+            yield json.loads(text[position:end])
+            position = end
+    raise ValueError("JSON array ended unexpectedly")
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+from app_logging import get_logger
+from metrics import timed_request
+
+log = get_logger('location')
+
+GEOJS_URL = "https://get.geojs.io/v1/ip/geo.json"
+
+
+def fetch_geojs_location(session=None, timeout=5):
+    """Current location of this machine's public IP using the GeoJS API"""
+    try:
+        response = timed_request('geolocation', (session or requests).get, GEOJS_URL, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        log.warning("Error getting location: %s", e)
+        return None
+
+
+class StaticLocationProvider:
+    """A fixed location, e.g. a camera's configured coordinates or a stand-in for tests"""
+
+    def __init__(self, location):
+        self.location = dict(location)
+
+    def peek(self):
+        return self.location
+
+    def get(self, session=None):
+        return self.location
+
+    def refresh_async(self):
+        pass
+
+
+class CachedLocationProvider:
+    """Caches a slow location lookup for `ttl` seconds
+
+    `peek()` never does I/O: it returns the cached location (even if stale)
+    and, once it is stale, starts a single background refresh. `get()` may
+    block on a lookup and is meant for background workers only.
+    """
+
+    def __init__(self, fetch=fetch_geojs_location, ttl=3600):
+        self.fetch = fetch
+        self.ttl = ttl
+        self._location = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def stale(self):
+        return self._location is None or time.time() - self._fetched_at > self.ttl
+
+    def peek(self):
+        if self.stale:
+            self.refresh_async()
+        return self._location
+
+    def get(self, session=None):
+        if self.stale:
+            self._refresh(session)
+        return self._location
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="location-refresh", daemon=True).start()
+
+    def _refresh(self, session=None):
+        try:
+            location = self.fetch(session)
+            if location:
+                with self._lock:
+                    self._location = location
+                    self._fetched_at = time.time()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+def load_camera_locations(config):
+    """Per-camera locations from a JSON string or a path to a JSON file
+
+    Format: {"lobby": {"latitude": 28.61, "longitude": 77.21, "city": "New Delhi", ...}}
+    """
+    if not config:
+        return {}
+    if os.path.exists(config):
+        with open(config, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(config)
+
+
+class LocationService:
+    """Location of each camera source: its static coordinates, else the shared cached lookup"""
+
+    def __init__(self, default_provider, camera_locations=None):
+        self.default_provider = default_provider
+        self.providers = {source_id: StaticLocationProvider(location)
+                          for source_id, location in (camera_locations or {}).items()}
+
+    def provider_for(self, source_id):
+        return self.providers.get(source_id, self.default_provider)
+
+    def peek(self, source_id=None):
+        """Location without any network I/O; None until the first lookup completes"""
+        return self.provider_for(source_id).peek()
+
+    def get(self, source_id=None, session=None):
+        """Location, looking it up if necessary; for background workers"""
+        return self.provider_for(source_id).get(session)
+
+    def refresh_async(self, source_ids=None):
+        """Start the shared lookup, unless all of `source_ids` have static locations"""
+        if source_ids is None or any(source_id not in self.providers for source_id in source_ids):
+            self.default_provider.refresh_async()
@@ -0,0 +1,178 @@
+"""Minimal Prometheus text-format metrics: histograms, plus counters and gauges read at scrape time
+
+Observations take a short per-series lock and a bisect, so instrumentation
+can stay on in production. Values that already exist elsewhere (pipeline
+frame counters, queue depths) are read at scrape time through callback
+metrics instead of being counted twice.
+"""
+import bisect
+import math
+import threading
+import time
+
+from app_logging import get_logger
+
+log = get_logger('metrics')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = 0
+        samples = []
+        for bound, count in zip(self._buckets + (math.inf,), counts):
+            cumulative += count
+            samples.append(('_bucket', {'le': _format_value(bound)}, cumulative))
+        samples.append(('_sum', {}, total))
+        samples.append(('_count', {}, cumulative))
+        return samples
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, _HistogramChild(self.buckets))
+        return child
+
+    def _default(self):
+        return self.labels() if not self.labelnames else None
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def samples(self):
+        """(suffix, labels, value) for every series"""
+        for key, child in list(self._children.items()):
+            for suffix, extra, value in child.samples():
+                yield suffix, {**dict(zip(self.labelnames, key)), **extra}, value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines += [f'{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}'
+                  for suffix, labels, value in self.samples()]
+        return '\n'.join(lines)
+
+
+class CallbackMetric:
+    """A counter or gauge whose series are computed at scrape time by `collect()`
+
+    `collect` returns a list of (labels dict, value) pairs. Counter names end
+    in `_total`, which the TYPE line and the samples share.
+    """
+
+    def __init__(self, name, documentation, type, collect):
+        if type == 'counter' and not name.endswith('_total'):
+            raise ValueError(f"Counter '{name}' must end in '_total'")
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.collect = collect
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        try:
+            series = self.collect()
+        except Exception as e:
+            log.error("Metrics collection error for %s: %s", self.name, e)
+            series = []
+        lines += [f'{self.name}{_format_labels(labels)} {_format_value(value)}' for labels, value in series]
+        return '\n'.join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'milap_stage_seconds', 'Time spent per frame in each processing stage', ['stage']))
+FACES_PER_FRAME = REGISTRY.register(Histogram(
+    'milap_faces_per_frame', 'Faces found per detected frame', buckets=(0, 1, 2, 3, 5, 8, 13, 21)))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    'milap_http_request_seconds', 'Outbound HTTP request latency', ['target', 'outcome']))
+
+
+def timed_request(target, send, *args, **kwargs):
+    """Call `send(*args, **kwargs)` (e.g. session.post) and record its latency under `target`"""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        response = send(*args, **kwargs)
+        outcome = f'{response.status_code // 100}xx'
+        return response
+    finally:
+        HTTP_SECONDS.labels(target=target, outcome=outcome).observe(time.perf_counter() - started)
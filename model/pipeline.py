@@ -0,0 +1,378 @@
+import collections
+import queue
+import threading
+import time
+
+import cv2
+
+from app_logging import get_logger
+from metrics import FACES_PER_FRAME, STAGE_SECONDS
+from stream_encoding import OpenCVEncoder, StreamProfile, resize_to_width
+
+log = get_logger('pipeline')
+
+
+class DropOldestQueue:
+    """Bounded queue whose put never blocks: when full, the oldest item is dropped"""
+
+    def __init__(self, maxsize=1):
+        self._items = collections.deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Oldest queued item; raises queue.Empty after `timeout` seconds"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) > 0, timeout):
+                raise queue.Empty
+            return self._items.popleft()
+
+
+class FrameBroadcaster:
+    """Latest-value fan-out of encoded frames to any number of viewers
+
+    The producer only replaces the current frame and wakes waiting viewers;
+    it never waits on them. Each viewer yields the newest frame it has not
+    sent yet, so a slow client skips frames instead of holding anyone up.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._sequence = 0
+        self._closed = False
+        self.viewers = 0
+
+    def publish(self, frame_bytes):
+        with self._cond:
+            self._frame = frame_bytes
+            self._sequence += 1
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def subscribe(self, timeout=0.5):
+        """Yield each new frame until the broadcaster is closed"""
+        last_sequence = 0
+        with self._cond:
+            self.viewers += 1
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed or self._sequence != last_sequence, timeout)
+                    if self._closed:
+                        return
+                    if self._sequence == last_sequence:
+                        continue
+                    last_sequence, frame = self._sequence, self._frame
+                yield frame
+        finally:
+            with self._cond:
+                self.viewers -= 1
+
+
+def draw_detections(frame, face_locations, face_names):
+    """Draw recognition boxes and names onto a frame in place"""
+    for (top, right, bottom, left), name in zip(face_locations, face_names):
+        color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
+
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+        cv2.putText(frame, name, (left + 6, bottom - 6),
+                    cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 1)
+    return frame
+
+
+def outside_region(box, region):
+    """True if a (top, right, bottom, left) box does not overlap the region"""
+    top, right, bottom, left = box
+    region_top, region_right, region_bottom, region_left = region
+    return bottom <= region_top or top >= region_bottom or right <= region_left or left >= region_right
+
+
+class ProfileStream:
+    """Encoded output of one stream profile and the viewers sharing it"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.broadcaster = FrameBroadcaster()
+        self.last_encoded = 0.0
+        self.frames_encoded = 0
+
+    def due(self, now):
+        """True if the profile's frame-rate cap allows encoding a frame now"""
+        return not self.profile.max_fps or now - self.last_encoded >= 1.0 / self.profile.max_fps
+
+
+class FramePipeline:
+    """Capture, detection and JPEG encoding on separate threads
+
+    The capture thread feeds two drop-oldest queues: a one-slot queue for the
+    detection worker, which therefore always works on the most recent frame,
+    and a short queue for the encoder. The encoder overlays the latest
+    detection result on every frame it encodes, so the stream runs at camera
+    rate however long detection takes. Each stream profile (resolution,
+    quality, frame-rate cap) that has viewers is encoded once per frame and
+    fanned out to all of its viewers through a FrameBroadcaster, so encoding
+    cost grows with the number of distinct profiles, not viewers.
+
+    With a scheduler, `detect(frame, plan)` is called only for the frames
+    the scheduler picks. Skipped static frames keep the previous result on
+    screen, and after a region-of-interest detection boxes outside the
+    region are carried over from the previous result.
+
+    When a read fails and the capture has a `reconnect()` method, the
+    capture thread keeps calling it, backing off from `reconnect_delay` up
+    to `max_reconnect_delay` seconds, so a camera that drops out is watched
+    again as soon as it is back; viewers stay connected meanwhile.
+    """
+
+    def __init__(self, capture, detect, on_result=None, jpeg_quality=80, jpeg_encoder=None,
+                 queue_size=2, result_ttl=1.0, detect_threads=1, scheduler=None, max_profiles=8,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.capture = capture
+        self.detect = detect
+        self.scheduler = scheduler
+        self.on_result = on_result
+        self.detect_threads = detect_threads  # >1 only helps when detect releases the GIL (worker pool)
+        self.jpeg_encoder = jpeg_encoder or OpenCVEncoder()
+        self.default_profile = StreamProfile(0, jpeg_quality, 0)
+        self.max_profiles = max_profiles
+        self.result_ttl = result_ttl  # Hide boxes from detections older than this (seconds)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.detect_queue = DropOldestQueue(1)
+        self.encode_queue = DropOldestQueue(queue_size)
+        self._streams = {self.default_profile: ProfileStream(self.default_profile)}
+        self._streams_lock = threading.Lock()
+
+        self._result_lock = threading.Lock()
+        self._latest_result = (0, 0.0, [], [])
+        self._capture_seconds = STAGE_SECONDS.labels(stage='capture')
+        self._jpeg_seconds = STAGE_SECONDS.labels(stage='jpeg')
+        self._faces_per_frame = FACES_PER_FRAME.labels()
+        self._running = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+        self.frames_captured = 0
+        self.frames_detected = 0
+        self.disconnected_since = None  # time.time() of the failed read while reconnecting
+        self.reconnects = 0
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    @property
+    def connected(self):
+        return self.disconnected_since is None
+
+    def start(self):
+        self._stopped.clear()
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._encode_loop, name="encode", daemon=True),
+        ]
+        self._threads += [threading.Thread(target=self._detect_loop, name=f"detect-{i}", daemon=True)
+                          for i in range(self.detect_threads)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._running.clear()
+        self._stopped.set()
+        self._close_streams()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self._threads = []
+
+    def latest_result(self):
+        """(face_locations, face_names) of the newest detection, empty once stale"""
+        with self._result_lock:
+            _, detected_at, face_locations, face_names = self._latest_result
+        if time.time() - detected_at > self.result_ttl:
+            return [], []
+        return face_locations, face_names
+
+    def _capture_loop(self):
+        sequence = 0
+        pace = getattr(self.capture, 'pace', None)  # Video files are read at their frame rate
+        while self._running.is_set():
+            if pace is not None:
+                pace(self._stopped.wait)
+            started = time.perf_counter()
+            success, frame = self.capture.read()
+            self._capture_seconds.observe(time.perf_counter() - started)
+            if not success:
+                if not self._reconnect():
+                    break
+                continue
+            sequence += 1
+            self.frames_captured = sequence
+            self.detect_queue.put((sequence, frame))
+            self.encode_queue.put(frame)
+
+    def _reconnect(self):
+        """Reopen the capture after a failed read, with backoff; False once the pipeline should stop"""
+        reconnect = getattr(self.capture, 'reconnect', None)
+        if reconnect is None:
+            log.warning("Camera read failed, stopping pipeline")
+            self._running.clear()
+            self._close_streams()
+            return False
+
+        self.disconnected_since = time.time()
+        delay = self.reconnect_delay
+        while not self._stopped.wait(delay):
+            if reconnect():
+                self.reconnects += 1
+                self.disconnected_since = None
+                return True
+            delay = min(delay * 2, self.max_reconnect_delay)
+        return False
+
+    def _detect_loop(self):
+        while self._running.is_set():
+            try:
+                sequence, frame = self.detect_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if self.scheduler:
+                plan = self.scheduler.plan(frame)
+                if plan.skip:
+                    if plan.skip == 'static':
+                        self._keep_result()
+                    continue
+            try:
+                if self.scheduler:
+                    started = time.perf_counter()
+                    face_locations, face_names = self.detect(frame, plan)
+                    self.scheduler.record(plan, time.perf_counter() - started)
+                    if plan.roi is not None:
+                        face_locations, face_names = self._carry_over(face_locations, face_names, plan.roi)
+                else:
+                    face_locations, face_names = self.detect(frame)
+            except Exception as e:
+                log.exception("Detection error: %s", e)
+                continue
+
+            self._faces_per_frame.observe(len(face_locations))
+            # With several detect threads results can finish out of order; keep the newest frame's
+            with self._result_lock:
+                self.frames_detected += 1
+                if sequence > self._latest_result[0]:
+                    self._latest_result = (sequence, time.time(), face_locations, face_names)
+
+            if self.on_result:
+                try:
+                    self.on_result(face_locations, face_names)
+                except Exception as e:
+                    log.exception("Detection handler error: %s", e)
+
+    def _keep_result(self):
+        """Nothing moved: the last result still describes the scene"""
+        with self._result_lock:
+            sequence, _, face_locations, face_names = self._latest_result
+            self._latest_result = (sequence, time.time(), face_locations, face_names)
+
+    def _carry_over(self, face_locations, face_names, region):
+        """Add the previous result's faces from outside the searched region"""
+        with self._result_lock:
+            _, _, previous_locations, previous_names = self._latest_result
+        kept = [(box, name) for box, name in zip(previous_locations, previous_names) if outside_region(box, region)]
+        return (list(face_locations) + [box for box, _ in kept],
+                list(face_names) + [name for _, name in kept])
+
+    def _encode_loop(self):
+        while self._running.is_set():
+            try:
+                frame = self.encode_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            now = time.time()
+            with self._streams_lock:
+                streams = [stream for stream in self._streams.values()
+                           if stream.broadcaster.viewers and stream.due(now)]
+            if not streams:
+                continue
+
+            face_locations, face_names = self.latest_result()
+            if face_locations:
+                # The detection worker may still be reading this frame
+                frame = draw_detections(frame.copy(), face_locations, face_names)
+
+            resized = {}  # Profiles of the same width share one resize
+            for stream in streams:
+                width = stream.profile.width
+                if width not in resized:
+                    resized[width] = resize_to_width(frame, width)
+                started = time.perf_counter()
+                frame_bytes = self.jpeg_encoder.encode(resized[width], stream.profile.quality)
+                self._jpeg_seconds.observe(time.perf_counter() - started)
+                if frame_bytes:
+                    stream.last_encoded = now
+                    stream.frames_encoded += 1
+                    stream.broadcaster.publish(frame_bytes)
+
+    def _stream(self, profile):
+        """The shared stream for a profile, created on first use
+
+        At most `max_profiles` profiles are kept; profiles nobody watches are
+        dropped to make room, and if all are in use the default one is served.
+        """
+        with self._streams_lock:
+            stream = self._streams.get(profile)
+            if stream is not None:
+                return stream
+            if len(self._streams) >= self.max_profiles:
+                idle = [key for key, existing in self._streams.items()
+                        if key != self.default_profile and not existing.broadcaster.viewers]
+                for key in idle:
+                    self._streams.pop(key).broadcaster.close()
+            if len(self._streams) >= self.max_profiles:
+                log.warning("Too many stream profiles in use, serving %s instead of %s",
+                            self.default_profile.label, profile.label)
+                return self._streams[self.default_profile]
+            stream = self._streams[profile] = ProfileStream(profile)
+            if not self._running.is_set():
+                stream.broadcaster.close()
+            return stream
+
+    def _close_streams(self):
+        with self._streams_lock:
+            for stream in self._streams.values():
+                stream.broadcaster.close()
+
+    @property
+    def viewers(self):
+        with self._streams_lock:
+            return sum(stream.broadcaster.viewers for stream in self._streams.values())
+
+    def stream_stats(self):
+        """Viewers and encoded frames per stream profile"""
+        with self._streams_lock:
+            return {stream.profile.label: {'viewers': stream.broadcaster.viewers, 'frames_encoded': stream.frames_encoded}
+                    for stream in self._streams.values()}
+
+    def frames(self, profile=None):
+        """Yield encoded JPEG frames of a stream profile until the pipeline stops; safe for many viewers at once"""
+        return self._stream(profile or self.default_profile).broadcaster.subscribe()
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class DetectionPlan:
+    """How to run detection on one frame: downscale factor and optional region of interest
+
+    `roi` is a (top, right, bottom, left) box in full-frame pixels; when set,
+    only that crop is searched. `skip` is 'static' or 'budget' when the frame
+    should not be searched at all.
+    """
+
+    __slots__ = ('scale', 'roi', 'skip')
+
+    def __init__(self, scale=0.25, roi=None, skip=None):
+        self.scale = scale
+        self.roi = roi
+        self.skip = skip
+
+
+class MotionDetector:
+    """Cheap frame differencing on a blurred grayscale thumbnail
+
+    Frames are compared with the last frame detection actually ran on, so
+    slow movement still adds up to a change.
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, min_changed=0.002, margin=0.5):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed  # Fraction of thumbnail pixels that must change
+        self.margin = margin  # ROI padding, as a fraction of the changed box size
+        self._reference = None
+        self._candidate = None
+
+    def _thumbnail(self, frame):
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def changes(self, frame):
+        """(changed fraction, padded box around the changes in full-frame pixels or None)"""
+        self._candidate = self._thumbnail(frame)
+        if self._reference is None or self._reference.shape != self._candidate.shape:
+            return 1.0, None
+
+        mask = cv2.absdiff(self._candidate, self._reference) > self.pixel_threshold
+        fraction = float(mask.mean())
+        if fraction < self.min_changed:
+            return fraction, None
+
+        ys, xs = np.nonzero(mask)
+        factor = frame.shape[1] / self.width
+        top, bottom = ys.min() * factor, (ys.max() + 1) * factor
+        left, right = xs.min() * factor, (xs.max() + 1) * factor
+        pad_y, pad_x = (bottom - top) * self.margin, (right - left) * self.margin
+        roi = (int(max(0, top - pad_y)), int(min(frame.shape[1], right + pad_x)),
+               int(min(frame.shape[0], bottom + pad_y)), int(max(0, left - pad_x)))
+        return fraction, roi
+
+    def accept(self):
+        """Make the frame last passed to `changes` the new reference"""
+        self._reference = self._candidate
+
+
+class AdaptiveScheduler:
+    """Decides per frame whether, where and at what scale to run detection
+
+    - Static scenes (no motion since the last detection) are skipped, with a
+      full-frame detection at least every `max_idle` seconds.
+    - When the motion is confined to a small region, only that region is
+      searched, at the higher `roi_scale`.
+    - Full-frame scale shrinks when detection takes longer than
+      `target_latency` and grows back when there is headroom.
+    - After each detection the next one is held back so detection uses at
+      most `cpu_budget` of a core (1.0 = run back to back).
+    """
+
+    def __init__(self, motion=None, target_latency=0.15, cpu_budget=1.0, initial_scale=0.25,
+                 min_scale=0.15, max_scale=0.5, roi_scale=0.5, max_roi_area=0.3, max_idle=2.0):
+        self.motion = motion or MotionDetector()
+        self.target_latency = target_latency
+        self.cpu_budget = cpu_budget
+        self.scale = initial_scale
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.roi_scale = roi_scale
+        self.max_roi_area = max_roi_area
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
+        self._last_full = 0.0
+        self.detections = 0
+        self.roi_detections = 0
+        self.skipped_static = 0
+        self.skipped_budget = 0
+        self.last_latency = 0.0
+
+    def plan(self, frame, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if now < self._next_allowed:
+                self.skipped_budget += 1
+                return DetectionPlan(skip='budget')
+
+            fraction, roi = self.motion.changes(frame)
+            idle = now - self._last_full >= self.max_idle
+            if fraction < self.motion.min_changed and not idle:
+                self.skipped_static += 1
+                return DetectionPlan(skip='static')
+
+            self.motion.accept()
+            if roi is not None and not idle:
+                top, right, bottom, left = roi
+                if (bottom - top) * (right - left) <= self.max_roi_area * frame.shape[0] * frame.shape[1]:
+                    return DetectionPlan(max(self.scale, self.roi_scale), roi)
+            return DetectionPlan(self.scale)
+
+    def record(self, plan, elapsed, now=None):
+        """Feed back how long a planned detection took"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.detections += 1
+            self.last_latency = elapsed
+            if self.cpu_budget < 1.0:
+                self._next_allowed = now + elapsed * (1.0 / self.cpu_budget - 1.0)
+            if plan.roi is not None:
+                self.roi_detections += 1
+                return
+            self._last_full = now
+            if elapsed > self.target_latency:
+                self.scale = max(self.min_scale, self.scale * 0.85)
+            elif elapsed < 0.6 * self.target_latency:
+                self.scale = min(self.max_scale, self.scale * 1.1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'scale': round(self.scale, 3),
+                'last_latency_ms': round(self.last_latency * 1000, 1),
+                'detections': self.detections,
+                'roi_detections': self.roi_detections,
+                'skipped_static': self.skipped_static,
+                'skipped_budget': self.skipped_budget,
+            }
@@ -0,0 +1,197 @@
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import cv2
+
+from app_logging import get_logger
+from pipeline import FramePipeline
+
+log = get_logger('sources')
+
+DEFAULT_FILE_FPS = 25.0  # For video files whose container reports no frame rate
+
+
+def parse_camera_sources(spec):
+    """Parse 'lobby=0,gate=rtsp://host/stream,test=clip.mp4' into an ordered {id: target}
+
+    Device indices become ints; anything else is passed to cv2.VideoCapture
+    as-is. Entries without an id are named cam0, cam1, ...
+    """
+    sources = {}
+    for position, item in enumerate(part.strip() for part in spec.split(',')):
+        if not item:
+            continue
+        source_id, separator, target = item.partition('=')
+        # An '=' inside a URL query is not an id separator
+        if not separator or ':' in source_id or '/' in source_id:
+            source_id, target = f"cam{position}", item
+        source_id, target = source_id.strip(), target.strip()
+        sources[source_id] = int(target) if target.isdigit() else target
+    return sources
+
+
+def describe_target(target):
+    """Printable form of a source target with any URL credentials removed"""
+    if isinstance(target, int):
+        return f"device {target}"
+    parts = urlsplit(target)
+    if parts.scheme and '@' in parts.netloc:
+        parts = parts._replace(netloc=parts.netloc.rsplit('@', 1)[1])
+        return urlunsplit(parts)
+    return target
+
+
+class CameraSource:
+    """One named video source with its own capture loop and pipeline
+
+    Video files loop when they reach the end, so they can stand in for a
+    live camera in testing; they are read at their own frame rate rather
+    than as fast as they decode. A source that stops delivering frames is
+    reopened by its pipeline (see FramePipeline), not only when someone
+    next opens its stream.
+    """
+
+    def __init__(self, source_id, target):
+        self.source_id = source_id
+        self.target = target
+        self.capture = None
+        self.pipeline = None
+        self.latest_detection = None
+        self.error = None
+        self.started_at = None
+        self.frame_interval = 0.0  # Seconds between frames of a video file (0 for live sources)
+        self._next_frame_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_file(self):
+        return isinstance(self.target, str) and '://' not in self.target
+
+    @property
+    def running(self):
+        return self.pipeline is not None and self.pipeline.running
+
+    def _set_frame_rate(self):
+        if self.is_file:
+            fps = self.capture.get(cv2.CAP_PROP_FPS)
+            self.frame_interval = 1.0 / (fps if 0 < fps <= 240 else DEFAULT_FILE_FPS)
+
+    def pace(self, wait=time.sleep):
+        """Wait until a video file's next frame is due; live sources return at once"""
+        if not self.frame_interval:
+            return
+        now = time.perf_counter()
+        if self._next_frame_at > now:
+            wait(self._next_frame_at - now)
+        # Never bank more than one frame of lag, so a stall is not followed by a burst
+        self._next_frame_at = max(self._next_frame_at, now - self.frame_interval) + self.frame_interval
+
+    def read(self):
+        success, frame = self.capture.read()
+        if not success and self.is_file:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.capture.read()
+        return success, frame
+
+    def reconnect(self):
+        """Reopen the capture after a failed read; False if the source is still unavailable"""
+        if self.capture is not None:
+            self.capture.release()
+        capture = cv2.VideoCapture(self.target)
+        if not capture.isOpened():
+            capture.release()
+            if self.error is None:
+                log.warning("⚠️ Camera source '%s' dropped out, reconnecting...", self.source_id)
+            self.error = f"Reconnecting to {describe_target(self.target)}"
+            return False
+        self.capture = capture
+        self._set_frame_rate()
+        self.error = None
+        log.info("📷 Camera source '%s' reconnected", self.source_id)
+        return True
+
+    def start(self, detect, on_result=None, **pipeline_options):
+        """Open the source and start its pipeline; returns False if it can't be opened"""
+        with self._lock:
+            if self.running:
+                return True
+            if self.capture is not None:
+                # The pipeline stopped on a failed read; reopen rather than reuse the capture
+                self.capture.release()
+            self.capture = cv2.VideoCapture(self.target)
+            if not self.capture.isOpened():
+                self.capture.release()
+                self.capture = None
+                self.error = f"Could not open {describe_target(self.target)}"
+                log.error("❌ Camera source '%s': %s", self.source_id, self.error)
+                return False
+            self._set_frame_rate()
+            self.error = None
+            self.started_at = time.time()
+            self.pipeline = FramePipeline(self, detect, on_result=on_result, **pipeline_options).start()
+            log.info("📷 Camera source '%s' started (%s)", self.source_id, describe_target(self.target))
+            return True
+
+    def stop(self):
+        with self._lock:
+            if self.pipeline:
+                self.pipeline.stop()
+                self.pipeline = None
+            if self.capture:
+                try:
+                    self.capture.release()
+                except Exception as e:
+                    log.warning("⚠️ Camera release warning for '%s' (can be ignored): %s", self.source_id, e)
+                finally:
+                    self.capture = None
+
+    def status(self):
+        pipeline = self.pipeline
+        return {
+            'id': self.source_id,
+            'target': describe_target(self.target),
+            'active': self.running,
+            'connected': pipeline.connected if pipeline else False,
+            'down_since': pipeline.disconnected_since if pipeline else None,
+            'reconnects': pipeline.reconnects if pipeline else 0,
+            'error': self.error,
+            'frames_captured': pipeline.frames_captured if pipeline else 0,
+            'frames_detected': pipeline.frames_detected if pipeline else 0,
+            'viewers': pipeline.viewers if pipeline else 0,
+            'streams': pipeline.stream_stats() if pipeline else {},
+            'scheduler': pipeline.scheduler.stats() if pipeline and pipeline.scheduler else None,
+            'latest_detection': self.latest_detection,
+        }
+
+
+class SourceRegistry:
+    """Named camera sources served by one process"""
+
+    def __init__(self, sources):
+        self.sources = {source_id: CameraSource(source_id, target) for source_id, target in sources.items()}
+
+    def __contains__(self, source_id):
+        return source_id in self.sources
+
+    def __iter__(self):
+        return iter(self.sources.values())
+
+    def get(self, source_id):
+        return self.sources.get(source_id)
+
+    @property
+    def default_id(self):
+        return next(iter(self.sources), None)
+
+    def stop_all(self):
+        for source in self.sources.values():
+            source.stop()
+
+    def status(self):
+        return {source.source_id: source.status() for source in self.sources.values()}
+
+    def down(self):
+        """Ids of sources that were started but are not delivering frames"""
+        return [source.source_id for source in self.sources.values()
+                if source.pipeline is not None and not (source.running and source.pipeline.connected)]
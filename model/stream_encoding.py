@@ -0,0 +1,105 @@
+"""JPEG encoders and per-viewer stream profiles for the MJPEG feeds
+
+A profile is an output width, JPEG quality and frame-rate cap. Requested
+values are snapped to a coarse grid so that viewers asking for similar
+streams share one encoded stream.
+"""
+import collections
+import math
+
+import cv2
+
+from app_logging import get_logger
+
+log = get_logger('stream_encoding')
+
+MIN_WIDTH = 64
+WIDTH_STEP = 32
+QUALITY_STEP = 5
+MAX_FPS = 60
+
+
+class StreamProfile(collections.namedtuple('StreamProfile', 'width quality max_fps')):
+    """Output width in pixels (0 = camera resolution), JPEG quality, and fps cap (0 = camera rate)"""
+
+    __slots__ = ()
+
+    @property
+    def label(self):
+        return f"{self.width or 'full'}w-q{self.quality}-{self.max_fps or 'max'}fps"
+
+
+def _int_arg(args, name, default):
+    value = args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = float(value)
+    except ValueError:
+        number = math.nan
+    if not math.isfinite(number):  # int() would overflow on 1e400 / inf
+        raise ValueError(f"'{name}' must be a number")
+    return int(number)
+
+
+def parse_stream_profile(args, default_quality=80):
+    """StreamProfile from query parameters `width`, `quality` and `fps`; ValueError if malformed"""
+    width = _int_arg(args, 'width', 0)
+    quality = _int_arg(args, 'quality', default_quality)
+    max_fps = _int_arg(args, 'fps', 0)
+    if width < 0 or max_fps < 0:
+        raise ValueError("'width' and 'fps' must not be negative")
+    if width:
+        width = max(MIN_WIDTH, width // WIDTH_STEP * WIDTH_STEP)
+    quality = min(95, max(10, round(quality / QUALITY_STEP) * QUALITY_STEP))
+    return StreamProfile(width, quality, min(max_fps, MAX_FPS))
+
+
+def resize_to_width(frame, width):
+    """Downscale a frame to `width` keeping its aspect ratio; frames already that small are returned as-is"""
+    height, frame_width = frame.shape[:2]
+    if not width or width >= frame_width:
+        return frame
+    return cv2.resize(frame, (width, max(1, round(height * width / frame_width))), interpolation=cv2.INTER_AREA)
+
+
+class OpenCVEncoder:
+    name = 'opencv'
+
+    def encode(self, frame, quality):
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes() if ok else None
+
+
+class TurboJPEGEncoder:
+    """libjpeg-turbo through PyTurboJPEG (`pip install PyTurboJPEG`), with 4:2:0 chroma subsampling"""
+
+    name = 'turbojpeg'
+
+    def __init__(self, lib_path=None):
+        from turbojpeg import TJPF_BGR, TJSAMP_420, TurboJPEG
+
+        self._jpeg = TurboJPEG(lib_path) if lib_path else TurboJPEG()
+        self._options = {'pixel_format': TJPF_BGR, 'jpeg_subsample': TJSAMP_420}
+
+    def encode(self, frame, quality):
+        return self._jpeg.encode(frame, quality=quality, **self._options)
+
+
+JPEG_ENCODERS = {
+    'opencv': OpenCVEncoder,
+    'turbojpeg': TurboJPEGEncoder,
+}
+
+
+def create_jpeg_encoder(kind='auto', **options):
+    """JPEG encoder by name; 'auto' uses PyTurboJPEG when it is installed and OpenCV otherwise"""
+    if kind == 'auto':
+        try:
+            return TurboJPEGEncoder(**options)
+        except (ImportError, OSError, RuntimeError) as e:
+            log.debug("PyTurboJPEG unavailable (%s), using OpenCV for JPEG encoding", e)
+            return OpenCVEncoder()
+    if kind not in JPEG_ENCODERS:
+        raise ValueError(f"Unknown JPEG encoder '{kind}', expected one of: auto, {', '.join(JPEG_ENCODERS)}")
+    return JPEG_ENCODERS[kind](**options)
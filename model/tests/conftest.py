@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules live side by side in model/, as the service and benchmarks import them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from alerts import FAILED, IN_PROGRESS, AlertDispatcher
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'alerts.db')
+
+
+@pytest.fixture
+def dispatchers():
+    started = []
+    yield started
+    for dispatcher in started:
+        dispatcher.stop()
+
+
+def start(dispatcher, dispatchers):
+    dispatchers.append(dispatcher)
+    dispatcher.start()
+    return dispatcher
+
+
+def test_delivered_jobs_are_removed(db_path, dispatchers):
+    received = []
+    dispatcher = AlertDispatcher(db_path, workers=1)
+    dispatcher.register('whatsapp', lambda payload, session: received.append((payload, session)) or True)
+    start(dispatcher, dispatchers)
+    dispatcher.enqueue('whatsapp', {'phone': '9000000000'})
+
+    assert wait_until(lambda: dispatcher.pending_count() == 0 and received)
+    payload, session = received[0]
+    assert payload == {'phone': '9000000000'}
+    assert session is not None
+
+
+def test_failures_are_retried_then_kept_as_failed(db_path, dispatchers):
+    attempts = []
+
+    def flaky(payload, session):
+        attempts.append(time.time())
+        raise ConnectionError('backend down')
+
+    dispatcher = AlertDispatcher(db_path, workers=1, max_attempts=3, base_delay=0.05)
+    dispatcher.register('detection', flaky)
+    start(dispatcher, dispatchers)
+    dispatcher.enqueue('detection', {'name': 'Asha'})
+
+    assert wait_until(lambda: dispatcher.failed_count() == 1)
+    assert len(attempts) == 3
+    assert dispatcher.pending_count() == 0
+    # Backoff doubles: ~0.05s then ~0.1s (with +-20% jitter)
+    assert attempts[1] - attempts[0] >= 0.035
+    assert attempts[2] - attempts[1] >= 0.075
+    status, error = dispatcher._db.execute("SELECT status, last_error FROM alerts").fetchone()
+    assert (status, error) == (FAILED, 'backend down')
+
+
+def test_a_handler_returning_false_is_retried(db_path, dispatchers):
+    results = iter([False, True])
+    calls = []
+    dispatcher = AlertDispatcher(db_path, workers=1, base_delay=0.01)
+    dispatcher.register('detection', lambda payload, session: calls.append(1) or next(results))
+    start(dispatcher, dispatchers)
+    dispatcher.enqueue('detection', {})
+    assert wait_until(lambda: dispatcher.pending_count() == 0)
+    assert len(calls) == 2 and dispatcher.failed_count() == 0
+
+
+def test_undelivered_jobs_survive_a_restart(db_path, dispatchers):
+    first = AlertDispatcher(db_path)
+    first.enqueue('detection', {'name': 'Asha'})
+    first.enqueue('detection', {'name': 'Ravi'})
+    # A job that was being delivered when the process died
+    first._db.execute("UPDATE alerts SET status = ? WHERE id = 1", (IN_PROGRESS,))
+    first._db.close()
+
+    delivered = []
+    lock = threading.Lock()
+    restarted = AlertDispatcher(db_path)
+
+    def deliver(payload, session):
+        with lock:
+            delivered.append(payload['name'])
+        return True
+
+    restarted.register('detection', deliver)
+    assert restarted.pending_count() == 2
+    start(restarted, dispatchers)
+    assert wait_until(lambda: len(delivered) == 2)
+    assert sorted(delivered) == ['Asha', 'Ravi']
+
+
+def test_delayed_jobs_wait_for_their_time(db_path, dispatchers):
+    delivered = []
+    dispatcher = AlertDispatcher(db_path, workers=1)
+    dispatcher.register('location_history', lambda payload, session: delivered.append(time.time()) or True)
+    start(dispatcher, dispatchers)
+    enqueued = time.time()
+    dispatcher.enqueue('location_history', {}, delay=0.3)
+    assert wait_until(lambda: delivered)
+    assert delivered[0] - enqueued >= 0.3
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from batch_encoder import EncodingBatcher
+
+
+class RecordingEncoder:
+    """Stand-in for encode_faces_batch: each face's 'encoding' is (frame, location)"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, frames, locations):
+        self.batches.append(list(frames))
+        return [[(frame, location) for location in frame_locations]
+                for frame, frame_locations in zip(frames, locations)]
+
+
+@pytest.fixture
+def encoder():
+    return RecordingEncoder()
+
+
+@pytest.fixture
+def make_batcher(encoder):
+    batchers = []
+
+    def make(**options):
+        batchers.append(EncodingBatcher(encode_batch=encoder, **options).start())
+        return batchers[-1]
+    yield make
+    for batcher in batchers:
+        batcher.stop()
+
+
+def in_thread(target):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(target()))
+    thread.start()
+    thread.join(5)
+    return result[0]
+
+
+def timed(call):
+    started = time.perf_counter()
+    result = call()
+    return result, time.perf_counter() - started
+
+
+def test_a_single_producer_never_waits_for_the_window(make_batcher, encoder):
+    batcher = make_batcher(max_batch=16, max_wait=0.5)
+    for frame in range(3):
+        encodings, elapsed = timed(lambda: batcher.encode(frame, ['box']))
+        assert encodings == [(frame, 'box')]
+        assert elapsed < 0.25
+    assert encoder.batches == [[0], [1], [2]]
+
+
+def test_batch_waits_for_other_active_producers_up_to_max_wait(make_batcher, encoder):
+    batcher = make_batcher(max_batch=16, max_wait=0.2)
+    in_thread(lambda: batcher.encode('other', ['box']))  # Another source, active within producer_idle
+    _, elapsed = timed(lambda: batcher.encode('mine', ['box']))
+    assert elapsed >= 0.15
+    assert encoder.batches[-1] == ['mine']
+
+
+def test_batch_is_sent_once_every_active_producer_is_in_it(make_batcher, encoder):
+    # Warm-up batches may stall for max_wait; producer_idle keeps every source counted past that
+    batcher = make_batcher(max_batch=16, max_wait=1.0, producer_idle=10.0)
+    barrier = threading.Barrier(3)
+    results = {}
+
+    def source(frame):
+        batcher.encode(frame, ['warm-up'])
+        barrier.wait()
+        results[frame] = timed(lambda: batcher.encode(frame, ['box', 'box2']))
+
+    threads = [threading.Thread(target=source, args=(frame,)) for frame in ('a', 'b', 'c')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert {frame: encodings for frame, (encodings, _) in results.items()} == {
+        frame: [(frame, 'box'), (frame, 'box2')] for frame in 'abc'}
+    assert max(elapsed for _, elapsed in results.values()) < 0.5
+    assert sorted(encoder.batches[-1]) == ['a', 'b', 'c']
+
+
+def test_a_full_batch_is_sent_without_waiting(make_batcher, encoder):
+    batcher = make_batcher(max_batch=3, max_wait=0.5)
+    in_thread(lambda: batcher.encode('other', ['box']))
+    encodings, elapsed = timed(lambda: batcher.encode('crowd', ['a', 'b', 'c']))
+    assert len(encodings) == 3
+    assert elapsed < 0.25
+
+
+def test_encoder_errors_reach_every_caller():
+    def failing(frames, locations):
+        raise RuntimeError('dlib failed')
+
+    batcher = EncodingBatcher(encode_batch=failing).start()
+    try:
+        with pytest.raises(RuntimeError, match='dlib failed'):
+            batcher.encode('frame', ['box'])
+    finally:
+        batcher.stop()
+
+
+def test_frames_without_faces_skip_the_encoder(make_batcher, encoder):
+    batcher = make_batcher()
+    assert batcher.encode('frame', []) == []
+    assert encoder.batches == []
+
+
+def test_stats(make_batcher):
+    batcher = make_batcher(max_batch=8, max_wait=0.01)
+    batcher.encode('frame', ['a', 'b'])
+    stats = batcher.stats()
+    assert stats['batches'] == 1
+    assert stats['faces_encoded'] == 2
+    assert stats['avg_batch_faces'] == 2
+    assert stats['producers'] == 1
@@ -0,0 +1,54 @@
+from batch_match import collect_inputs, summarize
+
+NAMES = ['Asha', 'Ravi']
+
+
+def test_video_hits_close_together_merge_into_one_sighting():
+    hits = [('cam.mp4', 0.0, 0, 0.41), ('cam.mp4', 1.0, 0, 0.35), ('cam.mp4', 3.0, 0, 0.5),
+            ('cam.mp4', 10.0, 0, 0.4)]
+    sightings = summarize(hits, NAMES, gap=2.0)['Asha']['sightings']
+    assert sightings == [
+        {'file': 'cam.mp4', 'start': 0.0, 'end': 3.0, 'hits': 3, 'best_distance': 0.35},
+        {'file': 'cam.mp4', 'start': 10.0, 'end': 10.0, 'hits': 1, 'best_distance': 0.4},
+    ]
+
+
+def test_hits_arriving_out_of_order_are_sorted_before_merging():
+    hits = [('cam.mp4', 2.0, 0, 0.4), ('cam.mp4', 0.0, 0, 0.4), ('cam.mp4', 1.0, 0, 0.4)]
+    sightings = summarize(hits, NAMES)['Asha']['sightings']
+    assert [(s['start'], s['end'], s['hits']) for s in sightings] == [(0.0, 2.0, 3)]
+
+
+def test_sightings_in_different_files_are_not_merged():
+    hits = [('a.mp4', 1.0, 0, 0.4), ('b.mp4', 1.5, 0, 0.4)]
+    sightings = summarize(hits, NAMES)['Asha']['sightings']
+    assert [s['file'] for s in sightings] == ['a.mp4', 'b.mp4']
+
+
+def test_cases_are_kept_apart_and_images_listed():
+    hits = [('cam.mp4', 0.0, 0, 0.4), ('cam.mp4', 0.5, 1, 0.3), ('photo.jpg', None, 1, 0.45678)]
+    cases = summarize(hits, NAMES, adhaar_numbers=['1111', '2222'])
+    assert set(cases) == {'Asha', 'Ravi'}
+    assert cases['Asha']['adhaar'] == '1111'
+    assert cases['Ravi']['adhaar'] == '2222'
+    assert cases['Ravi']['images'] == [{'file': 'photo.jpg', 'distance': 0.457}]
+    assert len(cases['Ravi']['sightings']) == 1
+
+
+def test_no_hits():
+    assert summarize([], NAMES) == {}
+
+
+def test_collect_inputs(tmp_path):
+    (tmp_path / 'day1').mkdir()
+    for name in ('day1/cam.MP4', 'day1/notes.txt', 'b.jpg', 'a.png'):
+        (tmp_path / name).write_bytes(b'')
+    single = tmp_path / 'single.avi'
+    single.write_bytes(b'')
+
+    videos, images = collect_inputs([str(tmp_path / 'day1'), str(tmp_path / 'b.jpg'), str(single)])
+    assert videos == [str(tmp_path / 'day1' / 'cam.MP4'), str(single)]
+    assert images == [str(tmp_path / 'b.jpg')]
+
+    _, images = collect_inputs([str(tmp_path)])
+    assert images == [str(tmp_path / 'a.png'), str(tmp_path / 'b.jpg')]
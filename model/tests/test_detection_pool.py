@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import detection_pool
+from detection_pool import FrameSlot, _map_frame
+
+
+@pytest.fixture(autouse=True)
+def worker_frames(monkeypatch):
+    frames = {}
+    monkeypatch.setattr(detection_pool, '_worker_frames', frames)
+    return frames
+
+
+def crops(count, seed=0):
+    """Frames of varying ROI sizes, like the scheduler hands to the pool"""
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        height, width = rng.integers(16, 240, size=2)
+        yield rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def test_worker_sees_each_written_frame(tmp_path):
+    slot = FrameSlot(str(tmp_path / 'frame-0.bin'))
+    for frame in crops(20):
+        slot.write(frame)
+        np.testing.assert_array_equal(_map_frame(slot.path, slot.shape, slot.dtype), frame)
+
+
+def test_varying_crop_shapes_keep_one_mapping_per_slot(tmp_path, worker_frames):
+    slots = [FrameSlot(str(tmp_path / f'frame-{i}.bin')) for i in range(2)]
+    for i, frame in enumerate(crops(60)):
+        slot = slots[i % 2]
+        slot.write(frame)
+        _map_frame(slot.path, slot.shape, slot.dtype)
+    assert set(worker_frames) == {slot.path for slot in slots}
+
+
+def test_slot_is_remapped_only_when_a_frame_outgrows_it(tmp_path, worker_frames):
+    slot = FrameSlot(str(tmp_path / 'frame-0.bin'))
+    slot.write(np.zeros((480, 640, 3), dtype=np.uint8))
+    parent_buffer = slot._buffer
+    _map_frame(slot.path, slot.shape, slot.dtype)
+    worker_buffer = worker_frames[slot.path]
+
+    crop = np.ones((100, 120, 3), dtype=np.uint8)
+    slot.write(crop)
+    np.testing.assert_array_equal(_map_frame(slot.path, slot.shape, slot.dtype), crop)
+    assert slot._buffer is parent_buffer and worker_frames[slot.path] is worker_buffer
+
+    large = np.full((720, 1280, 3), 7, dtype=np.uint8)
+    slot.write(large)
+    np.testing.assert_array_equal(_map_frame(slot.path, slot.shape, slot.dtype), large)
+    assert worker_frames[slot.path] is not worker_buffer
+
+
+def test_other_dtypes_round_trip(tmp_path):
+    slot = FrameSlot(str(tmp_path / 'frame-0.bin'))
+    slot.write(np.zeros((8, 8), dtype=np.uint8))
+    frame = np.linspace(0, 1, 48, dtype=np.float32).reshape(4, 4, 3)
+    slot.write(frame)
+    np.testing.assert_array_equal(_map_frame(slot.path, slot.shape, slot.dtype), frame)
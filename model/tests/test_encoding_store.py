@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+
+from encoding_store import EncodingStore, content_hash
+
+
+def encoding(seed):
+    return np.random.default_rng(seed).normal(size=128)
+
+
+def cold_load(store_dir):
+    """Store written by a first load of three cases, one of them without a face"""
+    store = EncodingStore(str(store_dir))
+    assert store.open() == 0
+    store.put('Asha', '1111', 'hash-a', encoding(1))
+    store.put('Ravi', '2222', 'hash-r', encoding(2))
+    store.put('Noface', '3333', 'hash-n', None)
+    assert store.flush()
+    return store
+
+
+def test_flush_and_open_round_trip(tmp_path):
+    cold_load(tmp_path)
+
+    store = EncodingStore(str(tmp_path))
+    assert store.open() == 3
+    hit, stored = store.lookup('Asha', '1111', 'hash-a')
+    assert hit and np.array_equal(stored, encoding(1))
+    assert store.lookup('Noface', '3333', 'hash-n') == (True, None)
+    assert store.hits == 2
+
+
+def test_changed_image_or_details_miss(tmp_path):
+    cold_load(tmp_path)
+    store = EncodingStore(str(tmp_path))
+    store.open()
+    assert store.lookup('Asha', '1111', 'hash-new') == (False, None)
+    assert store.lookup('Asha', '9999', 'hash-a') == (False, None)
+    assert store.hits == 0
+
+
+def test_warm_start_with_nothing_new_does_not_rewrite(tmp_path):
+    cold_load(tmp_path)
+    written = (tmp_path / 'encodings.npy').stat().st_mtime_ns
+
+    store = EncodingStore(str(tmp_path))
+    store.open()
+    for name, adhaar, image_hash in (('Asha', '1111', 'hash-a'), ('Ravi', '2222', 'hash-r'),
+                                     ('Noface', '3333', 'hash-n')):
+        hit, stored = store.lookup(name, adhaar, image_hash)
+        assert hit
+        store.put(name, adhaar, image_hash, stored)
+    assert not store.flush()
+    assert (tmp_path / 'encodings.npy').stat().st_mtime_ns == written
+
+
+def test_flush_drops_entries_not_seen_in_this_load(tmp_path):
+    cold_load(tmp_path)
+    store = EncodingStore(str(tmp_path))
+    store.open()
+    store.put('Asha', '1111', 'hash-a', store.lookup('Asha', '1111', 'hash-a')[1])
+    store.put('Meera', '4444', 'hash-m', encoding(4))
+    assert store.flush()
+
+    reopened = EncodingStore(str(tmp_path))
+    assert reopened.open() == 2
+    assert reopened.lookup('Ravi', '2222', 'hash-r') == (False, None)
+    assert np.array_equal(reopened.lookup('Asha', '1111', 'hash-a')[1], encoding(1))
+    assert np.array_equal(reopened.lookup('Meera', '4444', 'hash-m')[1], encoding(4))
+
+
+def test_unreadable_or_outdated_store_is_rebuilt(tmp_path):
+    cold_load(tmp_path)
+    manifest = json.loads((tmp_path / 'manifest.json').read_text())
+    (tmp_path / 'manifest.json').write_text(json.dumps(dict(manifest, version=0)))
+    assert EncodingStore(str(tmp_path)).open() == 0
+
+    (tmp_path / 'manifest.json').write_text('{not json')
+    store = EncodingStore(str(tmp_path))
+    assert store.open() == 0
+    assert store.lookup('Asha', '1111', 'hash-a') == (False, None)
+
+
+def test_content_hash_depends_only_on_the_bytes():
+    assert content_hash(b'image') == content_hash(bytes(b'image'))
+    assert content_hash(b'image') != content_hash(b'image2')
@@ -0,0 +1,163 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from face_matcher import PRECISIONS, BruteForceMatcher, IVFMatcher
+from gallery import CooldownTable, Gallery
+
+
+def person(name, encoding, **fields):
+    return dict({'name': name, 'phone': f'phone-{name}', 'adhaar': f'adhaar-{name}',
+                 'case_id': f'case-{name}', 'updated_at': '2024-01-01T00:00:00.000Z'}, **fields, encoding=encoding)
+
+
+def random_encodings(count, seed=0):
+    encodings = np.random.default_rng(seed).normal(size=(count, 128))
+    return encodings / np.linalg.norm(encodings, axis=1, keepdims=True)
+
+
+def best_names(gallery, probes):
+    indices, _ = gallery.matcher.match(probes)
+    return [gallery.names[i] if i >= 0 else None for i in indices]
+
+
+MATCHERS = {
+    'brute': lambda precision: BruteForceMatcher(precision),
+    # Probing every cell makes IVF exact, so it can be compared with the truth
+    'ivf': lambda precision: IVFMatcher(nlist=4, nprobe=4, min_gallery=20, precision=precision),
+}
+
+
+@pytest.fixture(params=[(kind, precision) for kind in MATCHERS for precision in PRECISIONS],
+                ids=lambda param: '-'.join(param))
+def make_matcher(request):
+    kind, precision = request.param
+    return lambda: MATCHERS[kind](precision)
+
+
+def test_first_person_with_a_name_wins_case_insensitively():
+    encodings = random_encodings(2)
+    gallery = Gallery([person('Asha', encodings[0]), person('ASHA', encodings[1], phone='other')])
+    assert len(gallery) == 1
+    assert gallery.details('asha')['phone'] == 'phone-Asha'
+    assert gallery.row('aSHa') == 0
+    assert gallery.details('nobody') is None
+
+
+def test_with_changes_upserts_and_removes(make_matcher):
+    encodings = random_encodings(60)
+    base = Gallery([person(f'P{i}', encodings[i]) for i in range(40)], make_matcher())
+
+    upserts = [person('P1', encodings[50], phone='new'), person('New', encodings[51])]
+    synced = base.with_changes(upserts, ['P2', 'Missing'])
+
+    assert len(synced) == 40
+    assert synced.details('P1')['phone'] == 'new'
+    assert synced.details('New') is not None
+    assert synced.details('P2') is None
+    assert {p['name'] for p in synced.persons()} == {f'P{i}' for i in range(40) if i != 2} | {'New'}
+    # Replaced and dropped encodings no longer match; the new ones do
+    assert best_names(synced, encodings[[1, 2, 50, 51, 3]]) == [None, None, 'P1', 'New', 'P3']
+
+    # The previous version is untouched
+    assert len(base) == 40
+    assert base.details('P1')['phone'] == 'phone-P1'
+    assert base.details('New') is None
+    assert best_names(base, encodings[[1, 2, 50]]) == ['P1', 'P2', None]
+
+
+def sync_randomly(gallery, truth, encodings, syncs=25, seed=1):
+    """Apply `syncs` random syncs to both `gallery` and the `truth` dict; returns the new gallery"""
+    rng = np.random.default_rng(seed)
+    fresh = len(truth)
+    for _ in range(syncs):
+        names = sorted(truth)
+        picked = rng.choice(len(names), size=6, replace=False)
+        upserts = [person(names[i], encodings[fresh + k]) for k, i in enumerate(picked[:2])]
+        upserts += [person(f'Q{fresh + k}', encodings[fresh + 2 + k]) for k in range(2)]
+        removed = [names[i] for i in picked[2:]]
+        for upsert in upserts:
+            truth[upsert['name']] = upsert['encoding']
+        for name in removed:
+            del truth[name]
+        fresh += 4
+        gallery = gallery.with_changes(upserts, removed)
+    return gallery
+
+
+def test_many_syncs_agree_with_a_fresh_build(make_matcher):
+    encodings = random_encodings(400, seed=2)
+    truth = {f'P{i}': encodings[i] for i in range(100)}
+    gallery = Gallery([person(name, encoding) for name, encoding in truth.items()], make_matcher(), compact_ratio=0.3)
+    gallery = sync_randomly(gallery, truth, encodings)
+
+    assert len(gallery) == len(truth)
+    assert {p['name'] for p in gallery.persons()} == set(truth)
+    probes = np.stack(list(truth.values()))
+    assert best_names(gallery, probes) == list(truth)
+    assert best_names(gallery.compacted(), probes) == list(truth)
+
+
+def test_compaction_drops_removed_rows(make_matcher):
+    encodings = random_encodings(30)
+    gallery = Gallery([person(f'P{i}', encodings[i]) for i in range(30)], make_matcher(), compact_ratio=0.5)
+    synced = gallery.with_changes([], ['P0', 'P1'])
+    assert len(synced.names) == 30 and len(synced) == 28  # Below the ratio: rows are only masked
+
+    compacted = synced.compacted()
+    assert len(compacted.names) == len(compacted) == 28
+    assert len(compacted.encodings) == 28
+    assert compacted.row('P0') is None
+    assert compacted.details('P5') == synced.details('P5')
+    assert best_names(compacted, encodings[2:30]) == [f'P{i}' for i in range(2, 30)]
+
+    # Past the ratio, with_changes compacts by itself
+    assert len(gallery.with_changes([], [f'P{i}' for i in range(20)]).names) == 10
+
+
+def test_max_error_covers_every_stored_row_after_syncs(make_matcher):
+    encodings = random_encodings(400, seed=3)
+    truth = {f'P{i}': encodings[i] for i in range(100)}
+    gallery = Gallery([person(name, encoding) for name, encoding in truth.items()], make_matcher())
+    gallery = sync_randomly(gallery, truth, encodings, seed=4)
+
+    stored = gallery.encodings[[gallery.row(name) for name in truth]]
+    errors = np.linalg.norm(stored - np.stack(list(truth.values())), axis=1)
+    assert errors.max() <= gallery.matcher.max_error + 1e-5
+
+
+def test_cooldown_blocks_until_the_ttl_has_passed():
+    table = CooldownTable(ttl=300)
+    assert table.acquire('asha', now=1000.0) == (True, 0.0)
+    assert table.acquire('asha', now=1100.0) == (False, 200.0)
+    assert table.acquire('ravi', now=1100.0) == (True, 0.0)
+    assert table.acquire('asha', now=1300.0) == (True, 0.0)
+
+
+def test_cooldown_purges_expired_entries():
+    start = time.time()
+    table = CooldownTable(ttl=10, purge_interval=60)
+    for i in range(50):
+        table.acquire(f'person-{i}', now=start + i)
+    assert len(table) == 50
+    table.acquire('late', now=start + 200)
+    assert len(table) == 1
+
+
+def test_cooldown_lets_one_of_many_threads_notify():
+    table = CooldownTable(ttl=300)
+    barrier = threading.Barrier(8)
+    allowed = []
+
+    def acquire():
+        barrier.wait()
+        allowed.append(table.acquire('asha')[0])
+
+    threads = [threading.Thread(target=acquire) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(allowed) == [False] * 7 + [True]
@@ -0,0 +1,59 @@
+import json
+import random
+
+import pytest
+
+from json_stream import iter_json_array
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def random_string(rng):
+    # Quotes, backslashes and structural characters inside strings, plus multi-byte UTF-8
+    alphabet = 'ab"\\/{}[],: \n\té中\U0001f600'
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+
+
+def random_value(rng, depth=0):
+    roll = rng.random()
+    if depth > 2 or roll < 0.3:
+        return rng.choice([random_string(rng), 0, 1, -2.5e3, 1e-7, True, False, None])
+    if roll < 0.65:
+        return {random_string(rng): random_value(rng, depth + 1) for _ in range(rng.randint(0, 3))}
+    return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 3))]
+
+
+def test_matches_json_loads_for_random_documents_and_chunkings():
+    rng = random.Random(0)
+    for _ in range(2000):
+        text = json.dumps([random_value(rng) for _ in range(rng.randint(0, 5))],
+                          ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1]))
+        chunks = chunked(text.encode('utf-8'), rng.randint(1, 7))
+        assert list(iter_json_array(chunks)) == json.loads(text), text
+
+
+@pytest.mark.parametrize('text', ['[]', ' [ ] ', '[1,2,3]', '[ 1 , "a" ,null]', '[true]', '["\\\\"]', '["a\\"b"]'])
+def test_small_arrays(text):
+    for size in range(1, len(text) + 1):
+        assert list(iter_json_array(chunked(text.encode(), size))) == json.loads(text)
+
+
+def test_multibyte_character_split_across_chunks():
+    data = json.dumps([{'name': 'आरव'}], ensure_ascii=False).encode('utf-8')
+    assert list(iter_json_array([bytes([byte]) for byte in data])) == [{'name': 'आरव'}]
+
+
+def test_elements_are_yielded_before_the_array_ends():
+    elements = iter_json_array(iter([b'[{"a": 1}, ', b'{"b": 2}']))
+    assert next(elements) == {'a': 1}
+    assert next(elements) == {'b': 2}
+    with pytest.raises(ValueError):
+        next(elements)
+
+
+@pytest.mark.parametrize('text', ['{"a": 1}', '', '[1, 2', '["unterminated'])
+def test_rejects_non_arrays_and_truncated_input(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array([text.encode()]))
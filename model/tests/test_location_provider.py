@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+import types
+
+import pytest
+
+import location_provider
+from location_provider import CachedLocationProvider, LocationService, load_camera_locations
+
+DELHI = {'latitude': 28.61, 'longitude': 77.21, 'city': 'New Delhi'}
+MUMBAI = {'latitude': 19.08, 'longitude': 72.88, 'city': 'Mumbai'}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(location_provider, 'time', types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def counting_fetch(*locations):
+    calls = []
+    results = iter(locations)
+
+    def fetch(session=None):
+        calls.append(session)
+        return next(results)
+    return fetch, calls
+
+
+def test_lookups_are_cached_for_the_ttl(clock):
+    fetch, calls = counting_fetch(DELHI, MUMBAI)
+    provider = CachedLocationProvider(fetch, ttl=3600)
+    assert provider.get() == DELHI
+    clock.value += 3599
+    assert provider.get() == DELHI
+    assert len(calls) == 1
+    clock.value += 2
+    assert provider.get() == MUMBAI
+    assert len(calls) == 2
+
+
+def test_a_failed_lookup_keeps_the_previous_location(clock):
+    fetch, calls = counting_fetch(DELHI, None)
+    provider = CachedLocationProvider(fetch, ttl=10)
+    provider.get()
+    clock.value += 11
+    assert provider.get() == DELHI
+    assert provider.stale  # Tried again on the next call
+
+
+def test_peek_never_blocks_and_refreshes_once_in_the_background(clock):
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch(session=None):
+        calls.append(1)
+        release.wait(5)
+        return DELHI
+
+    provider = CachedLocationProvider(slow_fetch, ttl=10)
+    assert provider.peek() is None
+    assert provider.peek() is None  # The refresh already running is not started twice
+    release.set()
+    for _ in range(500):
+        if provider.peek() == DELHI:
+            break
+        time.sleep(0.01)
+    assert provider.peek() == DELHI
+    assert len(calls) == 1
+
+
+def test_cameras_with_static_locations_skip_the_lookup():
+    fetch, calls = counting_fetch(DELHI)
+    service = LocationService(CachedLocationProvider(fetch), {'gate': MUMBAI})
+    assert service.get('gate') == MUMBAI
+    assert calls == []
+    service.refresh_async(['gate'])
+    assert calls == []
+    assert service.get('lobby') == DELHI
+
+
+def test_camera_locations_from_json_or_file(tmp_path):
+    config = json.dumps({'gate': MUMBAI})
+    assert load_camera_locations(config) == {'gate': MUMBAI}
+    path = tmp_path / 'cameras.json'
+    path.write_text(config)
+    assert load_camera_locations(str(path)) == {'gate': MUMBAI}
+    assert load_camera_locations('') == {}
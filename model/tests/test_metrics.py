@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import pytest
+
+import metrics
+from metrics import CallbackMetric, Histogram, Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_seconds', 'Test latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.render().splitlines() == [
+        '# HELP test_seconds Test latency',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{le="0.1"} 2.0',
+        'test_seconds_bucket{le="1.0"} 3.0',
+        'test_seconds_bucket{le="+Inf"} 4.0',
+        'test_seconds_sum 3.65',
+        'test_seconds_count 4.0',
+    ]
+
+
+def test_labelled_series_are_kept_apart():
+    histogram = Histogram('stage_seconds', 'Stage time', ['stage'], buckets=(1.0,))
+    histogram.labels(stage='detect').observe(0.5)
+    histogram.labels(stage='detect').observe(2.0)
+    histogram.labels(stage='say "hi"').observe(0.5)
+    lines = histogram.render().splitlines()
+    assert 'stage_seconds_count{stage="detect"} 2.0' in lines
+    assert 'stage_seconds_bucket{stage="detect",le="1.0"} 1.0' in lines
+    assert 'stage_seconds_count{stage="say \\"hi\\""} 1.0' in lines
+
+
+def test_timer_observes_elapsed_time():
+    histogram = Histogram('block_seconds', 'Block time')
+    with histogram.time():
+        pass
+    assert 'block_seconds_count 1.0' in histogram.render().splitlines()
+
+
+def test_callback_metric_reads_values_at_scrape_time():
+    frames = {'cam1': 3}
+    metric = CallbackMetric('frames_total', 'Frames read', 'counter',
+                            lambda: [({'camera': camera}, count) for camera, count in frames.items()])
+    frames['cam1'] = 5
+    assert metric.render().splitlines()[-1] == 'frames_total{camera="cam1"} 5.0'
+
+
+def test_counter_names_must_end_in_total():
+    with pytest.raises(ValueError):
+        CallbackMetric('frames', 'Frames read', 'counter', list)
+    CallbackMetric('queue_depth', 'Queued frames', 'gauge', list)
+
+
+def test_failing_collect_renders_no_series():
+    def collect():
+        raise RuntimeError('pipeline gone')
+
+    metric = CallbackMetric('queue_depth', 'Queued frames', 'gauge', collect)
+    assert metric.render().splitlines() == ['# HELP queue_depth Queued frames', '# TYPE queue_depth gauge']
+
+
+def test_registry_rejects_duplicate_names_and_renders_all():
+    registry = Registry()
+    registry.register(Histogram('a_seconds', 'A'))
+    registry.register(CallbackMetric('b_total', 'B', 'counter', lambda: [({}, 1)]))
+    with pytest.raises(ValueError):
+        registry.register(Histogram('a_seconds', 'Again'))
+    text = registry.render()
+    assert '# TYPE a_seconds histogram' in text and 'b_total 1.0' in text
+    assert text.endswith('\n')
+
+
+def test_timed_request_records_outcome(monkeypatch):
+    histogram = Histogram('http_seconds', 'HTTP', ['target', 'outcome'])
+    monkeypatch.setattr(metrics, 'HTTP_SECONDS', histogram)
+
+    assert metrics.timed_request('backend', lambda: SimpleNamespace(status_code=404)).status_code == 404
+
+    def fail():
+        raise ConnectionError('refused')
+    with pytest.raises(ConnectionError):
+        metrics.timed_request('backend', fail)
+
+    lines = histogram.render().splitlines()
+    assert 'http_seconds_count{target="backend",outcome="4xx"} 1.0' in lines
+    assert 'http_seconds_count{target="backend",outcome="error"} 1.0' in lines
@@ -0,0 +1,37 @@
+import queue
+import threading
+
+import pytest
+
+from pipeline import DropOldestQueue, outside_region
+
+
+def test_drop_oldest_queue_keeps_the_newest_items():
+    items = DropOldestQueue(2)
+    for item in range(5):
+        items.put(item)
+    assert len(items) == 2
+    assert items.dropped == 3
+    assert [items.get(timeout=0), items.get(timeout=0)] == [3, 4]
+
+
+def test_drop_oldest_queue_get_times_out_when_empty():
+    with pytest.raises(queue.Empty):
+        DropOldestQueue(1).get(timeout=0.01)
+
+
+def test_drop_oldest_queue_wakes_a_waiting_consumer():
+    items = DropOldestQueue(1)
+    received = []
+    consumer = threading.Thread(target=lambda: received.append(items.get(timeout=5)))
+    consumer.start()
+    items.put('frame')
+    consumer.join(5)
+    assert received == ['frame']
+
+
+def test_outside_region():
+    region = (100, 400, 300, 200)  # (top, right, bottom, left)
+    assert not outside_region((150, 250, 200, 180), region)
+    assert outside_region((0, 250, 100, 180), region)  # Above: bottom touches the region's top
+    assert outside_region((150, 600, 200, 400), region)  # Right of it
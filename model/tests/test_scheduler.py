@@ -0,0 +1,87 @@
+import numpy as np
+
+from scheduler import AdaptiveScheduler, MotionDetector
+
+
+def frame(square=None, size=40):
+    """640x480 grey frame, with a white square at (left, top) if given"""
+    image = np.full((480, 640, 3), 80, dtype=np.uint8)
+    if square is not None:
+        left, top = square
+        image[top:top + size, left:left + size] = 255
+    return image
+
+
+def test_static_frames_are_skipped_until_max_idle():
+    scheduler = AdaptiveScheduler(max_idle=2.0)
+    first = scheduler.plan(frame(), now=0.0)
+    assert first.skip is None and first.roi is None
+    scheduler.record(first, 0.05, now=0.0)
+
+    assert scheduler.plan(frame(), now=1.0).skip == 'static'
+    assert scheduler.stats()['skipped_static'] == 1
+    idle = scheduler.plan(frame(), now=2.5)
+    assert idle.skip is None and idle.roi is None
+
+
+def test_small_motion_is_searched_as_a_region_at_a_higher_scale():
+    scheduler = AdaptiveScheduler(initial_scale=0.25, roi_scale=0.5)
+    scheduler.record(scheduler.plan(frame(), now=0.0), 0.05, now=0.0)
+
+    plan = scheduler.plan(frame(square=(300, 200)), now=0.1)
+    assert plan.skip is None
+    assert plan.scale == 0.5
+    top, right, bottom, left = plan.roi
+    assert top <= 200 and left <= 300 and bottom >= 240 and right >= 340
+    assert (bottom - top) * (right - left) < 0.3 * 640 * 480
+
+
+def test_widespread_motion_falls_back_to_the_full_frame():
+    scheduler = AdaptiveScheduler(max_roi_area=0.3)
+    scheduler.record(scheduler.plan(frame(), now=0.0), 0.05, now=0.0)
+
+    plan = scheduler.plan(frame(square=(0, 0), size=400), now=0.1)
+    assert plan.skip is None and plan.roi is None
+
+
+def test_region_detections_do_not_count_as_full_frame_ones():
+    scheduler = AdaptiveScheduler(max_idle=2.0)
+    scheduler.record(scheduler.plan(frame(), now=0.0), 0.05, now=0.0)
+    for step in range(1, 5):
+        plan = scheduler.plan(frame(square=(40 * step, 200)), now=0.6 * step)
+        if plan.roi is None:
+            break
+        scheduler.record(plan, 0.05, now=0.6 * step)
+    # Past max_idle since the last full-frame detection, even with motion
+    assert plan.roi is None
+    assert scheduler.stats()['roi_detections'] == 3
+
+
+def test_scale_follows_detection_latency_within_bounds():
+    scheduler = AdaptiveScheduler(target_latency=0.1, initial_scale=0.25, min_scale=0.15, max_scale=0.5)
+    full = scheduler.plan(frame(), now=0.0)
+    for _ in range(20):
+        scheduler.record(full, 0.3)
+    assert scheduler.scale == 0.15
+    for _ in range(20):
+        scheduler.record(full, 0.01)
+    assert scheduler.scale == 0.5
+
+
+def test_cpu_budget_holds_back_the_next_detection():
+    scheduler = AdaptiveScheduler(cpu_budget=0.5)
+    scheduler.record(scheduler.plan(frame(), now=0.0), 0.2, now=0.0)
+    assert scheduler.plan(frame(square=(0, 0)), now=0.1).skip == 'budget'
+    assert scheduler.plan(frame(square=(0, 0)), now=0.25).skip is None
+    assert scheduler.stats()['skipped_budget'] == 1
+
+
+def test_motion_is_measured_against_the_last_accepted_frame():
+    motion = MotionDetector(min_changed=0.002)
+    assert motion.changes(frame()) == (1.0, None)
+    motion.accept()
+    # Not accepted, so the reference stays the empty frame
+    assert motion.changes(frame(square=(100, 100)))[1] is not None
+    assert motion.changes(frame(square=(100, 100)))[1] is not None
+    motion.accept()
+    assert motion.changes(frame(square=(100, 100)))[1] is None
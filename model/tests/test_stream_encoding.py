@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+from stream_encoding import (OpenCVEncoder, StreamProfile, create_jpeg_encoder, parse_stream_profile,
+                             resize_to_width)
+
+
+def test_defaults():
+    assert parse_stream_profile({}) == StreamProfile(0, 80, 0)
+    assert parse_stream_profile({'width': '', 'quality': ''}, default_quality=70) == StreamProfile(0, 70, 0)
+
+
+def test_values_snap_to_the_shared_grid():
+    assert parse_stream_profile({'width': '650', 'quality': '73', 'fps': '12'}) == StreamProfile(640, 75, 12)
+    assert parse_stream_profile({'width': '639.9', 'quality': '72'}) == StreamProfile(608, 70, 0)
+
+
+def test_values_are_clamped():
+    assert parse_stream_profile({'width': '10', 'quality': '200', 'fps': '500'}) == StreamProfile(64, 95, 60)
+    assert parse_stream_profile({'quality': '1'}).quality == 10
+
+
+@pytest.mark.parametrize('args', [
+    {'width': 'wide'}, {'quality': 'nan'}, {'fps': 'inf'}, {'width': '1e400'}, {'quality': '-inf'},
+    {'width': '-1'}, {'fps': '-5'},
+])
+def test_malformed_values_raise_value_error(args):
+    with pytest.raises(ValueError):
+        parse_stream_profile(args)
+
+
+def test_label():
+    assert StreamProfile(0, 80, 0).label == 'fullw-q80-maxfps'
+    assert StreamProfile(320, 60, 10).label == '320w-q60-10fps'
+
+
+def test_resize_to_width_keeps_aspect_ratio():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    assert resize_to_width(frame, 320).shape == (240, 320, 3)
+    assert resize_to_width(frame, 0) is frame
+    assert resize_to_width(frame, 1280) is frame
+
+
+def test_opencv_encoder_quality():
+    frame = np.random.default_rng(0).integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    encoder = OpenCVEncoder()
+    low, high = encoder.encode(frame, 30), encoder.encode(frame, 95)
+    assert low.startswith(b'\xff\xd8') and len(low) < len(high)
+    assert cv2.imdecode(np.frombuffer(high, np.uint8), cv2.IMREAD_COLOR).shape == frame.shape
+
+
+def test_create_jpeg_encoder():
+    assert create_jpeg_encoder('opencv').name == 'opencv'
+    assert create_jpeg_encoder('auto').name in ('opencv', 'turbojpeg')
+    with pytest.raises(ValueError):
+        create_jpeg_encoder('png')
@@ -0,0 +1,65 @@
+from tracker import FaceTracker, iou_matrix
+
+
+def box(left, top, size=100):
+    return (top, left + size, top + size, left)  # (top, right, bottom, left)
+
+
+def test_iou_matrix():
+    overlaps = iou_matrix([box(0, 0)], [box(0, 0), box(50, 0), box(200, 0)])
+    assert overlaps[0, 0] == 1.0
+    assert abs(overlaps[0, 1] - 1 / 3) < 1e-6
+    assert overlaps[0, 2] == 0.0
+
+
+def test_moving_face_keeps_its_track_and_identity():
+    tracker = FaceTracker(refresh_interval=2.0)
+    track, = tracker.update([box(0, 0)], now=0.0)
+    assert tracker.needs_identification(track, now=0.0)
+    tracker.identify(track, 'Asha', 0.4, None, now=0.0)
+
+    for step in range(1, 5):
+        moved, = tracker.update([box(10 * step, 0)], now=0.1 * step)
+        assert moved is track
+    assert track.name == 'Asha'
+    assert not tracker.needs_identification(track, now=0.4)
+    assert tracker.needs_identification(track, now=2.0)  # Refreshed after the interval
+
+
+def test_new_face_gets_a_new_track():
+    tracker = FaceTracker()
+    first, = tracker.update([box(0, 0)], now=0.0)
+    again, other = tracker.update([box(0, 0), box(500, 0)], now=0.1)
+    assert again is first
+    assert other is not first
+    assert tracker.needs_identification(other, now=0.1)
+
+
+def test_missed_tracks_expire():
+    tracker = FaceTracker(max_misses=2)
+    tracker.update([box(0, 0)], now=0.0)
+    for step in range(1, 3):
+        tracker.update([], now=0.1 * step)
+    assert len(tracker.tracks) == 1
+    tracker.update([], now=0.3)
+    assert tracker.tracks == []
+
+
+def test_tracks_outside_a_searched_region_are_not_missed():
+    tracker = FaceTracker(max_misses=0)
+    tracker.update([box(0, 0)], now=0.0)
+    tracker.update([], now=0.1, region=(0, 1000, 500, 600))  # (top, right, bottom, left), right half only
+    assert len(tracker.tracks) == 1
+    tracker.update([], now=0.2)
+    assert tracker.tracks == []
+
+
+def test_poor_overlap_lowers_confidence_until_reidentified():
+    steady, jumpy = (FaceTracker(iou_threshold=0.2, min_confidence=0.95, refresh_interval=100) for _ in range(2))
+    for tracker, shift in ((steady, 0), (jumpy, 50)):
+        track, = tracker.update([box(0, 0)], now=0.0)
+        tracker.identify(track, 'Asha', 0.4, None, now=0.0)
+        assert tracker.update([box(shift, 0)], now=0.1)[0] is track  # IoU 1 / 3 when shifted
+
+    assert not steady.needs_identification(steady.tracks[0], now=0.1)
+    assert jumpy.needs_identification(jumpy.tracks[0], now=0.1)
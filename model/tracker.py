@@ -0,0 +1,128 @@
+import itertools
+import time
+
+import numpy as np
+
+from pipeline import outside_region
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise intersection-over-union of (top, right, bottom, left) boxes"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(bottom - top, 0, None) * np.clip(right - left, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 1] - a[:, 3])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 1] - b[:, 3])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    """One face followed across frames, with its cached identity"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, box, now):
+        self.track_id = next(self._ids)
+        self.box = np.asarray(box, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)  # Box change per second
+        self.last_seen_at = now
+        self.misses = 0
+        self.name = "Unknown"
+        self.distance = None
+        self.encoding = None
+        self.confidence = 0.0
+        self.identified_at = None
+
+    def predicted_box(self, now):
+        return self.box + self.velocity * (now - self.last_seen_at)
+
+    def update(self, box, now, smoothing=0.5):
+        box = np.asarray(box, dtype=np.float32)
+        elapsed = now - self.last_seen_at
+        if elapsed > 0:
+            self.velocity = smoothing * self.velocity + (1 - smoothing) * (box - self.box) / elapsed
+        self.box = box
+        self.last_seen_at = now
+        self.misses = 0
+
+
+class FaceTracker:
+    """Links face boxes across frames so identities can be reused
+
+    Detected boxes are matched greedily by IoU against each track's
+    motion-predicted box. A matched track keeps its name and encoding; its
+    confidence decays a little on every frame (more when the overlap is
+    poor) and on every missed frame. `needs_identification` is true for new
+    tracks, tracks whose confidence fell below `min_confidence`, and tracks
+    whose identity is older than the refresh interval, so only those faces
+    are encoded and matched. Not thread-safe: feed it frames in order.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=3, refresh_interval=2.0,
+                 unknown_refresh_interval=0.5, confidence_decay=0.9, min_confidence=0.6):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.refresh_interval = refresh_interval
+        self.unknown_refresh_interval = unknown_refresh_interval
+        self.confidence_decay = confidence_decay
+        self.min_confidence = min_confidence
+        self.tracks = []
+
+    def update(self, boxes, now=None, region=None):
+        """Associate this frame's boxes with tracks; returns one track per box
+
+        When only `region` of the frame was searched, tracks outside it are
+        left as they are instead of counting as missed.
+        """
+        now = time.time() if now is None else now
+        assigned = [None] * len(boxes)
+
+        if self.tracks and boxes:
+            predicted = [track.predicted_box(now) for track in self.tracks]
+            overlaps = iou_matrix(predicted, boxes)
+            # Greedy assignment, best overlap first
+            for flat in np.argsort(overlaps, axis=None)[::-1]:
+                t, d = np.unravel_index(flat, overlaps.shape)
+                if overlaps[t, d] < self.iou_threshold:
+                    break
+                if assigned[d] is not None or self.tracks[t].last_seen_at == now:
+                    continue
+                track = self.tracks[t]
+                track.update(boxes[d], now)
+                track.confidence *= self.confidence_decay + (1 - self.confidence_decay) * overlaps[t, d]
+                assigned[d] = track
+
+        for track in self.tracks:
+            if track.last_seen_at != now:
+                if region is not None and outside_region(track.box, region):
+                    continue
+                track.misses += 1
+                track.confidence *= self.confidence_decay
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for d, box in enumerate(boxes):
+            if assigned[d] is None:
+                assigned[d] = Track(box, now)
+                self.tracks.append(assigned[d])
+
+        return assigned
+
+    def needs_identification(self, track, now=None):
+        now = time.time() if now is None else now
+        if track.identified_at is None or track.confidence < self.min_confidence:
+            return True
+        interval = self.unknown_refresh_interval if track.name == "Unknown" else self.refresh_interval
+        return now - track.identified_at >= interval
+
+    def identify(self, track, name, distance, encoding, now=None):
+        """Cache a fresh recognition result on the track"""
+        track.name = name
+        track.distance = distance
+        track.encoding = encoding
+        track.confidence = 1.0
+        track.identified_at = time.time() if now is None else now